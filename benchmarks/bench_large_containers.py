@@ -0,0 +1,100 @@
+"""
+Benchmark reading large containers with read_objects.
+
+Synthetic Interactions containers of 5, 50 and 200 MB are served by the local
+GitHub stand-in used by the tests. Each read runs in a fresh child process so
+the peak RSS reported belongs to that read alone. Two modes are compared:
+
+* inline: what the contents API does for small files, the whole container is
+  transferred as base64 JSON, decoded to bytes, then to text, then parsed.
+* streamed: GitHubFunctions.read_objects, which for containers above 1 MB
+  fetches the raw blob and parses it incrementally from the response stream.
+
+Run from the repository root:
+
+    python benchmarks/bench_large_containers.py [size_mb ...]
+"""
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tests.github_stand_in import GitHubStandIn  # noqa: E402
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+CONTAINER_PATH = 'Interactions/Interactions.json'
+
+
+def synthetic_container(size_mb):
+    template = {
+        'name': '', 'file_hash': '', 'status': 0, 'content_type': 'application/pdf',
+        'abstract': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 12,
+        'topics': {'collaboration': 3, 'knowledge management': 2}, 'linked_companies': {'Atlassian': 'x' * 64}
+    }
+    object_size = len(json.dumps(template)) + 100
+    objects = []
+    for number in range(size_mb * 1024 * 1024 // object_size):
+        obj = dict(template)
+        obj['name'] = f'Interaction {number}'
+        obj['file_hash'] = f'{number:064x}'
+        objects.append(obj)
+    return json.dumps(objects).encode()
+
+
+def child(mode, url, org):
+    from mediumroast_py.api.github import GitHubFunctions
+    functions = GitHubFunctions('token', org, 'bench', api_url=url)
+    start = time.perf_counter()
+    if mode == 'inline':
+        sha = functions.get_head_sha()[2]
+        tree = functions._request_json('GET', f"/repos/{org}/{org}_discovery/git/trees/{sha}", params={'recursive': 1})
+        blob_sha = [entry['sha'] for entry in tree['tree'] if entry['path'] == CONTAINER_PATH][0]
+        blob = functions._request_json('GET', f"/repos/{org}/{org}_discovery/git/blobs/{blob_sha}")
+        objects = json.loads(base64.b64decode(blob['content']).decode())
+    else:
+        objects = functions.read_objects('Interactions')[2]['mr_json']
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'objects': len(objects), 'seconds': elapsed, 'peak_rss_mb': peak_rss_kb() / 1024}))
+
+
+def peak_rss_kb():
+    # ru_maxrss survives exec on Linux and would include the forked parent, VmHWM belongs to this image only
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main(sizes):
+    print(f"{'size':>8} {'mode':>9} {'objects':>9} {'latency s':>10} {'peak RSS MB':>12}")
+    for size_mb in sizes:
+        with GitHubStandIn(files={CONTAINER_PATH: synthetic_container(size_mb)}) as stand_in:
+            for mode in ('inline', 'streamed'):
+                result = subprocess.run(
+                    [sys.executable, __file__, '--child', mode, stand_in.url, stand_in.org],
+                    capture_output=True, text=True, cwd=ROOT, check=True
+                )
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                print(f"{size_mb:>6}MB {mode:>9} {stats['objects']:>9} {stats['seconds']:>10.2f} {stats['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(*sys.argv[2:5])
+    else:
+        main([int(size) for size in sys.argv[1:]] or [5, 50, 200])
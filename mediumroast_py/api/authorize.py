@@ -1,10 +1,11 @@
-import requests
 from datetime import datetime, timezone, timedelta
+import threading
 import time
 import webbrowser
 import jwt
 from pathlib import Path
 from urllib.parse import parse_qs
+from . session import get_shared_session
 
 __license__ = "Apache 2.0"
 __copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
@@ -26,13 +27,19 @@ class GitHubAuth:
         A string containing the PEM private key for the GitHub App.
     client_type : str
         The type of the client ('github-app' by default).
+    session : requests.Session
+        The pooled session used for every request.
+    expiry_margin : float
+        The number of seconds before its expiry a token is treated as expired.
+    token_store : TokenStore
+        The store sharing installation tokens between processes, None when tokens are not shared.
 
     Methods
     -------
     get_access_token_device_flow():
         Gets an access token using the device flow.
     """
-    def __init__(self, env, client_type='github-app'):
+    def __init__(self, env, client_type='github-app', session=None, expiry_margin=300, token_store=None):
         """
         Constructs all the necessary attributes for the GitHubAuth object.
 
@@ -42,8 +49,17 @@ class GitHubAuth:
             A dictionary containing environment variables.
         client_type : str, optional
             The type of the client ('github-app' by default).
+        session : requests.Session, optional
+            The session requests are sent with, by default the shared PooledSession.
+        expiry_margin : float, optional
+            The number of seconds before its expiry a token is treated as expired, by default 300.
+        token_store : TokenStore, optional
+            The store sharing installation tokens between the processes on this host, by default None.
         """
         self.env = env
+        self.expiry_margin = expiry_margin
+        self.token_store = token_store
+        self.session = session if session is not None else get_shared_session()
         self.client_type = client_type
         self.client_id = env['clientId']
         self.app_id = env['appId'] if 'appId' in env else None
@@ -72,7 +88,7 @@ class GitHubAuth:
             'Accept': 'application/vnd.github.v3+json'
         }
 
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, headers=headers)
 
         if not response.ok:
             return [False, {'status_code': 500, 'status_msg': response.reason}, None]
@@ -94,7 +110,7 @@ class GitHubAuth:
             A dictionary containing the access token and its expiration time.
         """
         # Request device and user codes
-        response = requests.post('https://github.com/login/device/code', data={
+        response = self.session.post('https://github.com/login/device/code', data={
             'client_id': self.client_id
         })
         response.raise_for_status()
@@ -108,7 +124,7 @@ class GitHubAuth:
 
         # Poll for the access token
         while True:
-            response = requests.post('https://github.com/login/oauth/access_token', data={
+            response = self.session.post('https://github.com/login/oauth/access_token', data={
                 'client_id': self.client_id,
                 'device_code': data['device_code'][0],
                 'grant_type': 'urn:ietf:params:oauth:grant-type:device_code'
@@ -155,15 +171,33 @@ class GitHubAuth:
 
         return {'token': pat, 'expires_at': expires_at, 'auth_type': 'pat'}
 
-    def get_access_token_pem(self):
+    def get_access_token_pem(self, replaces=None):
         """
         Get an installation access token using a PEM file.
 
+        With a token_store the token is shared with the other processes on this host and only
+        minted when the stored one is missing, close to its expiry, or the one being replaced.
+
+        Parameters
+        ----------
+        replaces : str, optional
+            A token that must not be returned, e.g. because GitHub rejected it, by default None.
+
         Returns
         -------
         str
             The installation access token.
         """
+        if self.token_store is None:
+            return self._mint_access_token_pem()
+
+        def is_fresh(token_info):
+            ttl = self.get_token_ttl(token_info)
+            return token_info.get('token') != replaces and ttl is not None and ttl > self.expiry_margin
+
+        return self.token_store.get_or_mint(self.app_id, self.installation_id, self._mint_access_token_pem, is_fresh)
+
+    def _mint_access_token_pem(self):
         # Load the private key
         private_key = str()
         if self.private_key:
@@ -189,7 +223,7 @@ class GitHubAuth:
         }
 
         # Make the request to generate the installation access token
-        response = requests.post(
+        response = self.session.post(
             f'https://api.github.com/app/installations/{self.installation_id}/access_tokens', headers=headers)
         response.raise_for_status()
 
@@ -201,26 +235,68 @@ class GitHubAuth:
         return {'token': token, 'expires_at': expires_at, 'auth_type': 'pem'}
     
 
-    def check_and_refresh_token(self, token_info, force_refresh=False):
+    def get_token_ttl(self, token_info, now=None):
+        """
+        Get the number of seconds until a token expires, computed from its recorded expiry.
+
+        Parameters
+        ----------
+        token_info : dict
+            A dictionary containing the access token, its expiration time, and the auth type.
+        now : float, optional
+            The current epoch time, by default time.time().
+
+        Returns
+        -------
+        float
+            The seconds until the token expires, negative once it has expired, or None when the expiry is unknown.
+        """
+        expires_at = token_info.get('expires_at')
+        if not expires_at:
+            return None
+        try:
+            expiry = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+        except (TypeError, ValueError):
+            return None
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=timezone.utc)
+        return expiry.timestamp() - (time.time() if now is None else now)
+
+    def check_and_refresh_token(self, token_info, force_refresh=False, verify=False):
         """
         Check the expiration of the access token and regenerate it if necessary.
 
+        Installation tokens (pem) are checked against the expiry GitHub returned when they were minted,
+        without a request. GitHub is only asked when verify is set, e.g. after a request was answered with 401,
+        or when the expiry is unknown. The expiry of PAT and device flow tokens is only estimated locally, a
+        revoked token would look valid, so they are always verified with GitHub.
+
         Parameters
         ----------
         token_info : dict
             A dictionary containing the access token, its expiration time, and the auth type.
+        force_refresh : bool, optional
+            Whether to regenerate the token regardless of its expiry, by default False.
+        verify : bool, optional
+            Whether to confirm the token is still accepted with a request to GitHub, by default False.
 
         Returns
         -------
         dict
             A dictionary containing the (possibly refreshed) access token, its expiration time, and the auth type.
         """
-        is_valid = self.check_token_expiration(token_info['token'])
+        # Only trust an expiry that GitHub set
+        ttl = self.get_token_ttl(token_info) if token_info['auth_type'] == 'pem' else None
+        is_valid = [True, {'status_code': 200, 'status_msg': f'token expires in {ttl} seconds'}, None]
+        if ttl is not None and ttl <= self.expiry_margin:
+            is_valid = [False, {'status_code': 401, 'status_msg': 'token expired or about to expire'}, token_info.get('expires_at')]
+        elif not force_refresh and (verify or ttl is None):
+            is_valid = self.check_token_expiration(token_info['token'])
         # Check if the token has expired
         if not is_valid[0] or force_refresh:
             # The token has expired, regenerate it
             if token_info['auth_type'] == 'pem':
-                token_info = self.get_access_token_pem()
+                token_info = self.get_access_token_pem(replaces=token_info['token'])
             elif token_info['auth_type'] == 'device-flow':
                 token_info = self.get_access_token_device_flow()
             elif token_info['auth_type'] == 'pat':
@@ -229,4 +305,130 @@ class GitHubAuth:
                 raise ValueError(f"Unknown auth type: {token_info['auth_type']}")
 
         return token_info
-    
+
+    def start_token_refresher(self, token_info, on_refresh=None, retry_interval=30):
+        """
+        Keep an installation token fresh in a background thread.
+
+        Parameters
+        ----------
+        token_info : dict
+            The current token, as returned by get_access_token_pem.
+        on_refresh : callable, optional
+            A function called with the new token_info after every refresh, by default None.
+        retry_interval : float, optional
+            The number of seconds to wait before retrying a failed refresh, by default 30.
+
+        Returns
+        -------
+        TokenRefresher
+            The started refresher, its get_token method returns the current token.
+        """
+        refresher = TokenRefresher(self, token_info, on_refresh, retry_interval)
+        refresher.start()
+        return refresher
+
+
+class TokenRefresher:
+    """
+    A class used to mint a new installation token before the current one expires.
+
+    A daemon thread sleeps until the token is expiry_margin seconds from its
+    expiry and then replaces it, so callers of get_token never wait on GitHub.
+    Only tokens minted from the App's private key ('pem') can be refreshed
+    without user interaction, other tokens are returned unchanged.
+
+    Attributes
+    ----------
+    auth : GitHubAuth
+        The object used to mint new tokens.
+    token_info : dict
+        The current token.
+    refresh_count : int
+        The number of tokens minted by the refresher.
+    refresh_listeners : list
+        The callables notified with the new token_info after every refresh.
+    """
+    def __init__(self, auth, token_info, on_refresh=None, retry_interval=30):
+        """
+        Constructs all the necessary attributes for the TokenRefresher object.
+
+        Parameters
+        ----------
+        auth : GitHubAuth
+            The object used to mint new tokens.
+        token_info : dict
+            The current token.
+        on_refresh : callable, optional
+            A function called with the new token_info after every refresh, by default None.
+        retry_interval : float, optional
+            The number of seconds to wait before retrying a failed refresh, by default 30.
+        """
+        self.auth = auth
+        self.token_info = token_info
+        self.refresh_listeners = [on_refresh] if on_refresh is not None else []
+        self.retry_interval = retry_interval
+        self.refresh_count = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='mediumroast-token-refresher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def add_refresh_listener(self, listener):
+        """
+        Register a callable that is notified with the new token_info after every refresh.
+
+        Use it to hand new tokens to clients, e.g. GitHubFunctions.use_token_refresher registers set_token.
+
+        Parameters
+        ----------
+        listener : callable
+            The function to call as listener(token_info).
+        """
+        with self._lock:
+            self.refresh_listeners.append(listener)
+
+    def get_token(self):
+        """
+        Get the current token, minting one in the caller's thread only if the refresher fell behind.
+
+        Returns
+        -------
+        dict
+            A dictionary containing the access token, its expiration time, and the auth type.
+        """
+        with self._lock:
+            ttl = self.auth.get_token_ttl(self.token_info)
+            if ttl is not None and ttl <= 0:
+                self._refresh()
+            return self.token_info
+
+    def _refresh(self):
+        self.token_info = self.auth.check_and_refresh_token(self.token_info, force_refresh=True)
+        self.refresh_count += 1
+        self.last_error = None
+        for listener in self.refresh_listeners:
+            listener(self.token_info)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self.token_info.get('auth_type') != 'pem':
+                return
+            ttl = self.auth.get_token_ttl(self.token_info)
+            if ttl is None:
+                return
+            if self._stopped.wait(max(0.0, ttl - self.auth.expiry_margin)):
+                return
+            try:
+                with self._lock:
+                    self._refresh()
+            except Exception as e:
+                self.last_error = e
+                self._stopped.wait(self.retry_interval)
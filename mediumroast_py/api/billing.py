@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+def flatten_billings(billings, prefix=''):
+    """
+    Flatten the numeric values of billing responses into dotted keys.
+
+    Parameters
+    ----------
+    billings : dict
+        The billing responses, e.g. {'storage': {...}, 'actions': {...}}.
+    prefix : str, optional
+        The prefix of the keys, by default ''.
+
+    Returns
+    -------
+    dict
+        A dictionary mapping keys such as 'actions.total_minutes_used' to numbers.
+    """
+    values = {}
+    for key, value in billings.items():
+        if isinstance(value, dict):
+            values.update(flatten_billings(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f'{prefix}{key}'] = value
+    return values
+
+
+class BillingHistory:
+    """
+    A class used to keep a local time series of billing usage.
+
+    Every sample is one line of JSON appended to a file per organization,
+    holding the time it was taken and the flattened numeric billing values.
+    A sample equal to the previous one is not written, so polling often
+    only grows the file when usage actually moves. Trends are read back
+    from the file without calling GitHub.
+
+    Attributes
+    ----------
+    directory : pathlib.Path
+        The directory holding one file per organization.
+    """
+    def __init__(self, directory=None, clock=time.time):
+        """
+        Constructs all the necessary attributes for the BillingHistory object.
+
+        Parameters
+        ----------
+        directory : str, optional
+            The directory holding the history files, by default ~/.cache/mediumroast/billing.
+        clock : callable, optional
+            The function returning the current epoch time, by default time.time.
+        """
+        self.directory = Path(directory) if directory else Path.home() / '.cache' / 'mediumroast' / 'billing'
+        self.clock = clock
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def _path(self, org):
+        return self.directory / f"{org}.jsonl"
+
+    def _read(self, org):
+        try:
+            with open(self._path(org)) as history_file:
+                return [json.loads(line) for line in history_file if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def append(self, org, billings):
+        """
+        Record a sample unless it equals the previous sample of the organization.
+
+        Parameters
+        ----------
+        org : str
+            The name of the organization.
+        billings : dict
+            The billing responses, flattened with flatten_billings.
+
+        Returns
+        -------
+        bool
+            True if the sample was written, False if it equals the previous one.
+        """
+        values = flatten_billings(billings)
+        with self._lock:
+            if org not in self._last:
+                samples = self._read(org)
+                self._last[org] = samples[-1]['values'] if samples else None
+            if values == self._last[org]:
+                return False
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self._path(org), 'a') as history_file:
+                history_file.write(json.dumps({'time': round(self.clock(), 3), 'values': values}, separators=(',', ':')) + '\n')
+            self._last[org] = values
+            return True
+
+    def get_samples(self, org, since=None, until=None):
+        """
+        Read the samples of an organization.
+
+        Parameters
+        ----------
+        org : str
+            The name of the organization.
+        since : float, optional
+            The earliest epoch time to return, by default the first sample.
+        until : float, optional
+            The latest epoch time to return, by default the last sample.
+
+        Returns
+        -------
+        list
+            The samples in time order, dictionaries with the time and the flattened values.
+        """
+        with self._lock:
+            samples = self._read(org)
+        return [
+            sample for sample in samples
+            if (since is None or sample['time'] >= since) and (until is None or sample['time'] <= until)
+        ]
+
+    def get_series(self, org, key, since=None, until=None):
+        """
+        Read the time series of one billing value.
+
+        Parameters
+        ----------
+        org : str
+            The name of the organization.
+        key : str
+            The flattened key, e.g. 'actions.total_minutes_used'.
+        since : float, optional
+            The earliest epoch time to return, by default the first sample.
+        until : float, optional
+            The latest epoch time to return, by default the last sample.
+
+        Returns
+        -------
+        list
+            (time, value) tuples in time order, for the samples that hold the key.
+        """
+        return [(sample['time'], sample['values'][key]) for sample in self.get_samples(org, since, until) if key in sample['values']]
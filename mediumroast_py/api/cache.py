@@ -0,0 +1,396 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class ValidatorCache:
+    """
+    A class used to cache HTTP validators and the content they describe.
+
+    Entries are keyed by the path and ref of a GitHub object and hold the ETag
+    and Last-Modified values returned by GitHub together with the decoded
+    content. The validators are replayed as If-None-Match and If-Modified-Since
+    so that an unchanged object is answered with a 304, which GitHub does not
+    count against the rate limit. The least recently used entries are evicted
+    once either the entry or the byte budget is exceeded.
+
+    Attributes
+    ----------
+    max_entries : int
+        The maximum number of entries to keep, 0 disables the cache.
+    max_bytes : int
+        The maximum total size of the cached values in bytes.
+    hits : int
+        The number of requests answered with a 304 and served from the cache.
+    misses : int
+        The number of requests that had to transfer the content.
+    evictions : int
+        The number of entries evicted to stay within the budgets.
+    """
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        """
+        Constructs all the necessary attributes for the ValidatorCache object.
+
+        Parameters
+        ----------
+        max_entries : int, optional
+            The maximum number of entries to keep, by default 256.
+        max_bytes : int, optional
+            The maximum total size of the cached values in bytes, by default 64 MiB.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_headers(self, key):
+        """
+        Get the conditional request headers for a cached entry.
+
+        Parameters
+        ----------
+        key : tuple
+            The (path, ref) key of the entry.
+
+        Returns
+        -------
+        dict
+            The If-None-Match and If-Modified-Since headers, empty if nothing is cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return {}
+            headers = {}
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def get(self, key):
+        """
+        Get the cached value for an entry after GitHub answered with a 304.
+
+        Parameters
+        ----------
+        key : tuple
+            The (path, ref) key of the entry.
+
+        Returns
+        -------
+        object
+            The cached value, or None if the entry was evicted in the meantime.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['value']
+
+    def put(self, key, value, etag=None, last_modified=None, size=None):
+        """
+        Store a value with the validators returned by GitHub.
+
+        Parameters
+        ----------
+        key : tuple
+            The (path, ref) key of the entry.
+        value : str or bytes
+            The decoded content to cache.
+        etag : str, optional
+            The ETag header returned by GitHub.
+        last_modified : str, optional
+            The Last-Modified header returned by GitHub.
+        size : int, optional
+            The size of the value in bytes, by default len(value).
+        """
+        if size is None:
+            size = len(value) if value is not None else 0
+        with self._lock:
+            self.misses += 1
+            self._discard(key)
+            if not (etag or last_modified) or self.max_entries <= 0 or size > self.max_bytes:
+                return
+            self._entries[key] = {'etag': etag, 'last_modified': last_modified, 'value': value, 'size': size}
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """
+        Drop one entry or, when no key is given, every entry.
+
+        Parameters
+        ----------
+        key : tuple, optional
+            The (path, ref) key of the entry to drop.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._size = 0
+            else:
+                self._discard(key)
+
+    def get_stats(self):
+        """
+        Get the counters for the cache.
+
+        Returns
+        -------
+        dict
+            A dictionary with the number of entries, bytes, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry['size']
+
+
+class ObjectCache:
+    """
+    A class used to cache decoded containers by the blob SHA of their content.
+
+    Entries hold the serialized objects of a container at one blob SHA, so they
+    never go stale and need no revalidation. The objects this process commits
+    are put into the cache together with the commit that holds them, which lets
+    a read that finds the branch still at that commit serve the exact content
+    just written without transferring it again, even while GitHub's contents
+    API still answers with the previous version. The least recently used
+    entries are evicted once either budget is exceeded.
+
+    Attributes
+    ----------
+    max_entries : int
+        The maximum number of containers to keep, 0 disables the cache.
+    max_bytes : int
+        The maximum total size of the serialized containers in bytes.
+    hits : int
+        The number of reads served from the cache.
+    misses : int
+        The number of lookups that found no entry.
+    evictions : int
+        The number of entries evicted to stay within the budgets.
+    """
+    def __init__(self, max_entries=64, max_bytes=128 * 1024 * 1024, max_commits=256):
+        """
+        Constructs all the necessary attributes for the ObjectCache object.
+
+        Parameters
+        ----------
+        max_entries : int, optional
+            The maximum number of containers to keep, by default 64.
+        max_bytes : int, optional
+            The maximum total size of the serialized containers in bytes, by default 128 MiB.
+        max_commits : int, optional
+            The number of commits of this process whose container SHAs are remembered, by default 256.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_commits = max_commits
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._commits = OrderedDict()
+        self._written = set()
+        self._heads = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, container_name, sha):
+        """
+        Get the serialized objects of a container at a blob SHA.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+        sha : str
+            The blob SHA guarding the container, the manifest SHA for a sharded container.
+
+        Returns
+        -------
+        str
+            The serialized objects, or None if they are not cached.
+        """
+        with self._lock:
+            text = self._entries.get((container_name, sha))
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((container_name, sha))
+            self.hits += 1
+            return text
+
+    def put(self, container_name, sha, text):
+        """
+        Store the serialized objects of a container at a blob SHA.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+        sha : str
+            The blob SHA guarding the container.
+        text : str
+            The objects serialized as JSON.
+        """
+        size = len(text)
+        with self._lock:
+            self._discard((container_name, sha))
+            if self.max_entries <= 0 or size > self.max_bytes:
+                return
+            self._entries[(container_name, sha)] = text
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def record_commit(self, commit_sha, container_shas, branch_name=None):
+        """
+        Remember the blob SHAs of the containers written by a commit of this process.
+
+        Parameters
+        ----------
+        commit_sha : str
+            The SHA of the commit.
+        container_shas : dict
+            A dictionary mapping the written container names to their blob SHA.
+        branch_name : str, optional
+            The branch the commit was pushed to, which is recorded as its last seen head, by default None.
+        """
+        with self._lock:
+            self._commits[commit_sha] = dict(container_shas)
+            self._written.update(container_shas)
+            if branch_name is not None:
+                self._heads[branch_name] = commit_sha
+            while len(self._commits) > self.max_commits:
+                self._commits.popitem(last=False)
+
+    def set_head(self, branch_name, commit_sha):
+        """
+        Remember the commit a branch was last seen pointing to.
+
+        Parameters
+        ----------
+        branch_name : str
+            The name of the branch.
+        commit_sha : str
+            The SHA of the commit.
+        """
+        with self._lock:
+            self._heads[branch_name] = commit_sha
+
+    def get_head(self, branch_name):
+        """
+        Get the commit a branch was last seen pointing to, or None if the branch was not seen.
+        """
+        with self._lock:
+            return self._heads.get(branch_name)
+
+    def was_written(self, container_name):
+        """
+        Tell whether this process committed a container, i.e. whether a read may be served from a commit.
+        """
+        with self._lock:
+            return container_name in self._written
+
+    def blob_at(self, commit_sha, container_name):
+        """
+        Get the blob SHA of a container in a commit of this process.
+
+        Parameters
+        ----------
+        commit_sha : str
+            The SHA of the commit.
+        container_name : str
+            The name of the container.
+
+        Returns
+        -------
+        str
+            The blob SHA, or None if the commit is unknown or did not write the container.
+        """
+        with self._lock:
+            return self._commits.get(commit_sha, {}).get(container_name)
+
+    def get_stats(self):
+        """
+        Get the counters for the cache.
+
+        Returns
+        -------
+        dict
+            A dictionary with the number of entries, bytes, remembered commits, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'commits': len(self._commits),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _discard(self, key):
+        text = self._entries.pop(key, None)
+        if text is not None:
+            self._size -= len(text)
+
+
+_shared_object_caches = {}
+_shared_object_caches_lock = threading.Lock()
+
+
+def get_shared_object_cache(api_url, org, token=None):
+    """
+    Get the object cache shared by every GitHubFunctions object of a repository that was not given its own.
+
+    The cache is shared per token as well, so objects read with one token are never served to a client
+    using another token that may not be allowed to read them.
+
+    Parameters
+    ----------
+    api_url : str
+        The base URL of GitHub's REST API.
+    org : str
+        The name of the organization on GitHub.
+    token : str, optional
+        The token of the client, only a hash of it is kept.
+
+    Returns
+    -------
+    ObjectCache
+        The shared cache, created with the default budgets on first use.
+    """
+    key = (api_url, org, hashlib.sha256((token or 'anonymous').encode()).hexdigest()[:16])
+    with _shared_object_caches_lock:
+        if key not in _shared_object_caches:
+            _shared_object_caches[key] = ObjectCache()
+        return _shared_object_caches[key]
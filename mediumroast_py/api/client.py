@@ -0,0 +1,158 @@
+import threading
+from . github import GitHubFunctions
+from . github_server import Billings, Companies, Interactions, Studies, Users
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class MediumroastClient:
+    """
+    A class used to share one GitHubFunctions object between all object controllers.
+
+    The client owns the token, the connection pool, the repository handle and
+    the caches. The controllers for studies, companies, interactions, users and
+    billings are lightweight views over it, created on first use and reused
+    afterwards, so an application pays for one client no matter how many
+    object types it works with.
+
+    Attributes
+    ----------
+    server_ctl : GitHubFunctions
+        The functions object shared by every controller.
+    """
+    controller_classes = {
+        'studies': Studies,
+        'companies': Companies,
+        'interactions': Interactions,
+        'users': Users,
+        'billings': Billings
+    }
+
+    def __init__(self, token, org, process_name, server_ctl=None, **options):
+        """
+        Constructs all the necessary attributes for the MediumroastClient object.
+
+        Parameters
+        ----------
+        token : str
+            The personal access token for GitHub's API.
+        org : str
+            The name of the organization on GitHub.
+        process_name : str
+            The name of the process.
+        server_ctl : GitHubFunctions, optional
+            The functions object to share, by default a new one created with options.
+        **options
+            Keyword arguments passed to GitHubFunctions, e.g. api_url, session, validator_cache or replica.
+        """
+        self.token = token
+        self.org = org
+        self.process_name = process_name
+        self.server_ctl = server_ctl if server_ctl is not None else GitHubFunctions(token, org, process_name, **options)
+        self._controllers = {}
+        self._lock = threading.Lock()
+
+    def set_token(self, token):
+        """
+        Replace the token of the client and of the shared functions object, see GitHubFunctions.set_token.
+
+        Parameters
+        ----------
+        token : str
+            The new token, e.g. a freshly minted installation token.
+        """
+        self.token = token
+        self.server_ctl.set_token(token)
+
+    def use_token_refresher(self, refresher):
+        """
+        Follow the tokens of a TokenRefresher, each refreshed token is used from the next request on.
+
+        Parameters
+        ----------
+        refresher : TokenRefresher
+            The refresher returned by GitHubAuth.start_token_refresher.
+        """
+        refresher.add_refresh_listener(lambda token_info: self.set_token(token_info['token']))
+        self.set_token(refresher.get_token()['token'])
+
+    def get_controller(self, name):
+        """
+        Get the controller for an object type, creating it on first use.
+
+        Parameters
+        ----------
+        name : str
+            The object type, one of studies, companies, interactions, users or billings.
+
+        Returns
+        -------
+        BaseGitHubObject
+            The controller, backed by the shared functions object.
+        """
+        with self._lock:
+            if name not in self._controllers:
+                self._controllers[name] = self.controller_classes[name](
+                    self.token, self.org, self.process_name, server_ctl=self.server_ctl
+                )
+            return self._controllers[name]
+
+    @property
+    def studies(self):
+        return self.get_controller('studies')
+
+    @property
+    def companies(self):
+        return self.get_controller('companies')
+
+    @property
+    def interactions(self):
+        return self.get_controller('interactions')
+
+    @property
+    def users(self):
+        return self.get_controller('users')
+
+    @property
+    def billings(self):
+        return self.get_controller('billings')
+
+    def snapshot(self, container_names=('Studies', 'Companies', 'Interactions'), ref=None):
+        """
+        Read several containers as of one commit, see GitHubFunctions.snapshot.
+
+        Parameters
+        ----------
+        container_names : iterable, optional
+            The names of the containers to read, by default Studies, Companies and Interactions.
+        ref : str, optional
+            A branch name or commit SHA, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the Snapshot.
+        """
+        return self.server_ctl.snapshot(container_names, ref)
+
+    def get_stats(self):
+        """
+        Get the counters of the shared repository handle, caches and rate limiter.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success, a dictionary with status information, and the counters.
+        """
+        rate_limits = self.server_ctl.get_rate_limit_stats()
+        return [True, {'status_code': 200, 'status_msg': f'captured client stats for [{self.org}]'}, {
+            'repository': self.server_ctl.repo_context.get_stats(),
+            'validator_cache': self.server_ctl.validator_cache.get_stats(),
+            'object_cache': self.server_ctl.object_cache.get_stats(),
+            'rate_limits': rate_limits[2],
+            'controllers': sorted(self._controllers)
+        }]
@@ -0,0 +1,206 @@
+import copy
+import threading
+import time
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class UserDirectory:
+    """
+    A class used to cache the users of a repository page by page.
+
+    Pages are fetched lazily, in order, and only as far as a lookup needs:
+    a lookup by a unique attribute such as the login or id stops at the page
+    holding the user. Every page keeps the ETag it was served with and is
+    trusted for ttl seconds; after that it is revalidated with a conditional
+    request, which GitHub answers with a 304 that does not count against the
+    rate limit when the page did not change.
+
+    Attributes
+    ----------
+    ttl : float
+        The number of seconds a page is trusted before it is revalidated.
+    unique_fields : tuple
+        The attributes that identify a user and are indexed.
+    request_count : int
+        The number of page requests made.
+    not_modified_count : int
+        The number of page requests answered with a 304.
+    """
+    def __init__(self, fetch_page, first_url, ttl=300, unique_fields=('login', 'id'), clock=time.monotonic):
+        """
+        Constructs all the necessary attributes for the UserDirectory object.
+
+        Parameters
+        ----------
+        fetch_page : callable
+            A function called with a page URL and the ETag of the cached page (or None), returning None when the page did
+            not change, otherwise a tuple of the users on the page, the page's ETag and the URL of the next page (or None).
+        first_url : str
+            The URL of the first page.
+        ttl : float, optional
+            The number of seconds a page is trusted before it is revalidated, by default 300.
+        unique_fields : iterable, optional
+            The attributes that identify a user, by default ('login', 'id').
+        clock : callable, optional
+            The function returning a monotonic time in seconds, by default time.monotonic.
+        """
+        self.fetch_page = fetch_page
+        self.first_url = first_url
+        self.ttl = ttl
+        self.unique_fields = tuple(unique_fields)
+        self.clock = clock
+        self.request_count = 0
+        self.not_modified_count = 0
+        self._pages = []
+        self._indexes = {field: {} for field in self.unique_fields}
+        self._lock = threading.RLock()
+
+    def _is_fresh(self, page):
+        return self.clock() - page['checked_at'] < self.ttl
+
+    def _reindex(self):
+        self._indexes = {field: {} for field in self.unique_fields}
+        for number, page in enumerate(self._pages):
+            for user in page['users']:
+                for field in self.unique_fields:
+                    self._indexes[field].setdefault(user.get(field), number)
+
+    def _load(self, number, force=False):
+        # Returns the page, fetching or revalidating it if needed, or None past the last page
+        if number > len(self._pages):
+            return None
+        if number == len(self._pages):
+            url = self.first_url if number == 0 else self._pages[number - 1]['next']
+            if url is None:
+                return None
+            page = {'url': url, 'etag': None, 'users': [], 'next': None, 'checked_at': None}
+        else:
+            page = self._pages[number]
+            if not force and self._is_fresh(page):
+                return page
+            if number > 0 and page['url'] != self._pages[number - 1]['next']:
+                # The previous page changed its link, start over from that link
+                page = {'url': self._pages[number - 1]['next'], 'etag': None, 'users': [], 'next': None, 'checked_at': None}
+                if page['url'] is None:
+                    del self._pages[number:]
+                    self._reindex()
+                    return None
+        self.request_count += 1
+        fetched = self.fetch_page(page['url'], page['etag'])
+        if fetched is None:
+            self.not_modified_count += 1
+            page['checked_at'] = self.clock()
+            return page
+        page = {'url': page['url'], 'etag': fetched[1], 'users': fetched[0], 'next': fetched[2], 'checked_at': self.clock()}
+        self._pages[number:number + 1] = [page]
+        if page['next'] is None:
+            # The last page, drop the pages that no longer exist
+            del self._pages[number + 1:]
+        self._reindex()
+        return page
+
+    def _walk(self, force=False):
+        number = 0
+        while True:
+            page = self._load(number, force)
+            if page is None:
+                return
+            yield page
+            if page['next'] is None:
+                return
+            number += 1
+
+    def find(self, attribute, value):
+        """
+        Find the users whose attribute equals a value.
+
+        A lookup by a unique attribute is answered from the index when the page holding the user is
+        fresh, otherwise pages are fetched or revalidated in order until the user is found. Any other
+        attribute needs every page.
+
+        Parameters
+        ----------
+        attribute : str
+            The attribute to match.
+        value : object
+            The value to match.
+
+        Returns
+        -------
+        list
+            Copies of the matching users.
+        """
+        with self._lock:
+            if attribute in self.unique_fields:
+                number = self._indexes[attribute].get(value)
+                if number is not None and self._is_fresh(self._pages[number]):
+                    return [copy.deepcopy(user) for user in self._pages[number]['users'] if user.get(attribute) == value]
+                for page in self._walk():
+                    matches = [copy.deepcopy(user) for user in page['users'] if user.get(attribute) == value]
+                    if matches:
+                        return matches
+                return []
+            return [copy.deepcopy(user) for page in self._walk() for user in page['users'] if user.get(attribute) == value]
+
+    def get_all(self):
+        """
+        Get every user, fetching or revalidating the pages that are not fresh.
+
+        Returns
+        -------
+        list
+            Copies of all users.
+        """
+        with self._lock:
+            return [copy.deepcopy(user) for page in self._walk() for user in page['users']]
+
+    def refresh(self):
+        """
+        Revalidate every page with conditional requests, e.g. periodically in a long-running service.
+
+        Only the pages that changed are transferred and re-indexed.
+
+        Returns
+        -------
+        dict
+            A dictionary with the number of pages, the number of pages that changed and the number of users.
+        """
+        with self._lock:
+            requests_before, not_modified_before = self.request_count, self.not_modified_count
+            pages = list(self._walk(force=True))
+            requests = self.request_count - requests_before
+            return {
+                'pages': len(pages),
+                'changed_pages': requests - (self.not_modified_count - not_modified_before),
+                'users': sum(len(page['users']) for page in pages)
+            }
+
+    def clear(self):
+        """
+        Forget every cached page.
+        """
+        with self._lock:
+            self._pages = []
+            self._reindex()
+
+    def get_stats(self):
+        """
+        Get the counters of the directory.
+
+        Returns
+        -------
+        dict
+            A dictionary with the number of cached pages and users, page requests and 304 answers.
+        """
+        with self._lock:
+            return {
+                'pages': len(self._pages),
+                'users': sum(len(page['users']) for page in self._pages),
+                'requests': self.request_count,
+                'not_modified': self.not_modified_count
+            }
@@ -1,12 +1,29 @@
-from github import Github
+from github import Auth, Github
+from github.Requester import RequestsResponse
 import base64
+import codecs
+import contextlib
+import copy
+import functools
+import hashlib
+import inspect
 import json
+import os
+import random
+import re
 import time
+import threading
 import requests
 import urllib.parse
-from requests.auth import HTTPBasicAuth
+import weakref
 from datetime import datetime
 from pprint import pprint
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from . cache import ValidatorCache, get_shared_object_cache
+from . directory import UserDirectory
+from . sharding import ShardLayout
+from . snapshot import Snapshot
+from . session import get_shared_session
 
 __license__ = "Apache 2.0"
 __copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
@@ -14,7 +31,561 @@ __author__ = "Michael Hay"
 __email__ = "hello@mediumroast.io"
 __status__ = "Production"
 
-class GitHubFunctions:
+def git_blob_sha(content):
+    """
+    Compute the SHA git assigns to a blob with the given content.
+
+    Parameters
+    ----------
+    content : str or bytes
+        The content of the blob.
+
+    Returns
+    -------
+    str
+        The hexadecimal SHA-1 of the blob.
+    """
+    if isinstance(content, str):
+        content = content.encode()
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+def iter_json_array(chunks):
+    """
+    Incrementally parse a JSON array from an iterable of byte chunks.
+
+    Elements are yielded as soon as they are complete, so the whole document is never held as text
+    next to the parsed objects. Documents whose top level is not an array are parsed in one piece.
+
+    Parameters
+    ----------
+    chunks : iterable
+        The byte chunks of the UTF-8 encoded document.
+
+    Yields
+    ------
+    object
+        Each element of the array, or the whole document if it is not an array.
+    """
+    # Elements are decoded one at a time, share the keys between them as json.loads does within a document
+    keys = {}
+    decoder = json.JSONDecoder(object_pairs_hook=lambda pairs: {keys.setdefault(key, key): value for key, value in pairs})
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    started = False
+    finished = False
+    chunks = iter(chunks)
+    while not finished:
+        chunk = next(chunks, None)
+        finished = chunk is None
+        buffer += text_decoder.decode(b'' if finished else chunk, final=finished)
+        position = 0
+        if not started:
+            stripped = buffer.lstrip()
+            if not stripped:
+                continue
+            if stripped[0] != '[':
+                # Not an array, fall back to parsing the document in one piece
+                rest = ''.join(text_decoder.decode(chunk) for chunk in chunks) + text_decoder.decode(b'', final=True)
+                yield json.loads(buffer + rest)
+                return
+            started = True
+            position = len(buffer) - len(stripped) + 1
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if finished:
+                    raise
+                break
+            # An element that ends with the buffer could be a truncated scalar, wait for more input
+            if end == len(buffer) and not finished:
+                break
+            yield element
+            position = end
+        buffer = buffer[position:]
+    raise ValueError('unexpected end of JSON array')
+
+
+class SessionConnection:
+    """
+    A class used to send the requests of PyGithub through a session of the SDK.
+
+    PyGithub's Requester opens its own connections, which would bypass the connection pool and
+    the rate limit scheduler of the SDK. This class mimics the connection interface the Requester
+    uses and sends every request through the given session instead, see use_session.
+
+    Attributes
+    ----------
+    session : requests.Session
+        The session the requests are sent with.
+    """
+    def __init__(self, session, scheme, host, port=None, strict=False, timeout=None, retry=None, pool_size=None, **kwargs):
+        """
+        Constructs all the necessary attributes for the SessionConnection object.
+
+        Parameters
+        ----------
+        session : requests.Session
+            The session the requests are sent with.
+        scheme : str
+            The scheme of GitHub's API URL, http or https.
+        host : str
+            The host of GitHub's API.
+        port : int, optional
+            The port of GitHub's API, by default the port of the scheme.
+        timeout : float, optional
+            The timeout in seconds of every request, by default the timeout of the session.
+        """
+        self.session = session
+        self.host = host
+        self.netloc = host if port is None else f"{host}:{port}"
+        self.scheme = scheme
+        self.timeout = timeout
+        self.verify = kwargs.get('verify', True)
+
+    def request(self, verb, url, input, headers, stream=False):
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+        self.stream = stream
+
+    def getresponse(self):
+        response = self.session.request(
+            self.verb,
+            f"{self.scheme}://{self.netloc}{self.url}",
+            headers=self.headers,
+            data=self.input,
+            timeout=self.timeout,
+            verify=self.verify,
+            allow_redirects=False,
+            stream=self.stream
+        )
+        return RequestsResponse(response)
+
+    def close(self):
+        # The session is shared, its connections stay in the pool
+        pass
+
+
+class _CurrentToken(Auth.Auth):
+    # Hands PyGithub the current token of a client on every request, so a refreshed token reaches it too
+    def __init__(self, get_token):
+        self._get_token = get_token
+
+    @property
+    def token_type(self):
+        return 'token'
+
+    @property
+    def token(self):
+        return self._get_token()
+
+    @property
+    def _masked_token(self):
+        return 'token (oauth token removed)'
+
+
+def use_session(github_instance, session):
+    """
+    Send every request of a PyGithub object through a session of the SDK.
+
+    Parameters
+    ----------
+    github_instance : Github
+        The PyGithub object, the repositories and other objects it returns share its requester.
+    session : requests.Session
+        The session the requests are sent with, e.g. a PooledSession pacing them with its scheduler.
+    """
+    requester = github_instance.requester
+    scheme = urllib.parse.urlsplit(requester.base_url).scheme
+    # PyGithub only offers injectConnectionClasses, which would change every Github object of the process
+    requester._Requester__connectionClass = functools.partial(SessionConnection, session, scheme)
+
+
+class RepositoryContext:
+    """
+    A class used to hold a resolved repository handle for a GitHubFunctions object.
+
+    The repository is resolved with a single call to GitHub the first time it is
+    needed and then reused for the lifetime of the owning client. When a TTL is
+    set the handle is revalidated with a conditional request once it is older
+    than the TTL, which GitHub answers with a 304 when nothing has changed.
+
+    Attributes
+    ----------
+    github_instance : Github
+        An instance of the Github class from the PyGithub library.
+    full_name : str
+        The full name of the repository, e.g. org/repo.
+    ttl : float
+        The number of seconds before the handle is revalidated, None means never.
+    resolve_count : int
+        The number of times the repository was fetched from GitHub.
+    revalidate_count : int
+        The number of times the repository handle was revalidated.
+    access_count : int
+        The number of times the repository handle was requested.
+    """
+    def __init__(self, github_instance, full_name, ttl=None):
+        """
+        Constructs all the necessary attributes for the RepositoryContext object.
+
+        Parameters
+        ----------
+        github_instance : Github
+            An instance of the Github class from the PyGithub library.
+        full_name : str
+            The full name of the repository, e.g. org/repo.
+        ttl : float, optional
+            The number of seconds before the handle is revalidated, by default None (never).
+        """
+        self.github_instance = github_instance
+        self.full_name = full_name
+        self.ttl = ttl
+        self.resolve_count = 0
+        self.revalidate_count = 0
+        self.access_count = 0
+        self._repo = None
+        self._resolved_at = None
+        self._lock = threading.Lock()
+
+    def get_repo(self):
+        """
+        Get the repository handle, resolving or revalidating it if needed.
+
+        Returns
+        -------
+        Repository
+            The PyGithub repository object.
+        """
+        with self._lock:
+            self.access_count += 1
+            if self._repo is None:
+                self._repo = self.github_instance.get_repo(self.full_name)
+                self.resolve_count += 1
+                self._resolved_at = time.monotonic()
+            elif self.ttl is not None and time.monotonic() - self._resolved_at >= self.ttl:
+                # update() sends If-None-Match so an unchanged repository costs a 304
+                self._repo.update()
+                self.revalidate_count += 1
+                self._resolved_at = time.monotonic()
+            return self._repo
+
+    def invalidate(self):
+        """
+        Drop the cached repository handle so that the next access resolves it again.
+        """
+        with self._lock:
+            self._repo = None
+            self._resolved_at = None
+
+    def get_stats(self):
+        """
+        Get the counters for the repository handle.
+
+        Returns
+        -------
+        dict
+            A dictionary with the number of accesses, resolves, revalidations and the round trips saved.
+        """
+        with self._lock:
+            return {
+                'access_count': self.access_count,
+                'resolve_count': self.resolve_count,
+                'revalidate_count': self.revalidate_count,
+                'saved_round_trips': self.access_count - self.resolve_count - self.revalidate_count
+            }
+
+
+class RetryPolicy:
+    """
+    A class used to bound the retries of optimistic (compare-and-swap) writes.
+
+    Attributes
+    ----------
+    max_attempts : int
+        The maximum number of attempts including the first one.
+    backoff : float
+        The delay in seconds before the first retry, doubled on every further retry.
+    max_backoff : float
+        The upper bound of the delay in seconds.
+    jitter : float
+        The fraction of the delay that is randomized to spread out competing writers.
+    """
+    def __init__(self, max_attempts=5, backoff=0.25, max_backoff=8.0, jitter=0.5):
+        """
+        Constructs all the necessary attributes for the RetryPolicy object.
+
+        Parameters
+        ----------
+        max_attempts : int, optional
+            The maximum number of attempts including the first one, by default 5.
+        backoff : float, optional
+            The delay in seconds before the first retry, by default 0.25.
+        max_backoff : float, optional
+            The upper bound of the delay in seconds, by default 8.0.
+        jitter : float, optional
+            The fraction of the delay that is randomized, by default 0.5.
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    def get_delay(self, attempt):
+        """
+        Get the delay before a retry.
+
+        Parameters
+        ----------
+        attempt : int
+            The number of attempts already made.
+
+        Returns
+        -------
+        float
+            The delay in seconds.
+        """
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        return delay * (1 - self.jitter * random.random())
+
+    def wait(self, attempt):
+        """
+        Sleep for the delay before a retry.
+
+        Parameters
+        ----------
+        attempt : int
+            The number of attempts already made.
+        """
+        time.sleep(self.get_delay(attempt))
+
+
+class ContainerFormat:
+    """
+    A base class holding the storage format of containers shared by the blocking and asyncio clients.
+
+    It turns lists of objects into the files of a container, single file or sharded, decides which
+    shard files a write has to touch and applies updates to objects in memory. None of its methods
+    perform I/O, subclasses provide the `object_files`, `sharded_containers`, `lock_file_name` and
+    `write_listeners` attributes.
+    """
+    # Deleting an object also deletes the objects it links to in these containers
+    cascades = {'Companies': ('Interactions',)}
+    # The containers whose objects hold links to the objects of a container
+    linked_containers = {'Companies': ('Interactions',), 'Interactions': ('Companies',), 'Studies': ()}
+
+    def add_write_listener(self, listener):
+        """
+        Register a callable that is notified after containers are committed.
+
+        The listener is called with the container name, the exact objects that were written and the
+        SHA of the new blob, which lets caches and indexes follow our own writes without re-reading.
+        A bound method is held weakly, so registering it does not keep its object alive.
+
+        Parameters
+        ----------
+        listener : callable
+            The function to call as listener(container_name, objects, blob_sha).
+        """
+        self.write_listeners.append(weakref.WeakMethod(listener) if inspect.ismethod(listener) else lambda: listener)
+
+    def _notify_write(self, container_name, objects, blob_sha):
+        for reference in list(self.write_listeners):
+            listener = reference()
+            if listener is None:
+                # The object of the listener was collected
+                with contextlib.suppress(ValueError):
+                    self.write_listeners.remove(reference)
+                continue
+            listener(container_name, objects, blob_sha)
+
+    def _serialize_container(self, container_name, objects):
+        # Returns the path guarding the container, its new SHA and the content of every file of the container
+        layout = self.sharded_containers.get(container_name)
+        if layout is None:
+            content = json.dumps(objects)
+            path = f"{container_name}/{self.object_files[container_name]}"
+            return path, git_blob_sha(content), {path: content}
+        shards, manifest = layout.build(objects, git_blob_sha)
+        manifest_content = json.dumps(manifest)
+        contents = {layout.shard_path(container_name, prefix): content for prefix, content in shards.items()}
+        contents[layout.manifest_path(container_name)] = manifest_content
+        return layout.manifest_path(container_name), git_blob_sha(manifest_content), contents
+
+    def _diff_shards(self, container_name, contents, previous):
+        # Keep only the shard files whose content differs from the previous manifest
+        layout = self.sharded_containers[container_name]
+        previous_shards = previous[0]['shards'] if previous else {}
+        previous_shas = {layout.shard_path(container_name, prefix): shard['sha'] for prefix, shard in previous_shards.items()}
+        # Shards that lost all of their objects are deleted
+        changed = {path: None for path in previous_shas if path not in contents}
+        for path, content in contents.items():
+            if path not in previous_shas or git_blob_sha(content) != previous_shas[path]:
+                changed[path] = content
+        return changed
+
+    def _lock_tree(self, container_names):
+        # The tree entries adding the empty lock file of every container, all locks are taken by one commit
+        return [
+            {'path': f"{container_name}/{self.lock_file_name}", 'mode': '100644', 'type': 'blob', 'content': ''}
+            for container_name in container_names
+        ]
+
+    def _apply_updates(self, updates, containers):
+        # Apply every update of a container to its objects in memory so the container is written once
+        changed_objects = {}
+        modification_date = datetime.now().isoformat()
+        for container_name in updates:
+            # Convert the white_list to a set for efficient set operations
+            # NOTICE: the two lines below are added because of processing problems with Caffeine.
+            #         Until we understand what the problems are we will keep this code in place.
+            with open('/dev/null', 'w') as f:
+                f.write(json.dumps(updates))
+            white_list_set = set(updates[container_name]['white_list'])
+
+            # Capture the system flag
+            system = updates[container_name]['system']
+
+            # Get the current objects from the dictionary
+            current_objects = containers[container_name]
+
+            # Get the updates from the dictionary
+            container_updates = updates[container_name]['updates']
+
+            # Index the objects by name once so each update is a lookup instead of a scan of the container
+            positions = {}
+            for position, item in enumerate(current_objects):
+                positions.setdefault(item.get('name'), position)
+
+            # Validate every update before changing anything
+            for obj_name, obj_updates in container_updates.items():
+                # Check to see if the object exists
+                if obj_name not in positions:
+                    return [
+                        False,
+                        {
+                            'status_code': 404,
+                            'status_msg': 'Object [{}] does not exist in container [{}].'.format(obj_name, container_name)
+                        },
+                        None
+                    ]
+                if not system:
+                    # Find the keys that are not allowed by subtracting the white_list from the keys
+                    not_allowed_keys = set(obj_updates.keys()) - white_list_set
+
+                    # If there are any not allowed keys, return the error for the first encountered key
+                    if not_allowed_keys:
+                        first_not_allowed_key = next(iter(not_allowed_keys))
+                        return [
+                            False, 
+                            {
+                                'status_code': 403, 
+                                'status_msg': f'Updating the key [{first_not_allowed_key}] is not supported in container [{container_name}].'
+                            },
+                            None
+                        ]
+
+            # Update the objects in place, objects whose values are already current are left untouched
+            changed_objects[container_name] = 0
+            for obj_name, obj_updates in container_updates.items():
+                obj = current_objects[positions[obj_name]]
+                if all(key in obj and obj[key] == value for key, value in obj_updates.items()):
+                    continue
+                obj.update(obj_updates)
+                obj['modification_date'] = modification_date
+                changed_objects[container_name] += 1
+
+        total_changed = sum(changed_objects.values())
+        return [
+            True,
+            {'status_code': 200, 'status_msg': f'Updated [{total_changed}] objects.'},
+            {'changed_objects': changed_objects, 'total_changed': total_changed}
+        ]
+
+    def _delete_containers(self, deletes, cascade=True):
+        # The containers a delete has to read and write: the deleted objects, their cascade and the objects linking to them
+        container_names = set()
+        pending = list(deletes)
+        while pending:
+            container_name = pending.pop()
+            if container_name in container_names:
+                continue
+            container_names.add(container_name)
+            pending.extend(self.cascades.get(container_name, ()) if cascade else ())
+        for container_name in list(container_names):
+            container_names.update(self.linked_containers.get(container_name, ()))
+        return sorted(container_names)
+
+    def _apply_deletes(self, deletes, containers, cascade=True):
+        # Compute the whole cascade in memory, then filter every container once and unlink what was deleted
+        by_name = {container_name: {obj.get('name'): obj for obj in objects} for container_name, objects in containers.items()}
+        for container_name, names in deletes.items():
+            if container_name not in by_name:
+                return [False, {'status_code': 400, 'status_msg': f'Container [{container_name}] was not caught.'}, None]
+            missing = [name for name in names if name not in by_name[container_name]]
+            if missing:
+                return [
+                    False,
+                    {'status_code': 404, 'status_msg': f'Object [{missing[0]}] does not exist in container [{container_name}].'},
+                    None
+                ]
+
+        deleted = {container_name: set() for container_name in containers}
+        pending = [(container_name, name) for container_name, names in deletes.items() for name in names]
+        while pending:
+            container_name, name = pending.pop()
+            if name in deleted[container_name]:
+                continue
+            deleted[container_name].add(name)
+            if cascade:
+                obj = by_name[container_name].get(name, {})
+                pending.extend(
+                    (target, linked_name)
+                    for target in self.cascades.get(container_name, ()) if target in containers
+                    for linked_name in (obj.get(f"linked_{target.lower()}") or {})
+                )
+
+        removed = {}
+        unlinked = {}
+        link_attributes = {f"linked_{container_name.lower()}": names for container_name, names in deleted.items() if names}
+        for container_name, objects in containers.items():
+            kept = [obj for obj in objects if obj.get('name') not in deleted[container_name]]
+            removed[container_name] = len(objects) - len(kept)
+            unlinked[container_name] = 0
+            for obj in kept:
+                changed = False
+                for attribute, names in link_attributes.items():
+                    links = obj.get(attribute)
+                    if isinstance(links, dict) and not names.isdisjoint(links):
+                        obj[attribute] = {name: value for name, value in links.items() if name not in names}
+                        changed = True
+                    elif isinstance(links, list) and not names.isdisjoint(links):
+                        obj[attribute] = [name for name in links if name not in names]
+                        changed = True
+                unlinked[container_name] += changed
+            objects[:] = kept
+
+        total_deleted = sum(removed.values())
+        return [
+            True,
+            {'status_code': 200, 'status_msg': f'Deleted [{total_deleted}] objects.'},
+            {
+                'deleted': {container_name: sorted(names) for container_name, names in deleted.items() if names},
+                'removed_objects': removed,
+                'unlinked_objects': unlinked,
+                'total_deleted': total_deleted
+            }
+        ]
+
+
+class GitHubFunctions(ContainerFormat):
     """
     A class used to interact with GitHub's API.
 
@@ -34,14 +605,40 @@ class GitHubFunctions:
         The description of the repository on GitHub.
     github_instance : Github
         An instance of the Github class from the PyGithub library.
+    repo_context : RepositoryContext
+        The holder of the repository handle shared by all operations of this object.
+    api_url : str
+        The base URL of GitHub's REST API.
+    validator_cache : ValidatorCache
+        The cache of ETag/Last-Modified validators and content for conditional reads.
+    object_cache : ObjectCache
+        The cache of decoded containers by blob SHA, fed with the containers this process commits.
+    session : requests.Session
+        The pooled session used for every raw request.
+    write_listeners : list
+        References to the callables notified with (container_name, objects, blob_sha) after containers are committed, see add_write_listener.
     lock_file_name : str
         The name of the lock file.
     main_branch_name : str
         The name of the main branch in the repository.
     object_files : dict
         A dictionary mapping object types to their corresponding file names.
+    sharded_containers : dict
+        A dictionary mapping the names of sharded containers to their ShardLayout.
+    single_file_containers : set
+        The names of the containers seen stored in a single file.
+    read_workers : int
+        The maximum number of shards, or containers caught together, read in parallel.
+    replica : LocalReplica
+        The local clone reads are served from, None when reads go through the REST API.
+    user_directory : UserDirectory
+        The cache of the repository's collaborators, fetched page by page as lookups need them.
+    billing_ttl : float
+        The number of seconds billing information is reused before it is fetched again.
+    billing_history : BillingHistory
+        The local time series every fetched billing sample is appended to, None to keep no history.
     """
-    def __init__(self, token, org, process_name):
+    def __init__(self, token, org, process_name, repo_ttl=None, api_url='https://api.github.com', validator_cache=None, sharded_containers=None, session=None, replica=None, object_cache=None, billing_history=None):
         """
         Constructs all the necessary attributes for the GitHubFunctions object.
 
@@ -53,12 +650,35 @@ class GitHubFunctions:
             The name of the organization on GitHub.
         process_name : str
             The name of the process using the GitHubFunctions object.
+        repo_ttl : float, optional
+            The number of seconds after which the repository handle is revalidated, by default None (never).
+        api_url : str, optional
+            The base URL of GitHub's REST API, by default 'https://api.github.com'.
+        validator_cache : ValidatorCache, optional
+            The cache used for conditional reads, by default a new ValidatorCache.
+        object_cache : ObjectCache, optional
+            The cache of decoded containers, by default the cache shared by every object of this API URL and organization.
+        sharded_containers : dict or list, optional
+            The containers stored in the sharded layout, either a dictionary mapping names to a ShardLayout or a list
+            of names using the default layout. Containers found with a shard manifest are detected on first read.
+        session : requests.Session, optional
+            The session every request, raw or through PyGithub, is sent with, by default the shared PooledSession, see configure_shared_session.
+        replica : LocalReplica, optional
+            A local clone of the repository to serve container and blob reads from, by default None. Writes still go
+            through the REST API and mark the replica stale, so the next read fetches the new commits first.
+        billing_history : BillingHistory, optional
+            The local time series fetched billing samples are appended to, by default None (no history).
         """
         self.token = token
+        self.api_url = api_url.rstrip('/')
         self.org_name = org
         self.repo_name = f"{org}_discovery"
         self.repo_desc = "A repository for all of the mediumroast.io application assets."
-        self.github_instance = Github(token)
+        self.session = session if session is not None else get_shared_session()
+        # PyGithub shares the session, so its requests are pooled and paced like the raw ones
+        self.github_instance = Github(auth=_CurrentToken(lambda: self.token), base_url=self.api_url)
+        use_session(self.github_instance, self.session)
+        self.repo_context = RepositoryContext(self.github_instance, f"{org}/{self.repo_name}", ttl=repo_ttl)
         self.lock_file_name = f"{process_name}.lock"
         self.main_branch_name = 'main'
         self.object_files = {
@@ -68,6 +688,71 @@ class GitHubFunctions:
             'Users': None,
             'Billings': None
         }
+        self.validator_cache = validator_cache if validator_cache is not None else ValidatorCache()
+        self.object_cache = object_cache if object_cache is not None else get_shared_object_cache(self.api_url, org, token)
+        self.write_listeners = []
+        self.stream_chunk_size = 1024 * 1024
+        self.inline_content_limit = 1024 * 1024
+        if sharded_containers is not None and not isinstance(sharded_containers, dict):
+            sharded_containers = {container_name: ShardLayout() for container_name in sharded_containers}
+        self.sharded_containers = dict(sharded_containers or {})
+        self.single_file_containers = set()
+        self.read_workers = 8
+        self.replica = replica
+        self.billing_ttl = 300
+        self.billing_history = billing_history
+        self._billings = None
+        self._billings_lock = threading.Lock()
+        self.user_directory = UserDirectory(self._fetch_user_page, f"/repos/{org}/{self.repo_name}/collaborators?per_page=100")
+
+    def set_token(self, token):
+        """
+        Replace the token used for every following request, raw or through PyGithub.
+
+        Parameters
+        ----------
+        token : str
+            The new token, e.g. a freshly minted installation token.
+        """
+        self.token = token
+
+    def use_token_refresher(self, refresher):
+        """
+        Follow the tokens of a TokenRefresher, each refreshed token is used from the next request on.
+
+        Parameters
+        ----------
+        refresher : TokenRefresher
+            The refresher returned by GitHubAuth.start_token_refresher.
+        """
+        refresher.add_refresh_listener(lambda token_info: self.set_token(token_info['token']))
+        self.set_token(refresher.get_token()['token'])
+
+    def get_repo_stats(self):
+        """
+        Get the counters for the repository handle used by this object.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success, a dictionary with status information, and the counters.
+        """
+        return [True, {'status_code': 200, 'status_msg': f'captured repository stats for [{self.repo_context.full_name}]'}, self.repo_context.get_stats()]
+
+    def get_rate_limit_stats(self):
+        """
+        Get the rate limit budget and wait-time counters of the token used by this object.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success, a dictionary with status information, and the counters.
+        """
+        scheduler = getattr(self.session, 'scheduler', None)
+        if scheduler is None:
+            return [False, {'status_code': 503, 'status_msg': 'rate limiting is disabled for this session'}, None]
+        limiter = scheduler.get_limiter(f'token {self.token}', urllib.parse.urlsplit(self.api_url).netloc)
+        return [True, {'status_code': 200, 'status_msg': f'captured rate limit stats for [{self.org_name}]'}, limiter.get_stats()]
 
     def get_sha(self, container_name, file_name, branch_name):
         """
@@ -88,7 +773,7 @@ class GitHubFunctions:
             A list containing a boolean indicating success or failure, a dictionary with status information, and the SHA of the file (or the error message in case of failure).
         """
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
+            repo = self.repo_context.get_repo()
             contents = repo.get_contents(f"{container_name}/{file_name}", ref=branch_name)
             return [True, {'status_code': 200, 'status_msg': f'captured sha for [{container_name}/{file_name}]'}, contents.sha]
         except Exception as e:
@@ -110,23 +795,67 @@ class GitHubFunctions:
         except Exception as e:
             return [False, f'ERROR: unable to capture current user info due to [{str(e)}]', str(e)]
         
+    def _fetch_user_page(self, url, etag=None):
+        # One page of collaborators, None when the page is unchanged since etag
+        response = self._request('GET', url, headers={'If-None-Match': etag} if etag else None)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        return response.json(), response.headers.get('ETag'), response.links.get('next', {}).get('url')
+
     def get_all_users(self):
         """
         Get all users who are collaborators on the repository.
 
+        The users come from the user directory, which only revalidates the pages older than its TTL.
+
         Returns
         -------
         list
             A list containing a boolean indicating success or failure, a status message, and a list of users' raw data (or the error message in case of failure).
         """
-        return [False, f'initial port completed but implementation unconfirmed, untested and unsupported', None]
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
-            collaborators = repo.get_collaborators()
-            return [True, 'SUCCESS: able to capture info for all users', [collaborator.raw_data for collaborator in collaborators]]
+            return [True, 'SUCCESS: able to capture info for all users', self.user_directory.get_all()]
         except Exception as e:
             return [False, f'ERROR: unable to capture info for all users due to [{str(e)}]', str(e)]
 
+    def find_users(self, attribute, value):
+        """
+        Find the collaborators whose attribute equals a value.
+
+        A lookup by login or id stops paging as soon as the user is found, see UserDirectory.find.
+
+        Parameters
+        ----------
+        attribute : str
+            The attribute of the user to match.
+        value : object
+            The value to match.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the matching users (or the error message in case of failure).
+        """
+        try:
+            return [True, f"SUCCESS: found all users where {attribute} = {value}", self.user_directory.find(attribute, value)]
+        except Exception as e:
+            return [False, f'ERROR: unable to find users due to [{str(e)}]', str(e)]
+
+    def refresh_users(self):
+        """
+        Revalidate every cached page of collaborators, transferring only the pages that changed.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the refresh counters (or the error message in case of failure).
+        """
+        try:
+            return [True, 'SUCCESS: refreshed the user directory', self.user_directory.refresh()]
+        except Exception as e:
+            return [False, f'ERROR: unable to refresh the user directory due to [{str(e)}]', str(e)]
+
     def create_repository(self):
         """
         Create a new repository in the organization.
@@ -155,10 +884,8 @@ class GitHubFunctions:
         list
             A list containing a boolean indicating success or failure, a status message, and the actions billings information as a dictionary (or the error message in case of failure).
         """
-        return [False, f'initial port completed but implementation unconfirmed, untested and unsupported', None]
         try:
-            url = f"https://api.github.com/orgs/{self.org_name}/settings/billing/actions"
-            response = requests.get(url, auth=HTTPBasicAuth(self.username, self.token))
+            response = self._request('GET', f"/orgs/{self.org_name}/settings/billing/actions")
 
             if response.status_code == 200:
                 return [True, 'SUCCESS: able to capture actions billings info', response.json()]
@@ -177,8 +904,7 @@ class GitHubFunctions:
             A list containing a boolean indicating success or failure, a status message, and the storage billings information as a dictionary (or the error message in case of failure).
         """
         try:
-            url = f"https://api.github.com/orgs/{self.org_name}/settings/billing/shared-storage"
-            response = requests.get(url, auth=HTTPBasicAuth(self.username, self.token))
+            response = self._request('GET', f"/orgs/{self.org_name}/settings/billing/shared-storage")
 
             if response.status_code == 200:
                 return [True, 'SUCCESS: able to capture storage billings info', response.json()]
@@ -186,8 +912,40 @@ class GitHubFunctions:
                 return [False, f'ERROR: unable to capture storage billings info due to [{response.status_code}]', None]
         except Exception as e:
             return [False, f'ERROR: unable to capture storage billings info due to [{str(e)}]', str(e)]
-    
-    
+
+    def get_billings(self, max_age=None):
+        """
+        Get the storage and actions billings information, fetched concurrently and reused for billing_ttl seconds.
+
+        Concurrent callers share one fetch. Every fetched sample is appended to billing_history when there is one.
+
+        Parameters
+        ----------
+        max_age : float, optional
+            The age in seconds up to which cached billings are reused, by default billing_ttl. Use 0 to force a fetch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary with the storage and actions billings (or the error message in case of failure).
+        """
+        max_age = self.billing_ttl if max_age is None else max_age
+        with self._billings_lock:
+            if self._billings is not None and time.monotonic() - self._billings[0] < max_age:
+                return [True, {'status_code': 200, 'status_msg': 'reused billings'}, copy.deepcopy(self._billings[1])]
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                storage = executor.submit(self.get_storage_billings)
+                actions = executor.submit(self.get_actions_billings)
+                storage, actions = storage.result(), actions.result()
+            for response in (storage, actions):
+                if not response[0]:
+                    return [False, {'status_code': 503, 'status_msg': response[1]}, response[2]]
+            billings = {'storage': storage[2], 'actions': actions[2]}
+            self._billings = (time.monotonic(), billings)
+            if self.billing_history is not None:
+                self.billing_history.append(self.org_name, billings)
+            return [True, {'status_code': 200, 'status_msg': 'captured billings'}, copy.deepcopy(billings)]
+
     def get_github_org(self):
         """
         Get the organization's information.
@@ -219,7 +977,7 @@ class GitHubFunctions:
         """
         branch_name = str(int(time.time()))
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
+            repo = self.repo_context.get_repo()
             main_branch = repo.get_branch(self.main_branch_name)
             ref = repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=main_branch.commit.sha)
             return [True, f"SUCCESS: created branch [{branch_name}]", ref.raw_data]
@@ -243,7 +1001,7 @@ class GitHubFunctions:
             A list containing a boolean indicating success or failure, a status message, and the pull request's raw data (or the error message in case of failure).
         """
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
+            repo = self.repo_context.get_repo()
             branch = repo.get_branch(branch_name)
             pull = repo.create_pull(
                 title=commit_description, 
@@ -271,7 +1029,269 @@ class GitHubFunctions:
                 None
             ]
         
-    def check_for_lock(self, container_name):
+    def get_head_sha(self, branch_name=None):
+        """
+        Get the SHA of the commit a branch currently points to.
+
+        The request is conditional, so polling an unchanged branch costs a 304.
+
+        Parameters
+        ----------
+        branch_name : str, optional
+            The name of the branch, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the commit SHA (or the error message in case of failure).
+        """
+        branch_name = branch_name if branch_name else self.main_branch_name
+        try:
+            key = ('ref', branch_name)
+            url = f"/repos/{self.org_name}/{self.repo_name}/git/ref/heads/{branch_name}"
+            response = self._request('GET', url, headers=self.validator_cache.get_headers(key))
+            sha = self.validator_cache.get(key) if response.status_code == 304 else None
+            if sha is None:
+                if response.status_code == 304:
+                    response = self._request('GET', url)
+                response.raise_for_status()
+                sha = response.json()['object']['sha']
+                self.validator_cache.put(key, sha, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            self.object_cache.set_head(branch_name, sha)
+            return [True, {'status_code': 200, 'status_msg': f'captured head of [{branch_name}]'}, sha]
+        except Exception as e:
+            return [False, {'status_code': 503, 'status_msg': f'unable to capture head of [{branch_name}] due to [{str(e)}]'}, str(e)]
+
+    def get_tree_files(self, commit_sha, container_names=None):
+        """
+        Get the blob SHA of every file in a commit with one request.
+
+        When the repository is too large for GitHub to list it in one recursive request, only the
+        container directories are listed, one directory at a time, see get_container_files.
+
+        Parameters
+        ----------
+        commit_sha : str
+            The SHA of the commit.
+        container_names : list, optional
+            The containers listed when the recursive listing is truncated, by default every container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping file paths to blob SHAs.
+        """
+        key = ('tree', commit_sha)
+        files = self.validator_cache.get(key)
+        if files is None:
+            try:
+                tree = self._request_json('GET', f"/repos/{self.org_name}/{self.repo_name}/git/trees/{commit_sha}", params={'recursive': 1})
+            except Exception as e:
+                return [False, {'status_code': self._error_status(e), 'status_msg': f'unable to list files of [{commit_sha}] due to [{str(e)}]'}, str(e)]
+            if tree.get('truncated'):
+                return self.get_container_files(commit_sha, container_names)
+            files = {entry['path']: entry['sha'] for entry in tree['tree'] if entry['type'] == 'blob'}
+            # A commit never changes, its listing stays valid without revalidation
+            self.validator_cache.put(key, files, etag=f'"{commit_sha}"', size=len(files) * 128)
+        return [True, {'status_code': 200, 'status_msg': f'listed files of [{commit_sha}]'}, dict(files)]
+
+    def get_container_files(self, commit_sha, container_names=None):
+        """
+        Get the blob SHA of the files of some containers in a commit, without listing the rest of the repository.
+
+        Every container directory and its shards directory are listed without recursion, so the listing holds the
+        container files, shard manifests, shards and lock files however many files the repository holds.
+
+        Parameters
+        ----------
+        commit_sha : str
+            The SHA of the commit.
+        container_names : list, optional
+            The names of the containers to list, by default every container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping file paths to blob SHAs.
+        """
+        if container_names is None:
+            container_names = [container_name for container_name, file_name in self.object_files.items() if file_name]
+        container_names = sorted(set(container_names))
+        key = ('tree', commit_sha, tuple(container_names))
+        files = self.validator_cache.get(key)
+        if files is None:
+            trees_path = f"/repos/{self.org_name}/{self.repo_name}/git/trees"
+            try:
+                root = self._request_json('GET', f"{trees_path}/{commit_sha}")['tree']
+                directories = [(entry['path'], entry['sha']) for entry in root if entry['type'] == 'tree' and entry['path'] in container_names]
+                files = {}
+                while directories:
+                    directory, tree_sha = directories.pop()
+                    for entry in self._request_json('GET', f"{trees_path}/{tree_sha}")['tree']:
+                        path = f"{directory}/{entry['path']}"
+                        if entry['type'] == 'blob':
+                            files[path] = entry['sha']
+                        elif entry['type'] == 'tree' and path == ShardLayout.manifest_path(directory).rsplit('/', 1)[0]:
+                            directories.append((path, entry['sha']))
+            except Exception as e:
+                return [False, {'status_code': self._error_status(e), 'status_msg': f'unable to list containers of [{commit_sha}] due to [{str(e)}]'}, str(e)]
+            self.validator_cache.put(key, files, etag=f'"{commit_sha}"', size=len(files) * 128)
+        return [True, {'status_code': 200, 'status_msg': f'listed containers [{", ".join(container_names)}] of [{commit_sha}]'}, dict(files)]
+
+    def commit_containers(self, containers, parent_sha, commit_description='Performed CRUD operation on objects.', remove_paths=None, expected_shas=None, max_rebases=3, branch_name=None):
+        """
+        Write several containers in a single commit and fast-forward the branch to it.
+
+        The commit is built with the Git Data API: one tree containing every changed container file
+        on top of the parent's tree, one commit, and a non-forced update of the branch ref. GitHub
+        rejects the ref update unless the new commit descends from the current head, so the parent SHA
+        acts as a compare-and-swap. If the head moved but none of the written containers changed
+        since they were read the commit is rebuilt on the new head, otherwise the write is refused.
+        Sharded containers only write the shards whose content changed and their manifest.
+
+        Parameters
+        ----------
+        containers : dict
+            A dictionary mapping container names to the list of objects to write.
+        parent_sha : str
+            The SHA of the commit the containers were read from.
+        commit_description : str, optional
+            The commit message, by default 'Performed CRUD operation on objects.'
+        remove_paths : list, optional
+            Paths to delete in the same commit, e.g. the lock files of the containers.
+        expected_shas : dict, optional
+            A dictionary mapping container names to the SHA they were read with, used to decide if a rebase is safe.
+        max_rebases : int, optional
+            The maximum number of times the commit is rebuilt on a moved head, by default 3.
+        branch_name : str, optional
+            The name of the branch to advance, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary with the commit SHA, parent SHA and the new SHA of each container (or the error message in case of failure).
+        """
+        repo_path = f"/repos/{self.org_name}/{self.repo_name}"
+        branch_name = branch_name if branch_name else self.main_branch_name
+        remove_paths = list(remove_paths or [])
+        expected_shas = expected_shas or {}
+        try:
+            for container_name in containers:
+                if container_name not in self.sharded_containers and container_name not in self.single_file_containers:
+                    # Never write a single file next to a container another process converted to shards
+                    manifest = self._read_manifest(container_name, parent_sha)
+                    if manifest is not None:
+                        self.sharded_containers.setdefault(container_name, ShardLayout.from_manifest(manifest[0]))
+            serialized = {container_name: self._serialize_container(container_name, objects) for container_name, objects in containers.items()}
+
+            for attempt in range(max_rebases + 1):
+                tree = []
+                for container_name, (guard_path, guard_sha, contents) in serialized.items():
+                    if guard_sha == expected_shas.get(container_name):
+                        continue
+                    for path, content in self._changed_files(container_name, contents, parent_sha).items():
+                        if content is None:
+                            tree.append({'path': path, 'mode': '100644', 'type': 'blob', 'sha': None})
+                        elif len(content) > self.inline_content_limit:
+                            # Large containers are uploaded as blobs, inline tree content is meant for small files
+                            self._request_json('POST', f"{repo_path}/git/blobs", json={'content': content, 'encoding': 'utf-8'})
+                            tree.append({'path': path, 'mode': '100644', 'type': 'blob', 'sha': git_blob_sha(content)})
+                        else:
+                            tree.append({'path': path, 'mode': '100644', 'type': 'blob', 'content': content})
+                tree += [{'path': path, 'mode': '100644', 'type': 'blob', 'sha': None} for path in remove_paths]
+                if tree:
+                    base_tree = self._request_json('GET', f"{repo_path}/git/commits/{parent_sha}")['tree']['sha']
+                    new_tree = self._request_json('POST', f"{repo_path}/git/trees", json={'base_tree': base_tree, 'tree': tree})
+                    commit = self._request_json('POST', f"{repo_path}/git/commits", json={
+                        'message': commit_description, 'tree': new_tree['sha'], 'parents': [parent_sha]
+                    })
+                    response = self._request(
+                        'PATCH',
+                        f"{repo_path}/git/refs/heads/{branch_name}",
+                        json={'sha': commit['sha'], 'force': False}
+                    )
+                    if self.replica is not None:
+                        self.replica.invalidate()
+                    if response.status_code != 422:
+                        response.raise_for_status()
+                        written = {}
+                        for container_name, (guard_path, guard_sha, contents) in serialized.items():
+                            self.object_cache.put(container_name, guard_sha, json.dumps(containers[container_name]))
+                            written[container_name] = guard_sha
+                        self.object_cache.record_commit(commit['sha'], written, branch_name)
+                        if branch_name == self.main_branch_name:
+                            for container_name, (guard_path, guard_sha, contents) in serialized.items():
+                                self._notify_write(container_name, containers[container_name], guard_sha)
+                        return [
+                            True,
+                            {'status_code': 200, 'status_msg': f"committed [{len(serialized)}] containers in [{commit['sha']}]"},
+                            {
+                                'commit_sha': commit['sha'],
+                                'parent_sha': parent_sha,
+                                'blobs': {container_name: guard_sha for container_name, (guard_path, guard_sha, contents) in serialized.items()}
+                            }
+                        ]
+                else:
+                    return [
+                        True,
+                        {'status_code': 200, 'status_msg': 'no container changes to commit'},
+                        {'commit_sha': parent_sha, 'parent_sha': parent_sha, 'blobs': dict(expected_shas)}
+                    ]
+
+                # The head moved, rebase only if the containers are still as they were read
+                head_sha = self.get_head_sha(branch_name)
+                if not head_sha[0]:
+                    return [False, head_sha[1], head_sha[2]]
+                head_files = self.get_tree_files(head_sha[2], set(serialized) | {path.split('/', 1)[0] for path in remove_paths})
+                if not head_files[0]:
+                    return head_files
+                head_files = head_files[2]
+                for container_name, (guard_path, guard_sha, contents) in serialized.items():
+                    if container_name in expected_shas and head_files.get(guard_path) != expected_shas[container_name]:
+                        return [
+                            False,
+                            {'status_code': 409, 'status_msg': f'container [{container_name}] changed since it was read, refusing to overwrite it'},
+                            head_sha[2]
+                        ]
+                remove_paths = [path for path in remove_paths if path in head_files]
+                parent_sha = head_sha[2]
+
+            return [False, {'status_code': 409, 'status_msg': f'[{branch_name}] kept moving, gave up after [{max_rebases}] rebases'}, parent_sha]
+        except requests.exceptions.HTTPError as e:
+            # GitHub reports write conflicts as 409 or 422, surface both as a conflict
+            status_code = 409 if e.response is not None and e.response.status_code in (409, 422) else 503
+            return [False, {'status_code': status_code, 'status_msg': f'unable to commit containers due to [{str(e)}]'}, str(e)]
+        except Exception as e:
+            return [False, {'status_code': 503, 'status_msg': f'unable to commit containers due to [{str(e)}]'}, str(e)]
+
+    def _changed_files(self, container_name, contents, ref):
+        # Single file containers are rewritten, sharded containers are diffed against the manifest at ref
+        if container_name not in self.sharded_containers:
+            return contents
+        return self._diff_shards(container_name, contents, self._read_manifest(container_name, ref))
+
+    def get_lock_files(self, branch_name=None, container_names=None):
+        """
+        List the files of the head of a branch with one recursive tree read, used to find the lock files of every container at once.
+
+        Parameters
+        ----------
+        branch_name : str, optional
+            The name of the branch, by default the main branch.
+        container_names : list, optional
+            The containers listed if the repository is too large for one recursive read, by default every container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping file paths to blob SHAs (or the error message in case of failure).
+        """
+        head_sha = self.get_head_sha(branch_name)
+        if not head_sha[0]:
+            return head_sha
+        return self.get_tree_files(head_sha[2], container_names)
+
+    def check_for_lock(self, container_name, files=None):
         """
         Check if a container is locked.
 
@@ -279,23 +1299,24 @@ class GitHubFunctions:
         ----------
         container_name : str
             The name of the container to check.
+        files : dict, optional
+            The files of the head of the main branch from get_lock_files, read if not given.
 
         Returns
         -------
         list
             A list containing a boolean indicating whether the container is locked or not, a status message, and the lock status (or the error message in case of failure).
         """
-        try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
-            contents = repo.get_contents(container_name)
-            lock_exists = any(content.path == f"{container_name}/{self.lock_file_name}" for content in contents)
-            if lock_exists:
-                return [True, f"container [{container_name}] is locked with lock file [{self.lock_file_name}]", lock_exists]
-            else:
-                return [False, f"container [{container_name}] is not locked with lock file [{self.lock_file_name}]", lock_exists]
-        except Exception as e:
-            return [False, str(e), None]
-        
+        if files is None:
+            listed = self.get_lock_files(container_names=[container_name])
+            if not listed[0]:
+                return [False, listed[1]['status_msg'], None]
+            files = listed[2]
+        lock_exists = f"{container_name}/{self.lock_file_name}" in files
+        if lock_exists:
+            return [True, f"container [{container_name}] is locked with lock file [{self.lock_file_name}]", lock_exists]
+        else:
+            return [False, f"container [{container_name}] is not locked with lock file [{self.lock_file_name}]", lock_exists]
 
     def lock_container(self, container_name):
         """
@@ -315,14 +1336,67 @@ class GitHubFunctions:
         """
         lock_file = f"{container_name}/{self.lock_file_name}"
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
-            latest_commit = repo.get_commits()[0]
+            repo = self.repo_context.get_repo()
             lock_response = repo.create_file(lock_file, f"Locking container [{container_name}] with [{lock_file}].", "", branch=self.main_branch_name)
             return [True, {"status_code": 200,"status_msg": f"Locked the container [{container_name}]"}, lock_response]
         except Exception as e:
             return [False, {"status_code": 504, "status_msg": f"FAILED: Unable to lock the container [{container_name}]"}, str(e)]
 
-    def unlock_container(self, container_name, commit_sha, branch_name=None):
+    def lock_containers(self, container_names, max_rebases=3):
+        """
+        Lock several containers at once by adding all their lock files in a single commit.
+
+        The commit is built on the head the lock files were checked against and the branch is
+        fast-forwarded to it without force, so either every lock is taken or none is. If the head
+        moved in between, the check is repeated on the new head.
+
+        Parameters
+        ----------
+        container_names : list
+            The names of the containers to lock.
+        max_rebases : int, optional
+            The number of times the lock commit is rebuilt on a moved head, by default 3.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the SHA of the lock commit (or the error message in case of failure).
+        """
+        repo_path = f"/repos/{self.org_name}/{self.repo_name}"
+        try:
+            for attempt in range(max_rebases + 1):
+                head_sha = self.get_head_sha()
+                if not head_sha[0]:
+                    return head_sha
+                listed = self.get_tree_files(head_sha[2], container_names)
+                if not listed[0]:
+                    return listed
+                for container_name in container_names:
+                    lock_exists = self.check_for_lock(container_name, listed[2])
+                    if lock_exists[0]:
+                        return [False, {'status_code': 423, 'status_msg': f'the container [{container_name}] is locked'}, lock_exists]
+                base_tree = self._request_json('GET', f"{repo_path}/git/commits/{head_sha[2]}")['tree']['sha']
+                new_tree = self._request_json('POST', f"{repo_path}/git/trees", json={'base_tree': base_tree, 'tree': self._lock_tree(container_names)})
+                commit = self._request_json('POST', f"{repo_path}/git/commits", json={
+                    'message': f"Locking containers [{', '.join(container_names)}] with [{self.lock_file_name}].",
+                    'tree': new_tree['sha'],
+                    'parents': [head_sha[2]]
+                })
+                response = self._request(
+                    'PATCH',
+                    f"{repo_path}/git/refs/heads/{self.main_branch_name}",
+                    json={'sha': commit['sha'], 'force': False}
+                )
+                if response.status_code != 422:
+                    response.raise_for_status()
+                    if self.replica is not None:
+                        self.replica.invalidate()
+                    return [True, {'status_code': 200, 'status_msg': f"locked [{len(container_names)}] containers in [{commit['sha']}]"}, commit['sha']]
+            return [False, {'status_code': 409, 'status_msg': f'[{self.main_branch_name}] kept moving, gave up locking after [{max_rebases}] rebases'}, None]
+        except Exception as e:
+            return [False, {'status_code': 504, 'status_msg': f'unable to lock the containers due to [{str(e)}]'}, str(e)]
+
+    def unlock_container(self, container_name, commit_sha, branch_name=None, files=None):
         """
         Unlock a container by deleting the lock file in it.
 
@@ -332,6 +1406,8 @@ class GitHubFunctions:
             The name of the container to unlock.
         branch_name : str
             The name of the branch where the container is located.
+        files : dict, optional
+            The files of the head of the branch from get_lock_files, read if not given.
 
         Returns
         -------
@@ -340,12 +1416,15 @@ class GitHubFunctions:
         """
         lock_file = f"{container_name}/{self.lock_file_name}"
         branch_name = branch_name if branch_name else self.main_branch_name
-        lock_exists = self.check_for_lock(container_name)
+        if files is None:
+            listed = self.get_lock_files(branch_name, [container_name])
+            files = listed[2] if listed[0] else {}
+        lock_exists = self.check_for_lock(container_name, files)
         if lock_exists[0]:
             try:
-                repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
-                file_contents = repo.get_contents(lock_file, ref=branch_name)
-                unlock_response = repo.delete_file(lock_file, f"Unlocking container [{container_name}]", file_contents.sha, branch=branch_name)
+                repo = self.repo_context.get_repo()
+                # The listing holds the blob SHA of the lock file, it does not have to be read again
+                unlock_response = repo.delete_file(lock_file, f"Unlocking container [{container_name}]", files[lock_file], branch=branch_name)
                 return [True, {"status_code": 200, "status_msg": f"Unlocked the container [{container_name}]"}, unlock_response]
             except Exception as e:
                 return [False, {"status_code": 504, "status_msg": f"Unable to unlock the container [{container_name}]"}, str(e)]
@@ -374,7 +1453,7 @@ class GitHubFunctions:
         """
         return [False, f'initial port completed but implementation unconfirmed, untested and unsupported', None]
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
+            repo = self.repo_context.get_repo()
             file_path = f"{container_name}/{file_name}"
             file_contents = repo.get_contents(file_path, ref=branch_name)
             delete_response = repo.delete_file(file_path, f"Delete object [{file_name}]", file_contents.sha, branch=branch_name)
@@ -382,65 +1461,396 @@ class GitHubFunctions:
         except Exception as e:
             return [False, { 'status_code': 503, 'status_msg': f'unable to delete object [{file_name}] from container [{container_name}]' }, str(e)]
 
-    def _custom_encode_uri_component(self, string):
-        return ''.join([urllib.parse.quote(char, safe='') if char in "!*'()" else urllib.parse.quote(char) for char in string])
+    def _request(self, method, url, headers=None, **kwargs):
+        if not url.startswith('http'):
+            url = f"{self.api_url}{url}"
+        request_headers = {
+            'Authorization': f'token {self.token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        request_headers.update(headers or {})
+        return self.session.request(method, url, headers=request_headers, **kwargs)
+
+    def _request_json(self, method, url, **kwargs):
+        response = self._request(method, url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def _get_contents_cached(self, file_path, ref, decoder, sizer=len):
+        # Conditional GET of the contents endpoint, a 304 is served from the validator cache
+        key = (file_path, ref)
+        if ref and re.fullmatch('[0-9a-f]{40}', ref):
+            # The content of a file at a commit never changes, a cached copy needs no revalidation
+            cached = self.validator_cache.get(key)
+            if cached is not None:
+                return cached
+        url = f"/repos/{self.org_name}/{self.repo_name}/contents/{urllib.parse.quote(file_path)}"
+        params = {'ref': ref} if ref else None
+        response = self._request('GET', url, headers=self.validator_cache.get_headers(key), params=params)
+        if response.status_code == 304:
+            cached = self.validator_cache.get(key)
+            if cached is not None:
+                return cached
+            # The entry was evicted after the validators were sent, fetch it unconditionally
+            response = self._request('GET', url, params=params)
+        response.raise_for_status()
+        value = decoder(response)
+        self.validator_cache.put(key, value, response.headers.get('ETag'), response.headers.get('Last-Modified'), sizer(value))
+        return value
+
+    def _decode_contents(self, response):
+        contents = response.json()
+        if contents.get('encoding') == 'base64':
+            return {'text': base64.b64decode(contents['content']).decode(), 'sha': contents['sha']}
+        # Above 1 MB the contents API omits the content, only the metadata is kept and the blob is streamed on demand
+        return {'sha': contents['sha']}
+
+    def _sizeof_decoded(self, decoded):
+        return len(decoded['text']) if 'text' in decoded else len(decoded['sha'])
+
+    def _decoded_objects(self, decoded):
+        # Parse the objects of a decoded container file, a large one is streamed from its blob only now
+        if 'text' in decoded:
+            return json.loads(decoded['text'])
+        return self._stream_blob_objects(decoded['sha'])
+
+    def _stream_blob_objects(self, sha):
+        response = self._request(
+            'GET',
+            f"/repos/{self.org_name}/{self.repo_name}/git/blobs/{sha}",
+            headers={'Accept': 'application/vnd.github.raw'},
+            stream=True
+        )
+        try:
+            response.raise_for_status()
+            return list(iter_json_array(response.iter_content(chunk_size=self.stream_chunk_size)))
+        finally:
+            response.close()
 
-    def _download_file(self, url, headers):
+    def _read_manifest(self, container_name, ref):
+        # Returns the decoded shard manifest and its blob SHA, or None if the container has no manifest at ref
         try:
-            download_result = requests.get(url, headers=headers)
-            download_result.raise_for_status()
-            return [True, download_result.content]
-        except requests.exceptions.RequestException as e:
-            if 'Request path contains unescaped characters' in str(e) or 'ERR_UNESCAPED_CHARACTERS' in str(e):
-                return [False, 'ERR_UNESCAPED_CHARACTERS']
-            return [False, str(e)]
+            decoded = self._read_decoded(ShardLayout.manifest_path(container_name), ref)
+        except (requests.exceptions.HTTPError, FileNotFoundError) as e:
+            if self._error_status(e) == 404:
+                return None
+            raise
+        return json.loads(decoded['text']), decoded['sha']
+
+    def _read_decoded(self, file_path, ref):
+        # Read a file from the replica when there is one, otherwise with a conditional GET
+        if self.replica is not None:
+            data, sha = self.replica.read_file(file_path, ref)
+            return {'text': data.decode(), 'sha': sha}
+        return self._get_contents_cached(file_path, ref, self._decode_contents, self._sizeof_decoded)
+
+    def _read_blob_text(self, sha):
+        # Blobs are addressed by content, a cached shard never has to be revalidated
+        if self.replica is not None:
+            return self.replica.read_blob(sha).decode()
+        key = ('blob', sha)
+        cached = self.validator_cache.get(key)
+        if cached is not None:
+            return cached
+        response = self._request(
+            'GET',
+            f"/repos/{self.org_name}/{self.repo_name}/git/blobs/{sha}",
+            headers={'Accept': 'application/vnd.github.raw'}
+        )
+        response.raise_for_status()
+        text = response.content.decode()
+        self.validator_cache.put(key, text, etag=f'"{sha}"')
+        return text
+
+    def _read_shards(self, manifest, prefixes):
+        shas = [manifest['shards'][prefix]['sha'] for prefix in sorted(prefixes) if prefix in manifest['shards']]
+        if not shas:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.read_workers, len(shas))) as executor:
+            texts = list(executor.map(self._read_blob_text, shas))
+        return [obj for text in texts for obj in json.loads(text)]
+
+    def _read_written(self, container_name, ref):
+        # Read-your-writes: while the ref still points to a commit of ours, serve what we wrote from the object cache
+        if not self.object_cache.was_written(container_name):
+            return None
+        commit_sha = ref
+        if not re.fullmatch('[0-9a-f]{40}', ref):
+            # Only ask for the head while the last head seen is a commit of ours that wrote the container,
+            # once another process has moved the branch the container is read like any other
+            if self.object_cache.blob_at(self.object_cache.get_head(ref), container_name) is None:
+                return None
+            head_sha = self.get_head_sha(ref)
+            if not head_sha[0]:
+                return None
+            commit_sha = head_sha[2]
+        sha = self.object_cache.blob_at(commit_sha, container_name)
+        text = self.object_cache.get(container_name, sha) if sha is not None else None
+        if text is None:
+            return None
+        return json.loads(text), sha
+
+    def _read_container(self, container_name, ref, keys=None):
+        # Hide the storage layout of a container, returns its objects and the SHA that guards it
+        layout = self.sharded_containers.get(container_name)
+        written = self._read_written(container_name, ref)
+        if written is not None:
+            key = layout.key if layout is not None else 'name'
+            objects = written[0] if keys is None else [obj for obj in written[0] if obj.get(key) in keys]
+            return objects, written[1]
+        if layout is None:
+            file_path = f"{container_name}/{self.object_files[container_name]}"
+            try:
+                # Cache the decoded text rather than the parsed objects so every caller gets objects it may mutate
+                decoded = self._read_decoded(file_path, ref)
+                objects = self._decoded_objects(decoded)
+                self.single_file_containers.add(container_name)
+                if keys is not None:
+                    objects = [obj for obj in objects if obj.get('name') in keys]
+                return objects, decoded['sha']
+            except (requests.exceptions.HTTPError, FileNotFoundError) as e:
+                # A missing container file may mean the container was migrated to the sharded layout
+                if self._error_status(e) != 404:
+                    raise
+                manifest = self._read_manifest(container_name, ref)
+                if manifest is None:
+                    raise
+                layout = self.sharded_containers.setdefault(container_name, ShardLayout.from_manifest(manifest[0]))
+        else:
+            manifest = self._read_manifest(container_name, ref)
+            if manifest is None:
+                raise IOError(f'container [{container_name}] has no shard manifest, convert it with migrate_to_shards')
+        if keys is None:
+            cached = self.object_cache.get(container_name, manifest[1])
+            if cached is not None:
+                return json.loads(cached), manifest[1]
+            objects = self._read_shards(manifest[0], manifest[0]['shards'])
+            self.object_cache.put(container_name, manifest[1], json.dumps(objects))
+            return objects, manifest[1]
+        # Only the shards that can hold the requested keys are fetched
+        objects = self._read_shards(manifest[0], {layout.prefix_of(key) for key in keys})
+        return [obj for obj in objects if obj.get(layout.key) in keys], manifest[1]
+
+    def migrate_to_shards(self, container_name, layout=None, commit_description=None):
+        """
+        Convert a single file container to the sharded layout.
+
+        The shards and the manifest are written and the container file is removed in one commit, so readers
+        see either the old or the new layout. The conversion is refused if the main branch moves meanwhile.
 
-    def _re_encode_download_url(self, url, original_file_name):
-        url_parts = url.split('/')
-        last_part = url_parts.pop()
-        url_parts.pop()
-        alt_last_part = last_part.split('?')
-        query_params = alt_last_part[-1] if len(alt_last_part) > 1 else ''
-        return f"{'/'.join(url_parts)}/{original_file_name}{'?' + query_params if query_params else ''}"
+        Parameters
+        ----------
+        container_name : str
+            The name of the container to convert.
+        layout : ShardLayout, optional
+            The layout to use, by default ShardLayout() which shards by the hash of the name.
+        commit_description : str, optional
+            The commit message, by default 'Converted [container_name] to sharded storage.'
 
-    def read_blob(self, file_name):
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the commit information (or the error message in case of failure).
+        """
+        layout = layout if layout else ShardLayout()
+        commit_description = commit_description if commit_description else f'Converted [{container_name}] to sharded storage.'
+        head_sha = self.get_head_sha()
+        if not head_sha[0]:
+            return head_sha
+        try:
+            if self._read_manifest(container_name, head_sha[2]) is not None:
+                return [True, {'status_code': 200, 'status_msg': f'container [{container_name}] is already sharded'}, None]
+            file_path = f"{container_name}/{self.object_files[container_name]}"
+            decoded = self._get_contents_cached(file_path, head_sha[2], self._decode_contents, self._sizeof_decoded)
+            objects = self._decoded_objects(decoded)
+        except Exception as e:
+            return [False, {'status_code': 503, 'status_msg': f'unable to read container [{container_name}] due to [{str(e)}]'}, str(e)]
+
+        previous_layout = self.sharded_containers.get(container_name)
+        self.sharded_containers[container_name] = layout
+        committed = self.commit_containers({container_name: objects}, head_sha[2], commit_description, remove_paths=[file_path], max_rebases=0)
+        if not committed[0]:
+            if previous_layout is None:
+                del self.sharded_containers[container_name]
+            else:
+                self.sharded_containers[container_name] = previous_layout
+            return committed
+        return [True, {'status_code': 200, 'status_msg': f'converted [{len(objects)}] objects in [{container_name}] to sharded storage'}, committed[2]]
+
+    def read_blob(self, file_name, use_cache=True):
         """
         Read a blob (file) from a container (directory) in a specific branch.
 
+        The raw content is requested directly from the contents API, one round trip instead of a metadata
+        request followed by a download. The request is conditional, so an unchanged blob costs a 304.
+
         Parameters
         ----------
         file_name : str
             The name of the blob to read with a complete path to the file (e.g. dirname/filename.ext).
+        use_cache : bool, optional
+            Whether to keep the blob in the validator cache, by default True.
 
         Returns
         -------
         list
             A list containing a boolean indicating success or failure, a status message, and the blob's raw data (or the error message in case of failure).
         """
-        original_file_name_encoded = self._custom_encode_uri_component(file_name)
-        encoded_file_name = urllib.parse.quote(file_name)
-        object_url = f"https://api.github.com/repos/{self.org_name}/{self.repo_name}/contents/{encoded_file_name}"
-        headers = {'Authorization': 'token ' + self.token}
-
         try:
-            result = requests.get(object_url, headers=headers)
-            result.raise_for_status()
-            result_json = result.json()
-            download_url = result_json['download_url']
+            blob = self._fetch_blob(file_name, use_cache)
+            return [True, {'status_code': 200, 'status_msg': f'read object [{file_name}]'}, blob]
+        except Exception as e:
+            return [False, {'status_code': self._error_status(e), 'status_msg': f'unable to read object [{file_name}] due to [{str(e)}].'}, str(e)]
+
+    def _fetch_blob(self, file_name, use_cache=True):
+        if self.replica is not None:
+            return self.replica.read_file(file_name, self.main_branch_name)[0]
+        url = f"/repos/{self.org_name}/{self.repo_name}/contents/{urllib.parse.quote(file_name)}"
+        raw = {'Accept': 'application/vnd.github.raw'}
+        if not use_cache:
+            response = self._request('GET', url, headers=raw)
+            response.raise_for_status()
+            return response.content
+        key = (file_name, None, 'raw')
+        response = self._request('GET', url, headers={**raw, **self.validator_cache.get_headers(key)})
+        if response.status_code == 304:
+            cached = self.validator_cache.get(key)
+            if cached is not None:
+                return cached
+            response = self._request('GET', url, headers=raw)
+        response.raise_for_status()
+        self.validator_cache.put(key, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response.content
+
+    def _save_blob(self, file_name, target_path):
+        # Stream the raw content to a temporary file next to the target so a failed download leaves no partial file
+        url = f"/repos/{self.org_name}/{self.repo_name}/contents/{urllib.parse.quote(file_name)}"
+        os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+        partial_path = f"{target_path}.partial"
+        if self.replica is not None:
+            data = self.replica.read_file(file_name, self.main_branch_name)[0]
+            with open(partial_path, 'wb') as file:
+                file.write(data)
+            os.replace(partial_path, target_path)
+            return {'path': target_path, 'size': len(data)}
+        size = 0
+        with self._request('GET', url, headers={'Accept': 'application/vnd.github.raw'}, stream=True) as response:
+            response.raise_for_status()
+            with open(partial_path, 'wb') as file:
+                for chunk in response.iter_content(chunk_size=self.stream_chunk_size):
+                    file.write(chunk)
+                    size += len(chunk)
+        os.replace(partial_path, target_path)
+        return {'path': target_path, 'size': size}
+
+    def _error_status(self, error):
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code
+        if isinstance(error, FileNotFoundError):
+            return 404
+        return 503
+
+    def _with_retries(self, fetch, retry_policy):
+        # Retry connection errors, rate limiting and server errors, a missing file fails immediately
+        for attempt in range(retry_policy.max_attempts):
+            if attempt:
+                retry_policy.wait(attempt)
+            try:
+                return fetch(), attempt + 1
+            except requests.exceptions.HTTPError as e:
+                status_code = self._error_status(e)
+                if (status_code < 500 and status_code != 429) or attempt + 1 == retry_policy.max_attempts:
+                    raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt + 1 == retry_policy.max_attempts:
+                    raise
+
+    def iter_blobs(self, file_names, target_dir=None, max_workers=8, retry_policy=None, progress=None):
+        """
+        Download many blobs through a bounded thread pool, yielding each result as soon as it is ready.
+
+        At most max_workers downloads run at a time and at most twice as many results are held, so the
+        file names may be a generator over a large corpus. Transient failures are retried per blob.
 
-            blob_data = self._download_file(download_url, headers)
+        Parameters
+        ----------
+        file_names : iterable
+            The names of the blobs to read with complete paths to the files.
+        target_dir : str, optional
+            A directory to stream the blobs to, keeping their repository paths. By default the content is returned.
+        max_workers : int, optional
+            The maximum number of concurrent downloads, by default 8.
+        retry_policy : RetryPolicy, optional
+            The retry policy applied to each blob, by default RetryPolicy(max_attempts=3).
+        progress : callable, optional
+            Called as progress(file_name, result, completed) after each blob.
+
+        Yields
+        ------
+        tuple
+            The file name and a list containing a boolean indicating success or failure, a status message, and the
+            content, or a dictionary with the local path and size when target_dir is set (or the error message in case of failure).
+        """
+        retry_policy = retry_policy if retry_policy else RetryPolicy(max_attempts=3)
 
-            if blob_data[0]:
-                return [True, {'status_code': 200, 'status_msg': f'read object [{file_name}]'}, blob_data[1]]
+        def download(file_name):
+            if target_dir is None:
+                fetch = lambda: self._fetch_blob(file_name, use_cache=False)
             else:
-                if blob_data[1] == 'ERR_UNESCAPED_CHARACTERS':
-                    download_url = self._re_encode_download_url(download_url, original_file_name_encoded)
-                    blob_data = self._download_file(download_url, headers)
-                    if blob_data[0]:
-                        return [True, {'status_code': 200, 'status_msg': f'read object [{file_name}]'}, blob_data[1]]
-                return [False, {'status_code': 503, 'status_msg': f'unable to read object [{file_name}] due to [{blob_data[1]}].'}, blob_data[1]]
-        except Exception as e:
-            return [False, {'status_code': 503, 'status_msg': f'unable to read object [{file_name}]'}, str(e)]
+                fetch = lambda: self._save_blob(file_name, os.path.join(target_dir, *file_name.split('/')))
+            try:
+                data, attempts = self._with_retries(fetch, retry_policy)
+                return [True, {'status_code': 200, 'status_msg': f'read object [{file_name}]', 'attempts': attempts}, data]
+            except Exception as e:
+                return [False, {'status_code': self._error_status(e), 'status_msg': f'unable to read object [{file_name}] due to [{str(e)}].'}, str(e)]
+
+        completed = 0
+        file_names = iter(file_names)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            while True:
+                for file_name in file_names:
+                    pending[executor.submit(download, file_name)] = file_name
+                    if len(pending) >= max_workers * 2:
+                        break
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_name = pending.pop(future)
+                    result = future.result()
+                    completed += 1
+                    if progress:
+                        progress(file_name, result, completed)
+                    yield file_name, result
+
+    def download_blobs(self, file_names, target_dir, max_workers=8, retry_policy=None, progress=None):
+        """
+        Download many blobs to a local directory through a bounded thread pool, see iter_blobs.
+
+        Parameters
+        ----------
+        file_names : iterable
+            The names of the blobs to read with complete paths to the files.
+        target_dir : str
+            The directory to stream the blobs to, keeping their repository paths.
+        max_workers : int, optional
+            The maximum number of concurrent downloads, by default 8.
+        retry_policy : RetryPolicy, optional
+            The retry policy applied to each blob, by default RetryPolicy(max_attempts=3).
+        progress : callable, optional
+            Called as progress(file_name, result, completed) after each blob.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating if every blob was downloaded, a dictionary with status information, and a dictionary mapping each file name to its result.
+        """
+        results = dict(self.iter_blobs(file_names, target_dir, max_workers, retry_policy, progress))
+        failed = len([result for result in results.values() if not result[0]])
+        if failed:
+            return [False, {'status_code': 207, 'status_msg': f'downloaded [{len(results) - failed}] objects, [{failed}] failed'}, results]
+        return [True, {'status_code': 200, 'status_msg': f'downloaded [{len(results)}] objects to [{target_dir}]'}, results]
 
     def read_blob_orig(self, file_name):
         """
@@ -451,10 +1861,10 @@ class GitHubFunctions:
         object_url = f"https://api.github.com/repos/{self.org_name}/{self.repo_name}/contents/{encoded_file_name}"
         headers = {'Authorization': 'token ' + self.token}
         try:
-            result = requests.get(object_url, headers=headers)
+            result = self.session.get(object_url, headers=headers)
             result_json = result.json()
             download_url = result_json['download_url']
-            download_result = requests.get(download_url)
+            download_result = self.session.get(download_url)
             bin_file = download_result.content
             return [
                 True, 
@@ -492,7 +1902,7 @@ class GitHubFunctions:
         """
         return [False, f'initial port completed but implementation unconfirmed, untested and unsupported', None]
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
+            repo = self.repo_context.get_repo()
             file_path = f"{container_name}/{file_name}"
             blob = base64.b64encode(blob.encode()).decode()
             if sha:
@@ -522,9 +1932,15 @@ class GitHubFunctions:
         list
             A list containing a boolean indicating success or failure, a status message, and the write response's raw data (or the error message in case of failure).
         """
+        if container_name in self.sharded_containers:
+            # Sharded containers are written with a single commit touching only the changed shards
+            head_sha = self.get_head_sha(ref)
+            if not head_sha[0]:
+                return head_sha
+            return self.commit_containers({container_name: obj}, head_sha[2], f"Update objects in [{container_name}]", branch_name=ref)
         content_to_transmit = json.dumps(obj)
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
+            repo = self.repo_context.get_repo()
             file_path = f"{container_name}/{self.object_files[container_name]}"
             obj_sha = self.get_sha(container_name, self.object_files[container_name], ref)[2]
             # file_contents = repo.get_contents(file_path, ref=ref, sha=sha)
@@ -561,16 +1977,62 @@ class GitHubFunctions:
                 str(e)
             ]
         
-    def read_objects(self, container_name, branch_name=None):
+    def get_container_sha(self, container_name, branch_name=None):
+        """
+        Get the blob SHA of a container file without parsing its objects.
+
+        The request is conditional, so an unchanged container costs a 304 and primes the cache used by read_objects.
+        With a replica the SHA is read from the local clone and no request is made.
+        For a sharded container the blob SHA of its manifest is returned, which changes whenever any shard changes.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+        branch_name : str, optional
+            The name of the branch or the SHA of the commit, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the blob SHA (or the error message in case of failure).
+        """
+        try:
+            branch_name = branch_name if branch_name else self.main_branch_name
+            sha = None
+            if container_name not in self.sharded_containers:
+                file_path = f"{container_name}/{self.object_files[container_name]}"
+                try:
+                    sha = self._read_decoded(file_path, branch_name)['sha']
+                    self.single_file_containers.add(container_name)
+                except (requests.exceptions.HTTPError, FileNotFoundError) as e:
+                    if self._error_status(e) != 404:
+                        raise
+            if sha is None:
+                manifest = self._read_manifest(container_name, branch_name)
+                if manifest is None:
+                    raise IOError(f'container [{container_name}] has neither a container file nor a shard manifest')
+                self.sharded_containers.setdefault(container_name, ShardLayout.from_manifest(manifest[0]))
+                sha = manifest[1]
+            return [True, {'status_code': 200, 'status_msg': f'captured sha for container [{container_name}]'}, sha]
+        except Exception as e:
+            return [False, {'status_code': 423, 'status_msg': f'unable to capture sha for container [{container_name}] due to [{str(e)}]'}, str(e)]
+
+    def read_objects(self, container_name, branch_name=None, keys=None):
         """
         Read all objects from a container in a specific branch.
 
+        The storage layout is hidden from the caller: a sharded container is read from its manifest and
+        shards, fetching the shards in parallel, or only the shards that can hold the requested keys.
+
         Parameters
         ----------
         container_name : str
             The name of the container from which to read objects.
         branch_name : str
             The name of the branch where the container is located.
+        keys : iterable, optional
+            Only return the objects whose key attribute (the name unless the layout says otherwise) is in keys.
 
         Returns
         -------
@@ -578,18 +2040,15 @@ class GitHubFunctions:
             A list containing a boolean indicating success or failure, a status message, and the objects' raw data (or the error message in case of failure).
         """
         try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
             branch_name = branch_name if branch_name else self.main_branch_name
-            file_path = f"{container_name}/{self.object_files[container_name]}"
-            file_contents = repo.get_contents(file_path, ref=branch_name)
-            decoded_content = base64.b64decode(file_contents.content).decode()
+            objects, sha = self._read_container(container_name, branch_name, set(keys) if keys is not None else None)
             return [
                 True, 
                 {
                     'status_msg': f"SUCCESS: read objects from container [{container_name}]",
                     'status_code': 200
                 }, 
-                {"mr_json": json.loads(decoded_content), "sha": file_contents.sha}
+                {"mr_json": objects, "sha": sha}
             ]
         except Exception as e:
             return [
@@ -602,20 +2061,145 @@ class GitHubFunctions:
             ]
     
 
-    def update_object(self, updates):
+    def _graphql_url(self):
+        # GitHub Enterprise Server serves GraphQL next to the REST API, e.g. https://<host>/api/graphql
+        if self.api_url.endswith('/api/v3'):
+            return f"{self.api_url[:-len('/v3')]}/graphql"
+        return f"{self.api_url}/graphql"
+
+    def read_many_graphql(self, container_names=('Studies', 'Companies', 'Interactions'), branch_name=None):
         """
-        Update an object in a container in a specific branch.
+        Read several containers and their lock status with one GraphQL query.
+
+        The query resolves the branch to a commit and fetches, at that commit, the file of every container
+        and the listing of its directory. Containers GraphQL cannot return in full, sharded containers or
+        files too large to be inlined, are read with read_objects at the same commit. The files read are
+        put in the validator cache, so later reads at the commit cost no request.
+
+        Parameters
+        ----------
+        container_names : iterable, optional
+            The names of the containers to read, by default Studies, Companies and Interactions.
+        branch_name : str, optional
+            The name of the branch, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary with the commit SHA,
+            the read_objects response of every container under objects and the check_for_lock response of every container under locks.
+        """
+        container_names = list(container_names)
+        branch_name = branch_name if branch_name else self.main_branch_name
+        fields = [f'head: object(expression: {json.dumps(branch_name)}) {{ oid }}']
+        for number, container_name in enumerate(container_names):
+            file_path = f"{container_name}/{self.object_files[container_name]}"
+            fields.append(f'file{number}: object(expression: {json.dumps(f"{branch_name}:{file_path}")}) {{ ... on Blob {{ oid text isTruncated }} }}')
+            fields.append(f'dir{number}: object(expression: {json.dumps(f"{branch_name}:{container_name}")}) {{ ... on Tree {{ entries {{ name type }} }} }}')
+        query = 'query($owner: String!, $name: String!) { repository(owner: $owner, name: $name) { ' + ' '.join(fields) + ' } }'
+        try:
+            response = self._request_json('POST', self._graphql_url(), json={
+                'query': query, 'variables': {'owner': self.org_name, 'name': self.repo_name}
+            })
+            if response.get('errors'):
+                raise IOError('; '.join(error.get('message', str(error)) for error in response['errors']))
+            repository = response['data']['repository']
+            if repository is None or repository['head'] is None:
+                raise FileNotFoundError(f'[{branch_name}] was not found in [{self.repo_name}]')
+        except Exception as e:
+            return [False, {'status_code': self._error_status(e), 'status_msg': f'unable to read containers with GraphQL due to [{str(e)}]'}, str(e)]
+        commit_sha = repository['head']['oid']
+
+        objects = {}
+        locks = {}
+        for number, container_name in enumerate(container_names):
+            blob = repository[f'file{number}']
+            if blob is not None and blob.get('text') is not None and not blob.get('isTruncated') and container_name not in self.sharded_containers:
+                file_path = f"{container_name}/{self.object_files[container_name]}"
+                self.validator_cache.put((file_path, commit_sha), {'text': blob['text'], 'sha': blob['oid']}, etag=f'"{blob["oid"]}"', size=len(blob['text']))
+                self.single_file_containers.add(container_name)
+                objects[container_name] = [
+                    True,
+                    {'status_msg': f"SUCCESS: read objects from container [{container_name}]", 'status_code': 200},
+                    {'mr_json': json.loads(blob['text']), 'sha': blob['oid']}
+                ]
+            else:
+                objects[container_name] = self.read_objects(container_name, commit_sha)
+            entries = (repository[f'dir{number}'] or {}).get('entries') or []
+            files = {f"{container_name}/{entry['name']}" for entry in entries if entry['type'] == 'blob'}
+            locks[container_name] = self.check_for_lock(container_name, files)
+        return [
+            True,
+            {'status_code': 200, 'status_msg': f'read [{len(container_names)}] containers at [{commit_sha}] with GraphQL'},
+            {'commit_sha': commit_sha, 'objects': objects, 'locks': locks}
+        ]
+
+    def snapshot(self, container_names=('Studies', 'Companies', 'Interactions'), ref=None):
+        """
+        Read several containers as of one commit.
+
+        The branch is resolved to a commit SHA once and every container is read at that SHA in
+        parallel, so the containers are consistent with each other even while other processes write.
+        A snapshot of a commit never changes and is kept in the validator cache without revalidation.
+
+        Parameters
+        ----------
+        container_names : iterable, optional
+            The names of the containers to read, by default Studies, Companies and Interactions.
+        ref : str, optional
+            A branch name or commit SHA, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the Snapshot (or the error message in case of failure).
+        """
+        container_names = tuple(container_names)
+        ref = ref if ref else self.main_branch_name
+        if re.fullmatch('[0-9a-f]{40}', ref):
+            commit_sha = ref
+        else:
+            head_sha = self.get_head_sha(ref)
+            if not head_sha[0]:
+                return head_sha
+            commit_sha = head_sha[2]
+        key = ('snapshot', commit_sha, container_names)
+        snapshot = self.validator_cache.get(key)
+        if snapshot is not None:
+            return [True, {'status_code': 200, 'status_msg': f'reused snapshot of [{commit_sha}]'}, snapshot]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.read_workers, len(container_names)))) as executor:
+            read_responses = list(executor.map(lambda container: self.read_objects(container, commit_sha), container_names))
+        for read_response in read_responses:
+            if not read_response[0]:
+                return read_response
+        snapshot = Snapshot(commit_sha, dict(zip(container_names, (read_response[2] for read_response in read_responses))))
+        size = sum(len(json.dumps(read_response[2]['mr_json'])) for read_response in read_responses)
+        self.validator_cache.put(key, snapshot, etag=f'"{commit_sha}"', size=size)
+        return [True, {'status_code': 200, 'status_msg': f'captured snapshot of [{len(container_names)}] containers at [{commit_sha}]'}, snapshot]
+
+    def update_object(self, updates, optimistic=False, retry_policy=None):
+        """
+        Update objects in one or more containers.
+
+        All updates for a container are applied in memory and each changed container is written once,
+        no matter how many of its objects are updated. By default the containers are caught (locked) while the updates are applied. With optimistic set
+        the lock files are skipped: the containers are read with their SHAs, updated in memory and written
+        conditioned on those SHAs, and on a conflict the whole cycle is retried, see mutate_containers.
 
         Parameters
         ----------
 
         updates : dict
             A dictionary containing the updates to apply to the object.
+        optimistic : bool, optional
+            If True, use lock-free compare-and-swap writes instead of lock files, by default False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes, by default RetryPolicy().
 
         Returns
         -------
         list
-            A list containing a boolean indicating success or failure, a status message, and the updated object (or the error message in case of failure).
+            A list containing a boolean indicating success or failure, a status message, and a dictionary with the number of changed objects per container (or the error message in case of failure).
         """
         # Updates can look like this
         # updates = {
@@ -642,26 +2226,19 @@ class GitHubFunctions:
         
         # Get the containers and put them into a list called my_containers
         my_containers = list(updates.keys())
+        commit_description = f"Updated objects in [{', '.join(my_containers)}]."
 
-        # For each container in the list of containers, for that container first check to see 
-        # if the system flag is set to False. If it is then check to see if the key is in the white list.
-        # If it is not in the white list return an error message.
-        # NOTE: Commenting out as this may not be needed since catch reads the objects
-        # for container in my_containers:
-
-        #         # Get the current objects from the container
-        #         read_response = self.read_objects(container)
-        #         if not read_response[0]:
-        #             return [
-        #                 False,
-        #                 {
-        #                     'status_code': read_response[1]['status_code'],
-        #                     'status_msg': 'Failed to read objects from container [{}].'.format(container)
-        #                 },
-        #                 None
-        #             ]
-        #         updates[container]['objects'] = read_response[2]['mr_json']
+        if optimistic:
+            applied = []
 
+            def apply_updates(containers):
+                applied[:] = [self._apply_updates(updates, containers)]
+                return applied[0]
+
+            mutated = self.mutate_containers(my_containers, apply_updates, commit_description, retry_policy)
+            if not mutated[0]:
+                return mutated
+            return [True, {'status_code': 200, 'status_msg': applied[0][1]['status_msg']}, applied[0][2]]
 
         # Catch the containers for modification
         repo_metadata = {
@@ -688,133 +2265,175 @@ class GitHubFunctions:
                 caught
             ]
         
-        # Loop through the containers and update the objects
-        for container_name in my_containers:
-            # Convert the white_list to a set for efficient set operations
-            # NOTICE: the two lines below are added because of processing problems with Caffeine.
-            #         Until we understand what the problems are we will keep this code in place.
-            with open('/dev/null', 'w') as f:
-                f.write(json.dumps(updates))
-            white_list_set = set(updates[container_name]['white_list'])
-            
-
-            # Capture the system flag
-            system = updates[container_name]['system']
-
-            # Get the current objects from the dictionary
-            current_objects = caught[2]['containers'][container_name]['objects']
-
-            # Get the updates from the dictionary
-            updates = updates[container_name]['updates']
-            # Loop through the updates, find the object(s) to update, and then perform the updates
-            for my_obj in updates.keys():
-                obj_name = my_obj
-                obj = None
-                # Remove the object from the list of objects so we can add it back later
-                for item in current_objects:
-                    if item.get('name') == obj_name:  # assuming 'name' is the relevant key in the dictionaries
-                        obj = item
-                        # Remove object from the list
-                        current_objects.remove(item)
-                        break
-                # Check to see if the object exists
-                if obj is None:
-                    return [
-                        False,
-                        {
-                            'status_code': 404,
-                            'status_msg': 'Object [{}] does not exist in container [{}].'.format(obj_name, container_name)
-                        },
-                        None
-                    ]
-                if not system:
-                    # Check to see if the updates are in the white list
-                    keys_set = set(updates[my_obj].keys())
-
-                    # Find the keys that are not allowed by subtracting the white_list from the keys
-                    not_allowed_keys = keys_set - white_list_set
-
-                    # If there are any not allowed keys, return the error for the first encountered key
-                    if not_allowed_keys:
-                        first_not_allowed_key = next(iter(not_allowed_keys))
-                        return [
-                            False, 
-                            {
-                                'status_code': 403, 
-                                'status_msg': f'Updating the key [{first_not_allowed_key}] is not supported in container [{container_name}].'
-                            },
-                            None
-                        ]
-                
-                # Check to see if we should update the object using the updates dictionary
-                for key, value in updates[my_obj].items():
-                    # Update the object
-                    obj[key] = value
-                    now = datetime.now()
-                    obj['modification_date'] = now.isoformat()
-
-                # Append the updated object to the list of objects
-                current_objects.append(obj)
-
-                write_response = self.write_object(
-                    container_name, 
-                    current_objects,
-                    caught[2]['branch']['name'],
-                    caught[2]['containers'][container_name]['object_sha']
-                )
-                if not write_response[0]:
-                    return [
-                        False,
-                        {
-                            'status_code': write_response[1]['status_code'],
-                            'status_msg': 'Failed to write updated object [{}] to container [{}].'.format(obj_name, container_name)
-                        },
-                        None
-                    ]
+        # Apply the updates to the caught objects, on failure nothing is written so remove the locks
+        applied = self._apply_updates(
+            updates, {container: caught[2]['containers'][container]['objects'] for container in my_containers})
+        if not applied[0]:
+            self.abandon_container(caught[2])
+            return applied
         
         # Release the containers
-        released = self.release_container(caught[2], f"Updated [{len(current_objects)}] [{container_name}] objects.")
+        released = self.release_container(caught[2], commit_description)
         if not released[0]:
             return [
                 False,
                 {
                     'status_code': 503,
-                    'status_msg': 'Cannot release the container please check [{}] in GitHub.'.format(container_name)
+                    'status_msg': 'Cannot release the containers please check [{}] in GitHub.'.format(', '.join(my_containers))
                 },
                 released
             ]
 
-        # Return the updated object
-        return [True, {'status_code': 200, 'status_msg': 'Object updated successfully.'}, updates]
+        # Return how many objects were changed in each container
+        return [True, {'status_code': 200, 'status_msg': applied[1]['status_msg']}, applied[2]]
+
+    def mutate_containers(self, container_names, mutate, commit_description='Performed CRUD operation on objects.', retry_policy=None):
+        """
+        Apply a mutation to one or more containers without lock files using compare-and-swap writes.
+
+        The head of the main branch is resolved, the containers are read as of that commit with their
+        blob SHAs and handed to the mutation, and the result is written with commit_containers conditioned
+        on those SHAs. When another writer changed one of the containers in the meantime GitHub answers
+        with a conflict, and the containers are re-read and the mutation re-applied under the retry policy.
+
+        Parameters
+        ----------
+        container_names : list
+            The names of the containers to mutate.
+        mutate : callable
+            A function that receives a dictionary mapping container names to their objects and changes
+            them in place. It may return a failed [False, status, data] list to abort without writing.
+        commit_description : str, optional
+            The commit message, by default 'Performed CRUD operation on objects.'
+        retry_policy : RetryPolicy, optional
+            The retry policy applied on conflicts, by default RetryPolicy().
 
-    def delete_object(self, container_name, file_name, branch_name, sha):
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the commit information (or the error in case of failure).
+        """
+        retry_policy = retry_policy if retry_policy else RetryPolicy()
+        committed = [False, {'status_code': 409, 'status_msg': 'no attempt was made'}, None]
+        for attempt in range(retry_policy.max_attempts):
+            if attempt:
+                retry_policy.wait(attempt)
+            head_sha = self.get_head_sha()
+            if not head_sha[0]:
+                return head_sha
+            containers = {}
+            expected_shas = {}
+            for container_name in container_names:
+                read_response = self.read_objects(container_name, head_sha[2])
+                if not read_response[0]:
+                    return read_response
+                containers[container_name] = read_response[2]['mr_json']
+                expected_shas[container_name] = read_response[2]['sha']
+            mutated = mutate(containers)
+            if isinstance(mutated, list) and mutated and mutated[0] is False:
+                return mutated
+            committed = self.commit_containers(containers, head_sha[2], commit_description, expected_shas=expected_shas)
+            if committed[0]:
+                committed[2]['attempts'] = attempt + 1
+                return committed
+            if committed[1]['status_code'] != 409:
+                return committed
+        return [
+            False,
+            {'status_code': 409, 'status_msg': f"gave up after [{retry_policy.max_attempts}] conflicting attempts: {committed[1]['status_msg']}"},
+            committed[2]
+        ]
+
+    def delete_objects(self, deletes, cascade=True, optimistic=False, retry_policy=None):
         """
-        Delete an object from a container in a specific branch.
+        Delete many objects from one or more containers, following the links between them.
+
+        The cascade is computed in memory: deleting a company also deletes the interactions in its
+        linked_interactions, and every remaining object that links to a deleted object is unlinked.
+        Every affected container is read once, filtered in one pass and written once in a single commit,
+        so deleting thousands of objects costs the same number of requests as deleting one.
 
         Parameters
         ----------
-        container_name : str
-            The name of the container from which to delete the object.
-        obj : dict
-            The object to delete.
-        branch_name : str
-            The name of the branch where the object is located.
+        deletes : dict
+            A dictionary mapping container names to the names of the objects to delete.
+        cascade : bool, optional
+            Whether to delete the objects linked from deleted companies, by default True. Without it they are only unlinked.
+        optimistic : bool, optional
+            If True, use lock-free compare-and-swap writes instead of lock files, by default False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes, by default RetryPolicy().
 
         Returns
         -------
         list
-            A list containing a boolean indicating success or failure, a status message, and the delete response's raw data (or the error message in case of failure).
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a summary with the deleted names and the number of removed and unlinked objects per container (or the error in case of failure).
         """
-        return [False, f'initial port completed but implementation unconfirmed, untested and unsupported', None]
-        try:
-            repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
-            file_path = f"{container_name}/{file_name}"
-            file_contents = repo.get_contents(file_path, ref=branch_name)
-            delete_response = repo.delete_file(file_path, f"Delete object [{file_name}]", file_contents.sha, branch=branch_name)
-            return [True, { 'status_code': 200, 'status_msg': f'deleted object [{file_name}] from container [{container_name}]' }, delete_response.raw_data]
-        except Exception as e:
-            return [False, { 'status_code': 503, 'status_msg': f'unable to delete object [{file_name}] from container [{container_name}]' }, str(e)]
-        
+        deletes = {container_name: list(names) for container_name, names in deletes.items() if names}
+        if not deletes:
+            return [False, {'status_code': 400, 'status_msg': 'No objects to delete provided.'}, None]
+        my_containers = self._delete_containers(deletes, cascade)
+        commit_description = f"Deleted objects from [{', '.join(sorted(deletes))}]."
+
+        if optimistic:
+            applied = []
+
+            def apply_deletes(containers):
+                applied[:] = [self._apply_deletes(deletes, containers, cascade)]
+                return applied[0]
+
+            mutated = self.mutate_containers(my_containers, apply_deletes, commit_description, retry_policy)
+            if not mutated[0]:
+                return mutated
+            return applied[0]
+
+        caught = self.catch_container({'containers': {container: {} for container in my_containers}, 'branch': {}})
+        if not caught[0]:
+            return [False, {'status_code': 503, 'status_msg': caught[1]['status_msg']}, caught]
+        applied = self._apply_deletes(
+            deletes, {container: caught[2]['containers'][container]['objects'] for container in my_containers}, cascade)
+        if not applied[0]:
+            self.abandon_container(caught[2])
+            return applied
+        released = self.release_container(caught[2], commit_description)
+        if not released[0]:
+            return [
+                False,
+                {'status_code': 503, 'status_msg': 'Cannot release the containers please check [{}] in GitHub.'.format(', '.join(my_containers))},
+                released
+            ]
+        return applied
+
+    def delete_object(self, obj_name, source, repo_metadata=None, catch_it=True):
+        """
+        Delete one object and unlink it from the objects of the linked containers.
+
+        Parameters
+        ----------
+        obj_name : str
+            The name of the object to delete.
+        source : dict
+            The container of the object under 'from' and the containers linking to it under 'to'.
+        repo_metadata : dict, optional
+            Containers already caught with catch_container, used when catch_it is False.
+        catch_it : bool, optional
+            If True the containers are caught, changed and released, otherwise only the caught objects in repo_metadata are changed. Default is True.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the delete summary.
+        """
+        if catch_it:
+            return self.delete_objects({source['from']: [obj_name]}, cascade=False)
+        caught = (repo_metadata or {}).get('containers', {})
+        containers = {
+            container: caught[container]['objects']
+            for container in [source['from']] + list(source.get('to', []))
+            if container in caught
+        }
+        return self._apply_deletes({source['from']: [obj_name]}, containers, cascade=False)
+
     def create_containers(self, containers=['Studies', 'Companies', 'Interactions']):
         """
         Create multiple containers (directories) in the repository.
@@ -834,7 +2453,7 @@ class GitHubFunctions:
         empty_json = base64.b64encode(json.dumps([]).encode()).decode()
         for container_name in containers:
             try:
-                repo = self.github_instance.get_repo(f"{self.org_name}/{self.repo_name}")
+                repo = self.repo_context.get_repo()
                 file_path = f"{container_name}/{container_name}.json"
                 response = repo.create_file(file_path, f"Create container [{container_name}]", empty_json)
                 responses.append(response)
@@ -846,6 +2465,9 @@ class GitHubFunctions:
         """
         Catch (lock) multiple containers (directories) in the repository.
 
+        The lock files of all containers are added in one commit, see lock_containers, and the
+        containers are then read in parallel as of that commit. If a read fails the locks are removed.
+
         Parameters
         ----------
         repo_metadata : dict
@@ -856,44 +2478,34 @@ class GitHubFunctions:
         list
             A list containing a boolean indicating success or failure, a dictionary with status code and message, and a list of responses for each container catch (or the error message in case of failure).
         """
-        # Check to see if the containers are locked
-        for container in repo_metadata['containers']:
-            # Call the method above to check for a lock
-            lock_exists = self.check_for_lock(container)
-            # If the lock exists return an error
-            if lock_exists[0]:
-                return [False, {'status_code': 503, 'status_msg': f'the container [{container}] is locked unable and cannot perform creates, updates or deletes on objects.'}, lock_exists]
-
-        # Lock the containers
-        for container in repo_metadata['containers']:
-            # Call the method above to lock the container
-            locked = self.lock_container(container)
-            # Check to see if the container was locked and return the error if not
-            if not locked[0]:
-                return [False, {'status_code': 503, 'status_msg': f'unable to lock [{container}] and cannot perform creates, updates or deletes on objects.'}, locked]
+        # Check for and take the locks of every container in a single commit, either all of them are taken or none
+        container_names = list(repo_metadata['containers'])
+        locked = self.lock_containers(container_names)
+        if not locked[0]:
+            if locked[1]['status_code'] == 423:
+                return [False, {'status_code': 503, 'status_msg': f"{locked[1]['status_msg']} unable and cannot perform creates, updates or deletes on objects."}, locked[2]]
+            return [False, {'status_code': 503, 'status_msg': f"unable to lock {container_names} and cannot perform creates, updates or deletes on objects."}, locked]
+        for container in container_names:
             # Save the lock sha into containers as a separate object
-            repo_metadata['containers'][container]['lockSha'] = locked[2]['commit'].sha
-
-        # Call the method above create_branch_from_main to create a new branch
-        branch_created = self.create_branch_from_main()
-        # Check to see if the branch was created
-        if not branch_created[0]:
-            return [False, {'status_code': 503, 'status_msg': 'unable to create new branch'}, branch_created]
-        # Save the branch sha into containers as a separate object
+            repo_metadata['containers'][container]['lockSha'] = locked[2]
+
+        # The lock commit is the parent of the commit written on release
         repo_metadata['branch'] = {
-            'name': branch_created[2]['ref'],
-            'sha': branch_created[2]['object']['sha']
+            'name': self.main_branch_name,
+            'sha': locked[2]
         }
 
-        # Read the objects from the containers
-        for container in repo_metadata['containers']:
-            # Call the method above to read the objects
-            read_response = self.read_objects(container)
-            # Check to see if the read was successful
+        # Read the objects from the containers as of that commit, the reads are independent and run in parallel
+        with ThreadPoolExecutor(max_workers=max(1, min(self.read_workers, len(container_names)))) as executor:
+            read_responses = list(executor.map(
+                lambda container: self.read_objects(container, repo_metadata['branch']['sha']), container_names
+            ))
+        for container, read_response in zip(container_names, read_responses):
+            # Check to see if the read was successful, the first failure in container order is reported
             if not read_response[0]:
+                self.abandon_container(repo_metadata)
                 return [False, {'status_code': 503, 'status_msg': f'Unable to read the source objects [{container}/{self.object_files[container]}].'}, read_response]
             # Save the object sha into containers as a separate object
-            # repo_metadata['containers'][container]['objectSha'] = read_response[2]['data']['sha']
             repo_metadata['containers'][container]['object_sha'] = read_response[2]['sha']
             # Save the objects into containers as a separate object
             repo_metadata['containers'][container]['objects'] = read_response[2]['mr_json']
@@ -904,33 +2516,67 @@ class GitHubFunctions:
         """
         Release (unlock) multiple containers (directories) in the repository.
 
+        The objects of every caught container are written and the lock files are removed in a single
+        commit that fast-forwards the main branch, see commit_containers.
+
         Parameters
         ----------
         repo_metadata : dict
             The metadata of the repository, including the branch name, branch SHA, and container information.
+        commit_description : str, optional
+            The commit message, by default 'Performed CRUD operation on objects.'
 
         Returns
         -------
         list
-            A list containing a boolean indicating success or failure, a dictionary with status code and message, and a list of responses for each container release (or the error message in case of failure).
+            A list containing a boolean indicating success or failure, a dictionary with status code and message, and the commit SHA and new blob SHAs (or the error message in case of failure).
         """
-        # Merge the branch to main
-        merge_response = self.merge_branch_to_main(repo_metadata['branch']['name'], commit_description)
-        # Check to see if the merge was successful and return the error if not
-        if not merge_response[0]:
-            return [False, {'status_code': 503, 'status_msg': 'Unable to merge the branch to main.'}, merge_response]
-
-        # Unlock the containers by looping through them
-        for container in repo_metadata['containers']:
-            # Unlock branch
-            branch_unlocked = self.unlock_container(container, repo_metadata['containers'][container]['lockSha'], repo_metadata['branch']['name'])
-            if not branch_unlocked[0]:
-                return [False, {'status_code': 503, 'status_msg': f"Unable to unlock the container, objects may have been written please check [{container}] for objects and the lock file."}, branch_unlocked]
-            # Unlock main
-            main_unlocked = self.unlock_container(container, repo_metadata['containers'][container]['lockSha'])
-            if not main_unlocked[0]:
-                return [False, {'status_code': 503, 'status_msg': f"Unable to unlock the container, objects may have been written please check [{container}] for objects and the lock file."}, main_unlocked]
+        commit_description = commit_description if commit_description else 'Performed CRUD operation on objects.'
+        # Write every container and remove every lock file in a single commit on top of the caught head
+        committed = self.commit_containers(
+            {container: repo_metadata['containers'][container]['objects'] for container in repo_metadata['containers']},
+            repo_metadata['branch']['sha'],
+            commit_description,
+            remove_paths=[f"{container}/{self.lock_file_name}" for container in repo_metadata['containers']],
+            expected_shas={container: repo_metadata['containers'][container]['object_sha'] for container in repo_metadata['containers']}
+        )
+        if not committed[0]:
+            # Nothing was written, remove the locks so the containers are usable again
+            self.abandon_container(repo_metadata)
+            return [False, {'status_code': 503, 'status_msg': f"Unable to write the containers due to [{committed[1]['status_msg']}]."}, committed]
+        repo_metadata['branch']['sha'] = committed[2]['commit_sha']
 
         # Return success with number of objects written
-        return [True, {'status_code': 200, 'status_msg': f"Released [{len(repo_metadata['containers'])}] containers."}, None]
-    
+        return [True, {'status_code': 200, 'status_msg': f"Released [{len(repo_metadata['containers'])}] containers."}, committed[2]]
+
+    def abandon_container(self, repo_metadata):
+        """
+        Abandon caught containers without writing them by removing their lock files.
+
+        Parameters
+        ----------
+        repo_metadata : dict
+            The metadata of the repository returned by catch_container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status code and message, and the commit removing the lock files.
+        """
+        # Remove every lock file in one commit on top of the current head
+        head_sha = self.get_head_sha()
+        if not head_sha[0]:
+            return [False, {'status_code': 503, 'status_msg': 'Unable to unlock every container, please check the lock files.'}, head_sha]
+        listed = self.get_tree_files(head_sha[2], list(repo_metadata['containers']))
+        if not listed[0]:
+            return [False, {'status_code': 503, 'status_msg': 'Unable to unlock every container, please check the lock files.'}, listed]
+        lock_files = [f"{container}/{self.lock_file_name}" for container in repo_metadata['containers']]
+        committed = self.commit_containers(
+            {},
+            head_sha[2],
+            f"Unlocking containers [{', '.join(repo_metadata['containers'])}]",
+            remove_paths=[lock_file for lock_file in lock_files if lock_file in listed[2]]
+        )
+        if not committed[0] or not all(lock_file in listed[2] for lock_file in lock_files):
+            return [False, {'status_code': 503, 'status_msg': 'Unable to unlock every container, please check the lock files.'}, committed]
+        return [True, {'status_code': 200, 'status_msg': f"Abandoned [{len(lock_files)}] containers."}, committed[2]]
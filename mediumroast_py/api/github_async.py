@@ -0,0 +1,1098 @@
+import asyncio
+import base64
+import json
+import urllib.parse
+from . cache import ValidatorCache
+from . github import ContainerFormat, RetryPolicy, git_blob_sha, iter_json_array
+from . ratelimit import get_shared_scheduler
+from . sharding import ShardLayout
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class AsyncGitHubFunctions(ContainerFormat):
+    """
+    A class used to interact with GitHub's API from asyncio code.
+
+    This is the asyncio counterpart of GitHubFunctions. Every request goes
+    through one pooled httpx.AsyncClient, the methods return the same
+    [ok, status, data] lists, and requests that do not depend on each other,
+    like lock checks, container reads, shard and blob downloads, are issued
+    concurrently. Writes use the same single commit Git Data API path as
+    GitHubFunctions.commit_containers.
+
+    Attributes
+    ----------
+    token : str
+        The personal access token for GitHub's API.
+    org_name : str
+        The name of the organization on GitHub.
+    repo_name : str
+        The name of the repository on GitHub.
+    api_url : str
+        The base URL of GitHub's REST API.
+    client : httpx.AsyncClient
+        The pooled HTTP client used for every request.
+    validator_cache : ValidatorCache
+        The cache of ETag/Last-Modified validators and content for conditional reads.
+    write_listeners : list
+        References to the callables notified with (container_name, objects, blob_sha) after containers are committed, see add_write_listener.
+    lock_file_name : str
+        The name of the lock file.
+    main_branch_name : str
+        The name of the main branch in the repository.
+    object_files : dict
+        A dictionary mapping object types to their corresponding file names.
+    sharded_containers : dict
+        A dictionary mapping the names of sharded containers to their ShardLayout.
+    single_file_containers : set
+        The names of the containers seen stored in a single file.
+    read_workers : int
+        The maximum number of shards or blobs downloaded concurrently by one call.
+    stream_chunk_size : int
+        The number of bytes read at a time when streaming containers larger than the inline limit.
+    """
+    def __init__(self, token, org, process_name, api_url='https://api.github.com', validator_cache=None, sharded_containers=None, client=None, max_connections=20, timeout=30.0, scheduler=False):
+        """
+        Constructs all the necessary attributes for the AsyncGitHubFunctions object.
+
+        Parameters
+        ----------
+        token : str
+            The personal access token for GitHub's API.
+        org : str
+            The name of the organization on GitHub.
+        process_name : str
+            The name of the process using the AsyncGitHubFunctions object.
+        api_url : str, optional
+            The base URL of GitHub's REST API, by default 'https://api.github.com'.
+        validator_cache : ValidatorCache, optional
+            The cache used for conditional reads, by default a new ValidatorCache.
+        sharded_containers : dict or list, optional
+            The containers stored in the sharded layout, see GitHubFunctions.
+        client : httpx.AsyncClient, optional
+            The client to send requests with, by default a new pooled client owned by this object.
+        max_connections : int, optional
+            The size of the connection pool of the default client, by default 20.
+        timeout : float, optional
+            The request timeout in seconds of the default client, by default 30.0.
+        scheduler : RateLimitScheduler, optional
+            The scheduler pacing the requests, by default the shared scheduler, None disables rate limiting.
+        """
+        if httpx is None and client is None:
+            raise ImportError('AsyncGitHubFunctions requires httpx, install mediumroast_py with the [async] extra')
+        self.token = token
+        self.api_url = api_url.rstrip('/')
+        self.org_name = org
+        self.repo_name = f"{org}_discovery"
+        self.lock_file_name = f"{process_name}.lock"
+        self.main_branch_name = 'main'
+        self.object_files = {
+            'Studies': 'Studies.json',
+            'Companies': 'Companies.json',
+            'Interactions': 'Interactions.json',
+            'Users': None,
+            'Billings': None
+        }
+        self.validator_cache = validator_cache if validator_cache is not None else ValidatorCache()
+        self.write_listeners = []
+        self.stream_chunk_size = 1024 * 1024
+        self.inline_content_limit = 1024 * 1024
+        if sharded_containers is not None and not isinstance(sharded_containers, dict):
+            sharded_containers = {container_name: ShardLayout() for container_name in sharded_containers}
+        self.sharded_containers = dict(sharded_containers or {})
+        self.single_file_containers = set()
+        self.read_workers = 8
+        self.scheduler = get_shared_scheduler() if scheduler is False else scheduler
+        self._owns_client = client is None
+        self.client = client if client is not None else httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """
+        Close the HTTP client if it was created by this object.
+        """
+        if self._owns_client:
+            await self.client.aclose()
+
+    def set_token(self, token):
+        """
+        Replace the token used for every following request.
+
+        Parameters
+        ----------
+        token : str
+            The new token, e.g. a freshly minted installation token.
+        """
+        self.token = token
+
+    def use_token_refresher(self, refresher):
+        """
+        Follow the tokens of a TokenRefresher, see GitHubFunctions.use_token_refresher.
+
+        Parameters
+        ----------
+        refresher : TokenRefresher
+            The refresher returned by GitHubAuth.start_token_refresher.
+        """
+        refresher.add_refresh_listener(lambda token_info: self.set_token(token_info['token']))
+        self.set_token(refresher.get_token()['token'])
+
+    async def _request(self, method, url, headers=None, stream=False, **kwargs):
+        # A streamed response is returned before its body is read and has to be closed by the caller
+        if not url.startswith('http'):
+            url = f"{self.api_url}{url}"
+        request_headers = {
+            'Authorization': f'token {self.token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        request_headers.update(headers or {})
+
+        def send():
+            return self.client.send(self.client.build_request(method, url, headers=request_headers, **kwargs), stream=stream)
+
+        if self.scheduler is None:
+            return await send()
+        return await self.scheduler.send_async(method, request_headers['Authorization'], send, urllib.parse.urlsplit(self.api_url).netloc)
+
+    async def _request_json(self, method, url, **kwargs):
+        response = await self._request(method, url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def _gather(self, coroutines):
+        # Run independent requests concurrently, at most read_workers at a time
+        semaphore = asyncio.Semaphore(self.read_workers)
+
+        async def bounded(coroutine):
+            async with semaphore:
+                return await coroutine
+
+        return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines))
+
+    async def _get_contents_cached(self, file_path, ref, decoder, raw=False, sizer=len):
+        # Conditional GET of the contents endpoint, a 304 is served from the validator cache
+        key = (file_path, ref, 'raw') if raw else (file_path, ref)
+        url = f"/repos/{self.org_name}/{self.repo_name}/contents/{urllib.parse.quote(file_path)}"
+        params = {'ref': ref} if ref else None
+        accept = {'Accept': 'application/vnd.github.raw'} if raw else {}
+        response = await self._request('GET', url, headers={**accept, **self.validator_cache.get_headers(key)}, params=params)
+        if response.status_code == 304:
+            cached = self.validator_cache.get(key)
+            if cached is not None:
+                return cached
+            # The entry was evicted after the validators were sent, fetch it unconditionally
+            response = await self._request('GET', url, headers=accept, params=params)
+        response.raise_for_status()
+        value = await decoder(response)
+        self.validator_cache.put(key, value, response.headers.get('ETag'), response.headers.get('Last-Modified'), sizer(value))
+        return value
+
+    async def _decode_contents(self, response):
+        contents = response.json()
+        if contents.get('encoding') == 'base64':
+            return {'text': base64.b64decode(contents['content']).decode(), 'sha': contents['sha']}
+        # Above 1 MB the contents API omits the content, only the metadata is kept and the blob is streamed on demand
+        return {'sha': contents['sha']}
+
+    def _sizeof_decoded(self, decoded):
+        return len(decoded['text']) if 'text' in decoded else len(decoded['sha'])
+
+    async def _decoded_objects(self, decoded):
+        # Parse the objects of a decoded container file, a large one is streamed from its blob only now
+        if 'text' in decoded:
+            return json.loads(decoded['text'])
+        return await self._stream_blob_objects(decoded['sha'])
+
+    async def _stream_blob_objects(self, sha):
+        response = await self._request(
+            'GET',
+            f"/repos/{self.org_name}/{self.repo_name}/git/blobs/{sha}",
+            headers={'Accept': 'application/vnd.github.raw'},
+            stream=True
+        )
+        try:
+            response.raise_for_status()
+            loop = asyncio.get_running_loop()
+            chunks = response.aiter_bytes(self.stream_chunk_size)
+
+            async def next_chunk():
+                try:
+                    return await chunks.__anext__()
+                except StopAsyncIteration:
+                    return None
+
+            def read_chunks():
+                # Runs in a worker thread, every chunk is read on the event loop as the parser asks for it
+                while True:
+                    chunk = asyncio.run_coroutine_threadsafe(next_chunk(), loop).result()
+                    if chunk is None:
+                        return
+                    yield chunk
+
+            # Parse off the event loop so a large container does not stall the other requests
+            return await loop.run_in_executor(None, lambda: list(iter_json_array(read_chunks())))
+        finally:
+            await response.aclose()
+
+    async def _read_blob_text(self, sha):
+        # Blobs are addressed by content, a cached blob never has to be revalidated
+        key = ('blob', sha)
+        cached = self.validator_cache.get(key)
+        if cached is not None:
+            return cached
+        response = await self._request(
+            'GET',
+            f"/repos/{self.org_name}/{self.repo_name}/git/blobs/{sha}",
+            headers={'Accept': 'application/vnd.github.raw'}
+        )
+        response.raise_for_status()
+        text = response.content.decode()
+        self.validator_cache.put(key, text, etag=f'"{sha}"')
+        return text
+
+    async def _read_manifest(self, container_name, ref):
+        # Returns the decoded shard manifest and its blob SHA, or None if the container has no manifest at ref
+        try:
+            decoded = await self._get_contents_cached(ShardLayout.manifest_path(container_name), ref, self._decode_contents, sizer=self._sizeof_decoded)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
+            raise
+        return json.loads(decoded['text']), decoded['sha']
+
+    async def _read_shards(self, manifest, prefixes):
+        shas = [manifest['shards'][prefix]['sha'] for prefix in sorted(prefixes) if prefix in manifest['shards']]
+        texts = await self._gather(self._read_blob_text(sha) for sha in shas)
+        return [obj for text in texts for obj in json.loads(text)]
+
+    async def _read_container(self, container_name, ref, keys=None):
+        # Hide the storage layout of a container, returns its objects and the SHA that guards it
+        layout = self.sharded_containers.get(container_name)
+        if layout is None:
+            file_path = f"{container_name}/{self.object_files[container_name]}"
+            try:
+                decoded = await self._get_contents_cached(file_path, ref, self._decode_contents, sizer=self._sizeof_decoded)
+                objects = await self._decoded_objects(decoded)
+                self.single_file_containers.add(container_name)
+                if keys is not None:
+                    objects = [obj for obj in objects if obj.get('name') in keys]
+                return objects, decoded['sha']
+            except httpx.HTTPStatusError as e:
+                # A missing container file may mean the container was migrated to the sharded layout
+                if e.response.status_code != 404:
+                    raise
+                manifest = await self._read_manifest(container_name, ref)
+                if manifest is None:
+                    raise
+                layout = self.sharded_containers.setdefault(container_name, ShardLayout.from_manifest(manifest[0]))
+        else:
+            manifest = await self._read_manifest(container_name, ref)
+            if manifest is None:
+                raise IOError(f'container [{container_name}] has no shard manifest, convert it with migrate_to_shards')
+        if keys is None:
+            return await self._read_shards(manifest[0], manifest[0]['shards']), manifest[1]
+        objects = await self._read_shards(manifest[0], {layout.prefix_of(key) for key in keys})
+        return [obj for obj in objects if obj.get(layout.key) in keys], manifest[1]
+
+    async def get_head_sha(self, branch_name=None):
+        """
+        Get the SHA of the commit a branch currently points to.
+
+        Parameters
+        ----------
+        branch_name : str, optional
+            The name of the branch, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the commit SHA (or the error message in case of failure).
+        """
+        branch_name = branch_name if branch_name else self.main_branch_name
+        try:
+            ref = await self._request_json('GET', f"/repos/{self.org_name}/{self.repo_name}/git/ref/heads/{branch_name}")
+            return [True, {'status_code': 200, 'status_msg': f'captured head of [{branch_name}]'}, ref['object']['sha']]
+        except Exception as e:
+            return [False, {'status_code': 503, 'status_msg': f'unable to capture head of [{branch_name}] due to [{str(e)}]'}, str(e)]
+
+    async def get_tree_files(self, commit_sha, container_names=None):
+        """
+        Get the blob SHA of every file in a commit with one request, see GitHubFunctions.get_tree_files.
+
+        Parameters
+        ----------
+        commit_sha : str
+            The SHA of the commit.
+        container_names : list, optional
+            The containers listed when the recursive listing is truncated, by default every container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping file paths to blob SHAs.
+        """
+        key = ('tree', commit_sha)
+        files = self.validator_cache.get(key)
+        if files is None:
+            try:
+                tree = await self._request_json('GET', f"/repos/{self.org_name}/{self.repo_name}/git/trees/{commit_sha}", params={'recursive': 1})
+            except Exception as e:
+                return [False, {'status_code': self._error_status(e), 'status_msg': f'unable to list files of [{commit_sha}] due to [{str(e)}]'}, str(e)]
+            if tree.get('truncated'):
+                return await self.get_container_files(commit_sha, container_names)
+            files = {entry['path']: entry['sha'] for entry in tree['tree'] if entry['type'] == 'blob'}
+            # A commit never changes, its listing stays valid without revalidation
+            self.validator_cache.put(key, files, etag=f'"{commit_sha}"', size=len(files) * 128)
+        return [True, {'status_code': 200, 'status_msg': f'listed files of [{commit_sha}]'}, dict(files)]
+
+    async def get_container_files(self, commit_sha, container_names=None):
+        """
+        Get the blob SHA of the files of some containers in a commit, see GitHubFunctions.get_container_files.
+
+        The container directories are listed concurrently.
+
+        Parameters
+        ----------
+        commit_sha : str
+            The SHA of the commit.
+        container_names : list, optional
+            The names of the containers to list, by default every container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping file paths to blob SHAs.
+        """
+        if container_names is None:
+            container_names = [container_name for container_name, file_name in self.object_files.items() if file_name]
+        container_names = sorted(set(container_names))
+        key = ('tree', commit_sha, tuple(container_names))
+        files = self.validator_cache.get(key)
+        if files is None:
+            trees_path = f"/repos/{self.org_name}/{self.repo_name}/git/trees"
+            try:
+                root = await self._request_json('GET', f"{trees_path}/{commit_sha}")
+                directories = [(entry['path'], entry['sha']) for entry in root['tree'] if entry['type'] == 'tree' and entry['path'] in container_names]
+                files = {}
+                while directories:
+                    listings = await self._gather(self._request_json('GET', f"{trees_path}/{tree_sha}") for directory, tree_sha in directories)
+                    subdirectories = []
+                    for (directory, tree_sha), listing in zip(directories, listings):
+                        for entry in listing['tree']:
+                            path = f"{directory}/{entry['path']}"
+                            if entry['type'] == 'blob':
+                                files[path] = entry['sha']
+                            elif entry['type'] == 'tree' and path == ShardLayout.manifest_path(directory).rsplit('/', 1)[0]:
+                                subdirectories.append((path, entry['sha']))
+                    directories = subdirectories
+            except Exception as e:
+                return [False, {'status_code': self._error_status(e), 'status_msg': f'unable to list containers of [{commit_sha}] due to [{str(e)}]'}, str(e)]
+            self.validator_cache.put(key, files, etag=f'"{commit_sha}"', size=len(files) * 128)
+        return [True, {'status_code': 200, 'status_msg': f'listed containers [{", ".join(container_names)}] of [{commit_sha}]'}, dict(files)]
+
+    def _error_status(self, error):
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code
+        return 503
+
+    async def get_container_sha(self, container_name, branch_name=None):
+        """
+        Get the SHA guarding a container without parsing its objects, see GitHubFunctions.get_container_sha.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+        branch_name : str, optional
+            The name of the branch or the SHA of the commit, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the SHA (or the error message in case of failure).
+        """
+        try:
+            branch_name = branch_name if branch_name else self.main_branch_name
+            sha = None
+            if container_name not in self.sharded_containers:
+                file_path = f"{container_name}/{self.object_files[container_name]}"
+                try:
+                    sha = (await self._get_contents_cached(file_path, branch_name, self._decode_contents, sizer=self._sizeof_decoded))['sha']
+                    self.single_file_containers.add(container_name)
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code != 404:
+                        raise
+            if sha is None:
+                manifest = await self._read_manifest(container_name, branch_name)
+                if manifest is None:
+                    raise IOError(f'container [{container_name}] has neither a container file nor a shard manifest')
+                self.sharded_containers.setdefault(container_name, ShardLayout.from_manifest(manifest[0]))
+                sha = manifest[1]
+            return [True, {'status_code': 200, 'status_msg': f'captured sha for container [{container_name}]'}, sha]
+        except Exception as e:
+            return [False, {'status_code': 423, 'status_msg': f'unable to capture sha for container [{container_name}] due to [{str(e)}]'}, str(e)]
+
+    async def read_objects(self, container_name, branch_name=None, keys=None):
+        """
+        Read all objects from a container in a specific branch.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container from which to read objects.
+        branch_name : str, optional
+            The name of the branch or the SHA of the commit, by default the main branch.
+        keys : iterable, optional
+            Only return the objects whose key attribute (the name unless the layout says otherwise) is in keys.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the objects with their SHA (or the error message in case of failure).
+        """
+        try:
+            branch_name = branch_name if branch_name else self.main_branch_name
+            objects, sha = await self._read_container(container_name, branch_name, set(keys) if keys is not None else None)
+            return [
+                True,
+                {'status_msg': f"SUCCESS: read objects from container [{container_name}]", 'status_code': 200},
+                {"mr_json": objects, "sha": sha}
+            ]
+        except Exception as e:
+            return [
+                False,
+                {'status_msg': f"ERROR: unable to read objects from container [{container_name}] due to {e}", 'status_code': 423},
+                str(e)
+            ]
+
+    async def read_many(self, container_names, branch_name=None):
+        """
+        Read several containers concurrently.
+
+        Parameters
+        ----------
+        container_names : list
+            The names of the containers to read.
+        branch_name : str, optional
+            The name of the branch or the SHA of the commit, by default the main branch.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping each container name to its read_objects response.
+        """
+        responses = await asyncio.gather(*(self.read_objects(container_name, branch_name) for container_name in container_names))
+        return dict(zip(container_names, responses))
+
+    async def read_blob(self, file_name):
+        """
+        Read a blob (file) from a container (directory).
+
+        The raw content is requested directly from the contents API with a conditional request, so an
+        unchanged blob costs a 304 and no download.
+
+        Parameters
+        ----------
+        file_name : str
+            The name of the blob to read with a complete path to the file (e.g. dirname/filename.ext).
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the blob's raw data (or the error message in case of failure).
+        """
+        async def raw_content(response):
+            return response.content
+
+        try:
+            blob = await self._get_contents_cached(file_name, None, raw_content, raw=True)
+            return [True, {'status_code': 200, 'status_msg': f'read object [{file_name}]'}, blob]
+        except Exception as e:
+            return [False, {'status_code': 503, 'status_msg': f'unable to read object [{file_name}] due to [{str(e)}].'}, str(e)]
+
+    async def read_blobs(self, file_names):
+        """
+        Read several blobs concurrently.
+
+        Parameters
+        ----------
+        file_names : list
+            The names of the blobs to read with complete paths.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping each file name to its read_blob response.
+        """
+        responses = await self._gather(self.read_blob(file_name) for file_name in file_names)
+        return dict(zip(file_names, responses))
+
+    async def get_lock_files(self, branch_name=None, container_names=None):
+        """
+        List the files of the head of a branch, see GitHubFunctions.get_lock_files.
+
+        Parameters
+        ----------
+        branch_name : str, optional
+            The name of the branch, by default the main branch.
+        container_names : list, optional
+            The containers listed if the repository is too large for one recursive read, by default every container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping file paths to blob SHAs (or the error message in case of failure).
+        """
+        head_sha = await self.get_head_sha(branch_name)
+        if not head_sha[0]:
+            return head_sha
+        return await self.get_tree_files(head_sha[2], container_names)
+
+    async def check_for_lock(self, container_name, files=None):
+        """
+        Check if a container is locked.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container to check.
+        files : dict, optional
+            The files of the head of the main branch from get_lock_files, read if not given.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating whether the container is locked or not, a status message, and the lock status (or the error message in case of failure).
+        """
+        if files is None:
+            listed = await self.get_lock_files(container_names=[container_name])
+            if not listed[0]:
+                return [False, listed[1]['status_msg'], None]
+            files = listed[2]
+        lock_exists = f"{container_name}/{self.lock_file_name}" in files
+        if lock_exists:
+            return [True, f"container [{container_name}] is locked with lock file [{self.lock_file_name}]", lock_exists]
+        return [False, f"container [{container_name}] is not locked with lock file [{self.lock_file_name}]", lock_exists]
+
+    async def lock_container(self, container_name):
+        """
+        Lock a container by creating a lock file in it.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container to lock.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the response of the contents API (or the error message in case of failure).
+        """
+        lock_file = f"{container_name}/{self.lock_file_name}"
+        try:
+            lock_response = await self._request_json(
+                'PUT',
+                f"/repos/{self.org_name}/{self.repo_name}/contents/{urllib.parse.quote(lock_file)}",
+                json={'message': f"Locking container [{container_name}] with [{lock_file}].", 'content': '', 'branch': self.main_branch_name}
+            )
+            return [True, {"status_code": 200, "status_msg": f"Locked the container [{container_name}]"}, lock_response]
+        except Exception as e:
+            return [False, {"status_code": 504, "status_msg": f"FAILED: Unable to lock the container [{container_name}]"}, str(e)]
+
+    async def lock_containers(self, container_names, max_rebases=3):
+        """
+        Lock several containers at once by adding all their lock files in a single commit, see GitHubFunctions.lock_containers.
+
+        Parameters
+        ----------
+        container_names : list
+            The names of the containers to lock.
+        max_rebases : int, optional
+            The number of times the lock commit is rebuilt on a moved head, by default 3.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the SHA of the lock commit (or the error message in case of failure).
+        """
+        repo_path = f"/repos/{self.org_name}/{self.repo_name}"
+        try:
+            for attempt in range(max_rebases + 1):
+                head_sha = await self.get_head_sha()
+                if not head_sha[0]:
+                    return head_sha
+                listed, head_commit = await asyncio.gather(
+                    self.get_tree_files(head_sha[2], container_names),
+                    self._request_json('GET', f"{repo_path}/git/commits/{head_sha[2]}")
+                )
+                if not listed[0]:
+                    return listed
+                for container_name in container_names:
+                    lock_exists = await self.check_for_lock(container_name, listed[2])
+                    if lock_exists[0]:
+                        return [False, {'status_code': 423, 'status_msg': f'the container [{container_name}] is locked'}, lock_exists]
+                new_tree = await self._request_json('POST', f"{repo_path}/git/trees", json={
+                    'base_tree': head_commit['tree']['sha'], 'tree': self._lock_tree(container_names)
+                })
+                commit = await self._request_json('POST', f"{repo_path}/git/commits", json={
+                    'message': f"Locking containers [{', '.join(container_names)}] with [{self.lock_file_name}].",
+                    'tree': new_tree['sha'],
+                    'parents': [head_sha[2]]
+                })
+                response = await self._request('PATCH', f"{repo_path}/git/refs/heads/{self.main_branch_name}", json={'sha': commit['sha'], 'force': False})
+                if response.status_code != 422:
+                    response.raise_for_status()
+                    return [True, {'status_code': 200, 'status_msg': f"locked [{len(container_names)}] containers in [{commit['sha']}]"}, commit['sha']]
+            return [False, {'status_code': 409, 'status_msg': f'[{self.main_branch_name}] kept moving, gave up locking after [{max_rebases}] rebases'}, None]
+        except Exception as e:
+            return [False, {'status_code': 504, 'status_msg': f'unable to lock the containers due to [{str(e)}]'}, str(e)]
+
+    async def unlock_container(self, container_name):
+        """
+        Unlock a container by deleting the lock file in it.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container to unlock.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the response of the contents API (or the error message in case of failure).
+        """
+        lock_file = f"{container_name}/{self.lock_file_name}"
+        try:
+            # Lock files are empty, so their blob SHA is known without reading them
+            unlock_response = await self._request_json(
+                'DELETE',
+                f"/repos/{self.org_name}/{self.repo_name}/contents/{urllib.parse.quote(lock_file)}",
+                json={'message': f"Unlocking container [{container_name}]", 'sha': git_blob_sha(''), 'branch': self.main_branch_name}
+            )
+            return [True, {"status_code": 200, "status_msg": f"Unlocked the container [{container_name}]"}, unlock_response]
+        except Exception as e:
+            return [False, {"status_code": 504, "status_msg": f"Unable to unlock the container [{container_name}]"}, str(e)]
+
+    async def commit_containers(self, containers, parent_sha, commit_description='Performed CRUD operation on objects.', remove_paths=None, expected_shas=None, max_rebases=3, branch_name=None):
+        """
+        Write several containers in a single commit and fast-forward the branch to it.
+
+        See GitHubFunctions.commit_containers, large files are uploaded concurrently.
+
+        Parameters
+        ----------
+        containers : dict
+            A dictionary mapping container names to the list of objects to write.
+        parent_sha : str
+            The SHA of the commit the containers were read from.
+        commit_description : str, optional
+            The commit message, by default 'Performed CRUD operation on objects.'
+        remove_paths : list, optional
+            Paths to delete in the same commit, e.g. the lock files of the containers.
+        expected_shas : dict, optional
+            A dictionary mapping container names to the SHA they were read with, used to decide if a rebase is safe.
+        max_rebases : int, optional
+            The maximum number of times the commit is rebuilt on a moved head, by default 3.
+        branch_name : str, optional
+            The name of the branch to advance, by default the main branch.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary with the commit SHA, parent SHA and the new SHA of each container (or the error message in case of failure).
+        """
+        repo_path = f"/repos/{self.org_name}/{self.repo_name}"
+        branch_name = branch_name if branch_name else self.main_branch_name
+        remove_paths = list(remove_paths or [])
+        expected_shas = expected_shas or {}
+        try:
+            unknown = [name for name in containers if name not in self.sharded_containers and name not in self.single_file_containers]
+            # Never write a single file next to a container another process converted to shards
+            for container_name, manifest in zip(unknown, await asyncio.gather(*(self._read_manifest(name, parent_sha) for name in unknown))):
+                if manifest is not None:
+                    self.sharded_containers.setdefault(container_name, ShardLayout.from_manifest(manifest[0]))
+            serialized = {container_name: self._serialize_container(container_name, objects) for container_name, objects in containers.items()}
+
+            for attempt in range(max_rebases + 1):
+                pending = [name for name, (guard_path, guard_sha, contents) in serialized.items() if guard_sha != expected_shas.get(name)]
+                changed = await asyncio.gather(*(self._changed_files(name, serialized[name][2], parent_sha) for name in pending))
+                tree = []
+                uploads = []
+                for files in changed:
+                    for path, content in files.items():
+                        if content is None:
+                            tree.append({'path': path, 'mode': '100644', 'type': 'blob', 'sha': None})
+                        elif len(content) > self.inline_content_limit:
+                            # Large containers are uploaded as blobs, inline tree content is meant for small files
+                            uploads.append(self._request_json('POST', f"{repo_path}/git/blobs", json={'content': content, 'encoding': 'utf-8'}))
+                            tree.append({'path': path, 'mode': '100644', 'type': 'blob', 'sha': git_blob_sha(content)})
+                        else:
+                            tree.append({'path': path, 'mode': '100644', 'type': 'blob', 'content': content})
+                tree += [{'path': path, 'mode': '100644', 'type': 'blob', 'sha': None} for path in remove_paths]
+                if not tree:
+                    return [
+                        True,
+                        {'status_code': 200, 'status_msg': 'no container changes to commit'},
+                        {'commit_sha': parent_sha, 'parent_sha': parent_sha, 'blobs': dict(expected_shas)}
+                    ]
+                parent, *uploaded = await asyncio.gather(self._request_json('GET', f"{repo_path}/git/commits/{parent_sha}"), *uploads)
+                new_tree = await self._request_json('POST', f"{repo_path}/git/trees", json={'base_tree': parent['tree']['sha'], 'tree': tree})
+                commit = await self._request_json('POST', f"{repo_path}/git/commits", json={
+                    'message': commit_description, 'tree': new_tree['sha'], 'parents': [parent_sha]
+                })
+                response = await self._request('PATCH', f"{repo_path}/git/refs/heads/{branch_name}", json={'sha': commit['sha'], 'force': False})
+                if response.status_code != 422:
+                    response.raise_for_status()
+                    if branch_name == self.main_branch_name:
+                        for container_name, (guard_path, guard_sha, contents) in serialized.items():
+                            self._notify_write(container_name, containers[container_name], guard_sha)
+                    return [
+                        True,
+                        {'status_code': 200, 'status_msg': f"committed [{len(serialized)}] containers in [{commit['sha']}]"},
+                        {
+                            'commit_sha': commit['sha'],
+                            'parent_sha': parent_sha,
+                            'blobs': {container_name: guard_sha for container_name, (guard_path, guard_sha, contents) in serialized.items()}
+                        }
+                    ]
+
+                # The head moved, rebase only if the containers are still as they were read
+                head_sha = await self.get_head_sha(branch_name)
+                if not head_sha[0]:
+                    return [False, head_sha[1], head_sha[2]]
+                head_files = await self.get_tree_files(head_sha[2], set(serialized) | {path.split('/', 1)[0] for path in remove_paths})
+                if not head_files[0]:
+                    return head_files
+                head_files = head_files[2]
+                for container_name, (guard_path, guard_sha, contents) in serialized.items():
+                    if container_name in expected_shas and head_files.get(guard_path) != expected_shas[container_name]:
+                        return [
+                            False,
+                            {'status_code': 409, 'status_msg': f'container [{container_name}] changed since it was read, refusing to overwrite it'},
+                            head_sha[2]
+                        ]
+                remove_paths = [path for path in remove_paths if path in head_files]
+                parent_sha = head_sha[2]
+
+            return [False, {'status_code': 409, 'status_msg': f'[{branch_name}] kept moving, gave up after [{max_rebases}] rebases'}, parent_sha]
+        except httpx.HTTPStatusError as e:
+            # GitHub reports write conflicts as 409 or 422, surface both as a conflict
+            status_code = 409 if e.response.status_code in (409, 422) else 503
+            return [False, {'status_code': status_code, 'status_msg': f'unable to commit containers due to [{str(e)}]'}, str(e)]
+        except Exception as e:
+            return [False, {'status_code': 503, 'status_msg': f'unable to commit containers due to [{str(e)}]'}, str(e)]
+
+    async def _changed_files(self, container_name, contents, ref):
+        # Single file containers are rewritten, sharded containers are diffed against the manifest at ref
+        if container_name not in self.sharded_containers:
+            return contents
+        return self._diff_shards(container_name, contents, await self._read_manifest(container_name, ref))
+
+    async def catch_container(self, repo_metadata):
+        """
+        Catch (lock) multiple containers (directories) in the repository.
+
+        The lock files of all containers are added in one commit, see lock_containers, and the
+        containers are then read concurrently as of that commit. If a read fails the locks are removed.
+
+        Parameters
+        ----------
+        repo_metadata : dict
+            The metadata of the repository, including the branch name, branch SHA, and container information.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status code and message, and the repository metadata (or the error message in case of failure).
+        """
+        # Check for and take the locks of every container in a single commit, either all of them are taken or none
+        container_names = list(repo_metadata['containers'])
+        locked = await self.lock_containers(container_names)
+        if not locked[0]:
+            if locked[1]['status_code'] == 423:
+                return [False, {'status_code': 503, 'status_msg': f"{locked[1]['status_msg']} unable and cannot perform creates, updates or deletes on objects."}, locked[2]]
+            return [False, {'status_code': 503, 'status_msg': f"unable to lock {container_names} and cannot perform creates, updates or deletes on objects."}, locked]
+        for container in container_names:
+            repo_metadata['containers'][container]['lockSha'] = locked[2]
+
+        # The lock commit is the parent of the commit written on release
+        repo_metadata['branch'] = {'name': self.main_branch_name, 'sha': locked[2]}
+
+        read_responses = await asyncio.gather(*(self.read_objects(container, repo_metadata['branch']['sha']) for container in container_names))
+        for container, read_response in zip(container_names, read_responses):
+            if not read_response[0]:
+                await self.abandon_container(repo_metadata)
+                return [False, {'status_code': 503, 'status_msg': f'Unable to read the source objects [{container}/{self.object_files[container]}].'}, read_response]
+            repo_metadata['containers'][container]['object_sha'] = read_response[2]['sha']
+            repo_metadata['containers'][container]['objects'] = read_response[2]['mr_json']
+
+        return [True, {'status_code': 200, 'status_msg': f"{len(container_names)} containers are ready for use."}, repo_metadata]
+
+    async def release_container(self, repo_metadata, commit_description=None):
+        """
+        Write the caught containers and remove their lock files in a single commit.
+
+        Parameters
+        ----------
+        repo_metadata : dict
+            The metadata of the repository returned by catch_container.
+        commit_description : str, optional
+            The commit message, by default 'Performed CRUD operation on objects.'
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status code and message, and the commit SHA and new blob SHAs (or the error message in case of failure).
+        """
+        commit_description = commit_description if commit_description else 'Performed CRUD operation on objects.'
+        committed = await self.commit_containers(
+            {container: repo_metadata['containers'][container]['objects'] for container in repo_metadata['containers']},
+            repo_metadata['branch']['sha'],
+            commit_description,
+            remove_paths=[f"{container}/{self.lock_file_name}" for container in repo_metadata['containers']],
+            expected_shas={container: repo_metadata['containers'][container]['object_sha'] for container in repo_metadata['containers']}
+        )
+        if not committed[0]:
+            # Nothing was written, remove the locks so the containers are usable again
+            await self.abandon_container(repo_metadata)
+            return [False, {'status_code': 503, 'status_msg': f"Unable to write the containers due to [{committed[1]['status_msg']}]."}, committed]
+        repo_metadata['branch']['sha'] = committed[2]['commit_sha']
+        return [True, {'status_code': 200, 'status_msg': f"Released [{len(repo_metadata['containers'])}] containers."}, committed[2]]
+
+    async def abandon_container(self, repo_metadata):
+        """
+        Abandon caught containers without writing them by removing their lock files.
+
+        Parameters
+        ----------
+        repo_metadata : dict
+            The metadata of the repository returned by catch_container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status code and message, and the commit removing the lock files.
+        """
+        # Remove every lock file in one commit on top of the current head
+        head_sha = await self.get_head_sha()
+        if not head_sha[0]:
+            return [False, {'status_code': 503, 'status_msg': 'Unable to unlock every container, please check the lock files.'}, head_sha]
+        listed = await self.get_tree_files(head_sha[2], list(repo_metadata['containers']))
+        if not listed[0]:
+            return [False, {'status_code': 503, 'status_msg': 'Unable to unlock every container, please check the lock files.'}, listed]
+        lock_files = [f"{container}/{self.lock_file_name}" for container in repo_metadata['containers']]
+        committed = await self.commit_containers(
+            {},
+            head_sha[2],
+            f"Unlocking containers [{', '.join(repo_metadata['containers'])}]",
+            remove_paths=[lock_file for lock_file in lock_files if lock_file in listed[2]]
+        )
+        if not committed[0] or not all(lock_file in listed[2] for lock_file in lock_files):
+            return [False, {'status_code': 503, 'status_msg': 'Unable to unlock every container, please check the lock files.'}, committed]
+        return [True, {'status_code': 200, 'status_msg': f"Abandoned [{len(lock_files)}] containers."}, committed[2]]
+
+    async def mutate_containers(self, container_names, mutate, commit_description='Performed CRUD operation on objects.', retry_policy=None):
+        """
+        Apply a mutation to one or more containers without lock files using compare-and-swap writes.
+
+        See GitHubFunctions.mutate_containers, the containers are read concurrently.
+
+        Parameters
+        ----------
+        container_names : list
+            The names of the containers to mutate.
+        mutate : callable
+            A function that receives a dictionary mapping container names to their objects and changes
+            them in place. It may return a failed [False, status, data] list to abort without writing.
+        commit_description : str, optional
+            The commit message, by default 'Performed CRUD operation on objects.'
+        retry_policy : RetryPolicy, optional
+            The retry policy applied on conflicts, by default RetryPolicy().
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the commit information (or the error in case of failure).
+        """
+        retry_policy = retry_policy if retry_policy else RetryPolicy()
+        committed = [False, {'status_code': 409, 'status_msg': 'no attempt was made'}, None]
+        for attempt in range(retry_policy.max_attempts):
+            if attempt:
+                await asyncio.sleep(retry_policy.get_delay(attempt))
+            head_sha = await self.get_head_sha()
+            if not head_sha[0]:
+                return head_sha
+            read_responses = await asyncio.gather(*(self.read_objects(container_name, head_sha[2]) for container_name in container_names))
+            for read_response in read_responses:
+                if not read_response[0]:
+                    return read_response
+            containers = {name: response[2]['mr_json'] for name, response in zip(container_names, read_responses)}
+            expected_shas = {name: response[2]['sha'] for name, response in zip(container_names, read_responses)}
+            mutated = mutate(containers)
+            if isinstance(mutated, list) and mutated and mutated[0] is False:
+                return mutated
+            committed = await self.commit_containers(containers, head_sha[2], commit_description, expected_shas=expected_shas)
+            if committed[0]:
+                committed[2]['attempts'] = attempt + 1
+                return committed
+            if committed[1]['status_code'] != 409:
+                return committed
+        return [
+            False,
+            {'status_code': 409, 'status_msg': f"gave up after [{retry_policy.max_attempts}] conflicting attempts: {committed[1]['status_msg']}"},
+            committed[2]
+        ]
+
+    async def update_object(self, updates, optimistic=False, retry_policy=None):
+        """
+        Update objects in one or more containers, see GitHubFunctions.update_object.
+
+        Parameters
+        ----------
+        updates : dict
+            A dictionary containing the updates to apply per container.
+        optimistic : bool, optional
+            If True, use lock-free compare-and-swap writes instead of lock files, by default False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes, by default RetryPolicy().
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and a dictionary with the number of changed objects per container (or the error message in case of failure).
+        """
+        if not updates:
+            return [False, {'status_code': 400, 'status_msg': 'No updates provided.'}, None]
+        my_containers = list(updates.keys())
+        commit_description = f"Updated objects in [{', '.join(my_containers)}]."
+
+        if optimistic:
+            applied = []
+
+            def apply_updates(containers):
+                applied[:] = [self._apply_updates(updates, containers)]
+                return applied[0]
+
+            mutated = await self.mutate_containers(my_containers, apply_updates, commit_description, retry_policy)
+            if not mutated[0]:
+                return mutated
+            return [True, {'status_code': 200, 'status_msg': applied[0][1]['status_msg']}, applied[0][2]]
+
+        caught = await self.catch_container({'containers': {container: {} for container in my_containers}, 'branch': {}})
+        if not caught[0]:
+            return [False, {'status_code': 503, 'status_msg': caught[1]['status_msg']}, caught]
+        applied = self._apply_updates(updates, {container: caught[2]['containers'][container]['objects'] for container in my_containers})
+        if not applied[0]:
+            await self.abandon_container(caught[2])
+            return applied
+        released = await self.release_container(caught[2], commit_description)
+        if not released[0]:
+            return [
+                False,
+                {'status_code': 503, 'status_msg': 'Cannot release the containers please check [{}] in GitHub.'.format(', '.join(my_containers))},
+                released
+            ]
+        return [True, {'status_code': 200, 'status_msg': applied[1]['status_msg']}, applied[2]]
+
+    async def delete_objects(self, deletes, cascade=True, optimistic=False, retry_policy=None):
+        """
+        Delete many objects from one or more containers in a single commit, see GitHubFunctions.delete_objects.
+
+        Parameters
+        ----------
+        deletes : dict
+            A dictionary mapping container names to the names of the objects to delete.
+        cascade : bool, optional
+            Whether to delete the objects linked from deleted companies, by default True. Without it they are only unlinked.
+        optimistic : bool, optional
+            If True, use lock-free compare-and-swap writes instead of lock files, by default False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes, by default RetryPolicy().
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a summary with the deleted names and the number of removed and unlinked objects per container (or the error in case of failure).
+        """
+        deletes = {container_name: list(names) for container_name, names in deletes.items() if names}
+        if not deletes:
+            return [False, {'status_code': 400, 'status_msg': 'No objects to delete provided.'}, None]
+        my_containers = self._delete_containers(deletes, cascade)
+        commit_description = f"Deleted objects from [{', '.join(sorted(deletes))}]."
+
+        if optimistic:
+            applied = []
+
+            def apply_deletes(containers):
+                applied[:] = [self._apply_deletes(deletes, containers, cascade)]
+                return applied[0]
+
+            mutated = await self.mutate_containers(my_containers, apply_deletes, commit_description, retry_policy)
+            if not mutated[0]:
+                return mutated
+            return applied[0]
+
+        caught = await self.catch_container({'containers': {container: {} for container in my_containers}, 'branch': {}})
+        if not caught[0]:
+            return [False, {'status_code': 503, 'status_msg': caught[1]['status_msg']}, caught]
+        applied = self._apply_deletes(
+            deletes, {container: caught[2]['containers'][container]['objects'] for container in my_containers}, cascade)
+        if not applied[0]:
+            await self.abandon_container(caught[2])
+            return applied
+        released = await self.release_container(caught[2], commit_description)
+        if not released[0]:
+            return [
+                False,
+                {'status_code': 503, 'status_msg': 'Cannot release the containers please check [{}] in GitHub.'.format(', '.join(my_containers))},
+                released
+            ]
+        return applied
+
+    async def delete_object(self, obj_name, source, repo_metadata=None, catch_it=True):
+        """
+        Delete one object and unlink it from the objects of the linked containers, see GitHubFunctions.delete_object.
+
+        Parameters
+        ----------
+        obj_name : str
+            The name of the object to delete.
+        source : dict
+            The container of the object under 'from' and the containers linking to it under 'to'.
+        repo_metadata : dict, optional
+            Containers already caught with catch_container, used when catch_it is False.
+        catch_it : bool, optional
+            If True the containers are caught, changed and released, otherwise only the caught objects in repo_metadata are changed. Default is True.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the delete summary.
+        """
+        if catch_it:
+            return await self.delete_objects({source['from']: [obj_name]}, cascade=False)
+        caught = (repo_metadata or {}).get('containers', {})
+        containers = {
+            container: caught[container]['objects']
+            for container in [source['from']] + list(source.get('to', []))
+            if container in caught
+        }
+        return self._apply_deletes({source['from']: [obj_name]}, containers, cascade=False)
@@ -1,5 +1,8 @@
 from . github import GitHubFunctions
+from . index import ObjectIndex
 import hashlib
+import threading
+import time
 
 __license__ = "Apache 2.0"
 __copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
@@ -21,8 +24,15 @@ class BaseGitHubObject:
         An instance of the GitHubFunctions class for interacting with GitHub's API.
     obj_type : str
         The type of the objects this class will interact with.
+    index_fields : tuple
+        The attributes indexed for equality lookups by find_by_x.
+    index_ttl : float
+        The age in seconds up to which a revalidated index is reused without asking GitHub again.
     """
-    def __init__(self, token, org, process_name, obj_type):
+    default_index_fields = ('name',)
+    index_ttl = 5.0
+
+    def __init__(self, token, org, process_name, obj_type, index_fields=None, server_ctl=None):
         """
         Initialize a new instance of the BaseGitHubObject class.
 
@@ -36,9 +46,68 @@ class BaseGitHubObject:
             The name of the process.
         obj_type : str
             The type of the objects this class will interact with.
+        index_fields : list, optional
+            Additional attributes to index for equality lookups.
+        server_ctl : GitHubFunctions, optional
+            The functions object to use, e.g. to share one client between object types, see MediumroastClient.
         """
-        self.server_ctl = GitHubFunctions(token, org, process_name)
+        self.server_ctl = server_ctl if server_ctl is not None else GitHubFunctions(token, org, process_name)
         self.obj_type = obj_type
+        self.index_fields = tuple(dict.fromkeys(self.default_index_fields + tuple(index_fields or ())))
+        self._index = None
+        self._index_checked = 0.0
+        self._index_lock = threading.Lock()
+        self.server_ctl.add_write_listener(self._on_write)
+
+    def _on_write(self, container_name, objects, blob_sha):
+        # Our own commits carry the exact content of the new blob, so the index follows them without a fetch
+        if container_name == self.obj_type:
+            with self._index_lock:
+                self._index = ObjectIndex(objects, blob_sha, self.index_fields)
+                self._index_checked = time.monotonic()
+
+    def get_index(self, refresh=True, max_age=None):
+        """
+        Get the equality index over the current snapshot of the container.
+
+        The index is built once per container snapshot. With refresh the blob SHA of the container is
+        revalidated with a conditional request once the index is older than max_age, and the index is only
+        rebuilt when the SHA changed.
+
+        Parameters
+        ----------
+        refresh : bool, optional
+            If True, revalidate the snapshot with GitHub, otherwise reuse the current index if there is one. Default is True.
+        max_age : float, optional
+            The age in seconds up to which the index is reused without revalidation, by default index_ttl. Use 0 to always revalidate.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the ObjectIndex (or the error in case of failure).
+        """
+        max_age = self.index_ttl if max_age is None else max_age
+        index = self._index
+        if index is not None and (not refresh or time.monotonic() - self._index_checked < max_age):
+            return [True, {'status_code': 200, 'status_msg': f'reused index for [{self.obj_type}]'}, index]
+        checked = time.monotonic()
+        if index is not None:
+            current_sha = self.server_ctl.get_container_sha(self.obj_type)
+            if not current_sha[0]:
+                return current_sha
+            if current_sha[2] == index.sha:
+                with self._index_lock:
+                    if self._index is index:
+                        self._index_checked = checked
+                return [True, {'status_code': 200, 'status_msg': f'reused index for [{self.obj_type}]'}, index]
+        all_objects_resp = self.server_ctl.read_objects(self.obj_type)
+        if not all_objects_resp[0]:
+            return all_objects_resp
+        index = ObjectIndex(all_objects_resp[2]['mr_json'], all_objects_resp[2]['sha'], self.index_fields)
+        with self._index_lock:
+            self._index = index
+            self._index_checked = checked
+        return [True, {'status_code': 200, 'status_msg': f'built index for [{self.obj_type}]'}, index]
 
     def get_all(self):
         """
@@ -51,26 +120,35 @@ class BaseGitHubObject:
         """
         return self.server_ctl.read_objects(self.obj_type)
 
-    def find_by_name(self, name):
+    def find_by_name(self, name, refresh=True):
         """
         Find an object by its name.
 
+        With the default refresh the snapshot is revalidated at most once per index_ttl seconds, see get_index.
+
         Parameters
         ----------
         name : str
             The name of the object to find.
+        refresh : bool, optional
+            If True, revalidate the container snapshot once the index is older than index_ttl. Default is True.
 
         Returns
         -------
         dict
             The object with the specified name, or None if no such object exists.
         """
-        return self.find_by_x('name', name)
+        return self.find_by_x('name', name, refresh=refresh)
 
-    def find_by_x(self, attribute, value, all_objects=None):
+    def find_by_x(self, attribute, value, all_objects=None, refresh=True):
         """
         Find an object by a specified attribute.
 
+        Without all_objects the lookup runs against the index of the current container snapshot, see get_index.
+        With the default refresh the snapshot is revalidated with one conditional request at most once per
+        index_ttl seconds, so a bulk pass such as a dedupe reuses the index between revalidations. find_many
+        looks up many values against one snapshot in a single call.
+
         Parameters
         ----------
         attribute : str
@@ -78,25 +156,52 @@ class BaseGitHubObject:
         value : str
             The value of the attribute to search for.
         all_objects : list, optional
-            A list of all objects to search through. If None, all objects will be retrieved from the GitHub repository.
+            A list of all objects to search through. If None, the indexed container snapshot is used.
+        refresh : bool, optional
+            If True, revalidate the container snapshot once the index is older than index_ttl. Default is True.
 
         Returns
         -------
         dict
             The object with the specified attribute value, or None if no such object exists.
         """
-        my_objects = []
-        if all_objects is None:
-            all_objects_resp = self.server_ctl.read_objects(self.obj_type)
-            all_objects = all_objects_resp[2]
-        if len(all_objects) == 0:
+        if all_objects is not None:
+            all_objects = all_objects['mr_json'] if isinstance(all_objects, dict) else all_objects
+            if len(all_objects) == 0:
+                return [False, f"No {self.obj_type} objects found", None]
+            my_objects = [obj for obj in all_objects if obj.get(attribute) == value]
+            return [True, {'status_code': 200, 'status_msg': f'found objects matching {attribute} = {value}'}, my_objects]
+        index = self.get_index(refresh)
+        if not index[0]:
+            return index
+        if len(index[2].objects) == 0:
             return [False, f"No {self.obj_type} objects found", None]
-        for obj in all_objects['mr_json']:
-            if obj[attribute] == value:
-                my_objects.append(obj)
-        return [True, {'status_code': 200, 'status_msg': 'found objects matching {attribute} = {value}'}, my_objects]
+        return [True, {'status_code': 200, 'status_msg': f'found objects matching {attribute} = {value}'}, index[2].lookup(attribute, value)]
 
-    def create_obj(self, objs):
+    def find_many(self, attribute, values, refresh=True):
+        """
+        Find the objects for many values of one attribute against a single container snapshot.
+
+        Parameters
+        ----------
+        attribute : str
+            The attribute to search by.
+        values : iterable
+            The values of the attribute to search for.
+        refresh : bool, optional
+            If True, revalidate the container snapshot once the index is older than index_ttl. Default is True.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping each value to its matching objects.
+        """
+        index = self.get_index(refresh)
+        if not index[0]:
+            return index
+        return [True, {'status_code': 200, 'status_msg': f'found objects matching [{attribute}]'}, index[2].lookup_many(attribute, values)]
+
+    def create_obj(self, objs, optimistic=False, retry_policy=None):
         """
         Create new objects in the GitHub repository.
 
@@ -104,23 +209,37 @@ class BaseGitHubObject:
         ----------
         objs : list
             A list of dictionaries, where each dictionary represents an object to be created.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files. Default is False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes. If None, the default RetryPolicy is used.
 
         Returns
         -------
         list
             A list containing a boolean indicating success or failure, and a status message.
         """
-        caught = self.server_ctl.catch_container(self.obj_type)
-        if not caught[0]:
-            return caught
-        for obj in objs:
-            caught[2]['mrJson'].append(obj)
-        released = self.server_ctl.release_container(caught[2])
-        if not released[0]:
-            return released
+        commit_description = f"Created [{len(objs)}] [{self.obj_type}] objects."
+        if optimistic:
+            created = self.server_ctl.mutate_containers(
+                [self.obj_type],
+                lambda containers: containers[self.obj_type].extend(objs),
+                commit_description,
+                retry_policy
+            )
+            if not created[0]:
+                return created
+        else:
+            caught = self.server_ctl.catch_container({'containers': {self.obj_type: {}}, 'branch': {}})
+            if not caught[0]:
+                return caught
+            caught[2]['containers'][self.obj_type]['objects'].extend(objs)
+            released = self.server_ctl.release_container(caught[2], commit_description)
+            if not released[0]:
+                return released
         return [True, {'status_code': 200, 'status_msg': f"created [{len(objs)}] {self.obj_type}"}, None]
 
-    def update_obj(self, updates):
+    def update_obj(self, updates, optimistic=False, retry_policy=None):
         """
         Update objects in the GitHub repository.
 
@@ -128,13 +247,17 @@ class BaseGitHubObject:
         ----------
         updates : dict
             A dictionary where the keys are the object names and the values are the updates to apply.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files. Default is False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes. If None, the default RetryPolicy is used.
 
         Returns
         -------
         list
             A list containing a boolean indicating success or failure, and a status message.
         """
-        return self.server_ctl.update_object(updates)
+        return self.server_ctl.update_object(updates, optimistic, retry_policy)
 
     def delete_obj(self, obj_name, source, repo_metadata=None, catch_it=True):
         """
@@ -158,6 +281,28 @@ class BaseGitHubObject:
         """
         return self.server_ctl.delete_object(obj_name, source, repo_metadata, catch_it)
 
+    def delete_objs(self, obj_names, cascade=True, optimistic=False, retry_policy=None):
+        """
+        Delete many objects at once, see GitHubFunctions.delete_objects.
+
+        Parameters
+        ----------
+        obj_names : list
+            The names of the objects to delete.
+        cascade : bool, optional
+            If True, the objects linked from deleted companies are deleted too, otherwise they are only unlinked. Default is True.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files. Default is False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes. If None, the default RetryPolicy is used.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a summary of the deleted and unlinked objects.
+        """
+        return self.server_ctl.delete_objects({self.obj_type: obj_names}, cascade, optimistic, retry_policy)
+
     def link_obj(self, objs):
         """
         Link objects by creating a hash of their names.
@@ -205,7 +350,9 @@ class Studies(BaseGitHubObject):
     obj_type : str
         The type of the objects this class will interact with. For this subclass, obj_type is always 'Studies'.
     """
-    def __init__(self, token, org, process_name):
+    default_index_fields = ('name', 'status')
+
+    def __init__(self, token, org, process_name, index_fields=None, server_ctl=None):
         """
         Initialize a new instance of the Studies class.
 
@@ -217,8 +364,12 @@ class Studies(BaseGitHubObject):
             The name of the organization on GitHub.
         process_name : str
             The name of the process.
+        index_fields : list, optional
+            Additional attributes to index for equality lookups.
+        server_ctl : GitHubFunctions, optional
+            The functions object to use, by default a new one.
         """
-        super().__init__(token, org, process_name, 'Studies')
+        super().__init__(token, org, process_name, 'Studies', index_fields, server_ctl)
 
 
 class Users(BaseGitHubObject):
@@ -235,7 +386,7 @@ class Users(BaseGitHubObject):
     obj_type : str
         The type of the objects this class will interact with. For this subclass, obj_type is always 'Users'.
     """
-    def __init__(self, token, org, process_name):
+    def __init__(self, token, org, process_name, server_ctl=None):
         """
         Initialize a new instance of the Users class.
 
@@ -247,8 +398,10 @@ class Users(BaseGitHubObject):
             The name of the organization on GitHub.
         process_name : str
             The name of the process.
+        server_ctl : GitHubFunctions, optional
+            The functions object to use, by default a new one.
         """
-        super().__init__(token, org, process_name, 'Users')
+        super().__init__(token, org, process_name, 'Users', server_ctl=server_ctl)
 
     def get_all(self):
         """
@@ -272,6 +425,17 @@ class Users(BaseGitHubObject):
         """
         return self.server_ctl.get_user()
 
+    def refresh(self):
+        """
+        Revalidate the cached users, e.g. periodically in a long-running service.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the refresh counters.
+        """
+        return self.server_ctl.refresh_users()
+
     def find_by_name(self, name):
         """
         Find a user object by its login name.
@@ -292,23 +456,22 @@ class Users(BaseGitHubObject):
         """
         Find a user object by a specific attribute.
 
+        Users are looked up in the user directory of the shared functions object, a lookup by login or id
+        only pages through the collaborators until the user is found.
+
         Parameters
         ----------
-        x : str
+        attribute : str
             The attribute of the user to find.
+        value : str
+            The value of the attribute to search for.
 
         Returns
         -------
         dict
             The user object with the specified attribute value, or None if no such user exists.
         """
-        my_users = []
-        all_users_resp = self.get_all()
-        all_users = all_users_resp[2]
-        for user in all_users:
-            if user.get(attribute) == value:
-                my_users.append(user)
-        return [True, f"SUCCESS: found all users where {attribute} = {value}", my_users]
+        return self.server_ctl.find_users(attribute, value)
 
 
 class Billings(BaseGitHubObject):
@@ -325,7 +488,7 @@ class Billings(BaseGitHubObject):
     obj_type : str
         The type of the objects this class will interact with. For this subclass, obj_type is always 'Billings'.
     """
-    def __init__(self, token, org, process_name):
+    def __init__(self, token, org, process_name, server_ctl=None):
         """
         Initialize a new instance of the Billings class.
 
@@ -337,32 +500,43 @@ class Billings(BaseGitHubObject):
             The name of the organization on GitHub.
         process_name : str
             The name of the process.
+        server_ctl : GitHubFunctions, optional
+            The functions object to use, by default a new one.
         """
-        super().__init__(token, org, process_name, 'Billings')
+        super().__init__(token, org, process_name, 'Billings', server_ctl=server_ctl)
 
-    def get_all(self):
+    def get_all(self, max_age=None):
         """
         Retrieve all billing objects from the GitHub repository.
 
+        Parameters
+        ----------
+        max_age : float, optional
+            The age in seconds up to which cached billings are reused, by default the billing TTL. Use 0 to force a fetch.
+
         Returns
         -------
         list
             A list of all billing objects.
         """
-        storage_billings_resp = self.server_ctl.get_storage_billings()
-        actions_billings_resp = self.server_ctl.get_actions_billings()
+        # Both billings are fetched concurrently and reused for the billing TTL of the shared functions object
+        billings_resp = self.server_ctl.get_billings(max_age)
+        if not billings_resp[0]:
+            return billings_resp
+        storage = billings_resp[2]['storage']
+        actions = billings_resp[2]['actions']
         all_billings = [
             {
                 'resourceType': 'Storage',
-                'includedUnits': str(storage_billings_resp[2]['estimated_storage_for_month']) + ' GiB',
-                'paidUnitsUsed': str(storage_billings_resp[2]['estimated_paid_storage_for_month']) + ' GiB',
-                'totalUnitsUsed': str(storage_billings_resp[2]['estimated_storage_for_month']) + ' GiB'
+                'includedUnits': str(storage['estimated_storage_for_month']) + ' GiB',
+                'paidUnitsUsed': str(storage['estimated_paid_storage_for_month']) + ' GiB',
+                'totalUnitsUsed': str(storage['estimated_storage_for_month']) + ' GiB'
             },
             {
                 'resourceType': 'Actions',
-                'includedUnits': str(actions_billings_resp[2]['total_minutes_used']) + ' min',
-                'paidUnitsUsed': str(actions_billings_resp[2]['total_paid_minutes_used']) + ' min',
-                'totalUnitsUsed': str(actions_billings_resp[2]['total_minutes_used'] + actions_billings_resp[2]['total_paid_minutes_used']) + ' min'
+                'includedUnits': str(actions['total_minutes_used']) + ' min',
+                'paidUnitsUsed': str(actions['total_paid_minutes_used']) + ' min',
+                'totalUnitsUsed': str(actions['total_minutes_used'] + actions['total_paid_minutes_used']) + ' min'
             }
         ]
         return [True, {'status_code': 200, 'status_msg': 'found all billings'}, all_billings]
@@ -393,6 +567,29 @@ class Billings(BaseGitHubObject):
         """
         return self.server_ctl.get_storage_billings()
 
+    def get_history(self, key, since=None, until=None):
+        """
+        Retrieve the recorded time series of one billing value without calling GitHub.
+
+        Parameters
+        ----------
+        key : str
+            The flattened billing key, e.g. 'actions.total_minutes_used' or 'storage.estimated_paid_storage_for_month'.
+        since : float, optional
+            The earliest epoch time to return.
+        until : float, optional
+            The latest epoch time to return.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the (time, value) tuples.
+        """
+        if self.server_ctl.billing_history is None:
+            return [False, {'status_code': 503, 'status_msg': 'no billing history is kept, pass a BillingHistory to GitHubFunctions'}, None]
+        series = self.server_ctl.billing_history.get_series(self.server_ctl.org_name, key, since, until)
+        return [True, {'status_code': 200, 'status_msg': f'found [{len(series)}] samples of [{key}]'}, series]
+
 
 class Companies(BaseGitHubObject):
     """
@@ -408,7 +605,21 @@ class Companies(BaseGitHubObject):
     obj_type : str
         The type of the objects this class will interact with. For this subclass, obj_type is always 'Companies'.
     """
-    def __init__(self, token, org, process_name):
+    default_index_fields = ('name', 'company_type', 'status')
+    # The attributes users may update, system updates may change any attribute
+    white_list = [
+        'description', 'company_type', 'url', 'role', 'wikipedia_url', 'status', 
+        'logo_url', 'region', 'country', 'city', 'state_province', 'zip_postal', 
+        'street_address', 'latitude', 'longitude', 'phone', 'google_maps_url', 
+        'google_news_url', 'google_finance_url', 'google_patents_url', 'cik', 
+        'stock_symbol', 'stock_exchange', 'recent_10k_url', 'recent_10q_url', 
+        'firmographic_url', 'filings_url', 'owner_tranasactions', 'industry', 
+        'industry_code', 'industry_group_code', 'industry_group_description', 
+        'major_group_code', 'major_group_description', 'tags', 'topics', 'quality',
+        'similarity'
+    ]
+
+    def __init__(self, token, org, process_name, index_fields=None, server_ctl=None):
         """
         Initialize a new instance of the Companies class.
 
@@ -420,10 +631,14 @@ class Companies(BaseGitHubObject):
             The name of the organization on GitHub.
         process_name : str
             The name of the process.
+        index_fields : list, optional
+            Additional attributes to index for equality lookups.
+        server_ctl : GitHubFunctions, optional
+            The functions object to use, by default a new one.
         """
-        super().__init__(token, org, process_name, 'Companies')
+        super().__init__(token, org, process_name, 'Companies', index_fields, server_ctl)
 
-    def update_obj(self, obj_to_update, dont_write=False, system=False):
+    def update_obj(self, obj_to_update, dont_write=False, system=False, optimistic=False, retry_policy=None):
         """
         Update a company object in the GitHub repository.
 
@@ -437,36 +652,28 @@ class Companies(BaseGitHubObject):
             If True, the object will not be written to the repository.
         system : bool, optional
             If True, the object will be treated as a system object.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes.
 
         Returns
         -------
         dict
             The updated company object.
         """
-        # TODO this won't work becuse the structure of updates needs to be different
         name = obj_to_update['name']
         key = obj_to_update['key']
         value = obj_to_update['value']
-        white_list = [
-            'description', 'company_type', 'url', 'role', 'wikipedia_url', 'status', 
-            'logo_url', 'region', 'country', 'city', 'state_province', 'zip_postal', 
-            'street_address', 'latitude', 'longitude', 'phone', 'google_maps_url', 
-            'google_news_url', 'google_finance_url', 'google_patents_url', 'cik', 
-            'stock_symbol', 'stock_exchange', 'recent_10k_url', 'recent_10q_url', 
-            'firmographic_url', 'filings_url', 'owner_tranasactions', 'industry', 
-            'industry_code', 'industry_group_code', 'industry_group_description', 
-            'major_group_code', 'major_group_description', 'tags', 'topics', 'quality',
-            'similarity'
-        ]
         updates = {
             self.obj_type: {
-                'updates': updates,
+                'updates': {name: {key: value}},
                 'system': system,
-                'white_list': white_list
+                'white_list': self.white_list
             }
         }
 
-        return super().update_obj(updates)
+        return super().update_obj(updates, optimistic, retry_policy)
 
     def delete_obj(self, obj_name, allow_orphans=False):
         """
@@ -478,64 +685,20 @@ class Companies(BaseGitHubObject):
         ----------
         obj_name : str
             The name of the company object to delete.
+        allow_orphans : bool, optional
+            If True, the linked interactions are kept and only unlinked. Default is False.
 
         Returns
         -------
         list
-            A list containing a boolean indicating the success of the operation, a dictionary with status information, and None.
+            A list containing a boolean indicating the success of the operation, a dictionary with status information, and the delete summary.
         """
-        source = {
-            'from': 'Companies',
-            'to': ['Interactions']
-        }
-
-        # If allow_orphans is true then use the BaseGitHubObject delete_obj
-        if allow_orphans:
-            return super().delete_obj(obj_name, source)
-
-        # Catch the Companies and Interaction containers
-        # Assign repo_metadata to capture Companies and Studies
-        repo_metadata = {
-            'containers': {
-                'Companies': {},
-                'Interactions': {}
-            },
-            'branch': {}
-        }
-        caught = self.server_ctl.catch_container(repo_metadata)
-
-        # Use find_by_x to get all linked_interactions
-        # NOTE: This has to be done here because the company has been deleted in the next step
-        get_company_object = self.find_by_x(
-            'name', obj_name, caught[2]['containers']['Companies']['objects'])
-        if not get_company_object[0]:
-            return get_company_object
-        linked_interactions = get_company_object[2][0]['linked_interactions']
-
-        # Delete all linked interactions
-        # Update source to be from the perspective of the Interactions
-        source = {
-            'from': 'Interactions',
-            'to': ['Companies']
-        }
-        # Use delete_object to delete all linked_interactions
-        for interaction in linked_interactions:
-            delete_interaction_obj_resp = self.server_ctl.delete_object(
-                interaction,
-                source,
-                caught[2],
-                False
-            )
-            if not delete_interaction_obj_resp[0]:
-                return delete_interaction_obj_resp
-
-        # Release the container
-        released = self.server_ctl.release_container(caught[2])
-        if not released[0]:
-            return released
-
-        # Return the response
-        return [True, {'status_code': 200, 'status_msg': f'deleted company [{obj_name}] and all linked interactions'}, None]
+        # The company, and unless orphans are allowed its linked interactions, are removed in one commit
+        deleted = self.delete_objs([obj_name], cascade=not allow_orphans)
+        if not deleted[0]:
+            return deleted
+        linked = 'unlinked its interactions' if allow_orphans else 'all linked interactions'
+        return [True, {'status_code': 200, 'status_msg': f'deleted company [{obj_name}] and {linked}'}, deleted[2]]
 
 class Interactions(BaseGitHubObject):
     """
@@ -551,7 +714,15 @@ class Interactions(BaseGitHubObject):
     obj_type : str
         The type of the objects this class will interact with. For this subclass, obj_type is always 'Interactions'.
     """
-    def __init__(self, token, org, process_name):
+    default_index_fields = ('name', 'file_hash', 'status')
+    # The attributes users may update, system updates may change any attribute
+    white_list = [
+        'status', 'content_type', 'file_size', 'reading_time', 'word_count', 'page_count', 'description', 'abstract',
+        'region', 'country', 'city', 'state_province', 'zip_postal', 'street_address', 'latitude', 'longitude',
+        'public', 'groups', 'contact_name', 'topics', 'tags'
+    ]
+
+    def __init__(self, token, org, process_name, index_fields=None, server_ctl=None):
         """
         Initialize a new instance of the Interactions class.
 
@@ -563,10 +734,14 @@ class Interactions(BaseGitHubObject):
             The name of the organization on GitHub.
         process_name : str
             The name of the process.
+        index_fields : list, optional
+            Additional attributes to index for equality lookups.
+        server_ctl : GitHubFunctions, optional
+            The functions object to use, by default a new one.
         """
-        super().__init__(token, org, process_name, 'Interactions')
+        super().__init__(token, org, process_name, 'Interactions', index_fields, server_ctl)
 
-    def update_obj(self, updates, system=False):
+    def update_obj(self, updates, system=False, optimistic=False, retry_policy=None):
         """
         Update an interaction object in the GitHub repository.
 
@@ -580,27 +755,25 @@ class Interactions(BaseGitHubObject):
             If True, the object will not be written to the repository.
         system : bool, optional
             If True, the object will be treated as a system object.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes.
 
         Returns
         -------
         dict
             The updated interaction object.
         """
-        # Define the attributes that can be updated by the user
-        white_list = [
-            'status', 'content_type', 'file_size', 'reading_time', 'word_count', 'page_count', 'description', 'abstract',
-            'region', 'country', 'city', 'state_province', 'zip_postal', 'street_address', 'latitude', 'longitude',
-            'public', 'groups', 'contact_name', 'topics', 'tags'
-        ]
         updates = {
             self.obj_type: {
                 'updates': updates,
                 'system': system,
-                'white_list': white_list
+                'white_list': self.white_list
             }
         }
 
-        return super().update_obj(updates)
+        return super().update_obj(updates, optimistic, retry_policy)
 
     def delete_obj(self, obj_name):
         """
@@ -625,23 +798,27 @@ class Interactions(BaseGitHubObject):
 
         return super().delete_obj(obj_name, source)
 
-    def find_by_hash(self, hash):
+    def find_by_hash(self, hash, refresh=True):
         """
         Find an interaction object by its file hash.
 
         This method uses the find_by_x method to find an interaction object with the specified file hash.
+        With the default refresh the snapshot is revalidated at most once per index_ttl seconds, so a bulk pass
+        such as deduplicating thousands of files costs one conditional request per interval, see get_index.
 
         Parameters
         ----------
         hash : str
             The file hash of the interaction object to find.
+        refresh : bool, optional
+            If True, revalidate the container snapshot once the index is older than index_ttl. Default is True.
 
         Returns
         -------
         dict
             The interaction object with the specified file hash, or None if no such object exists.
         """
-        return self.find_by_x('file_hash', hash)
+        return self.find_by_x('file_hash', hash, refresh=refresh)
     
     def download_interaction_content(self, interaction_path):
         
@@ -662,3 +839,33 @@ class Interactions(BaseGitHubObject):
         """
         file_contents = self.server_ctl.read_blob(interaction_path)
         return file_contents
+
+    def download_interaction_contents(self, interactions, target_dir=None, max_workers=8, retry_policy=None, progress=None):
+        """
+        Download the files associated with many interaction objects through a bounded thread pool.
+
+        Without target_dir the results arrive as a generator in completion order, with target_dir the
+        files are streamed to the directory and a summary is returned, see GitHubFunctions.iter_blobs.
+
+        Parameters
+        ----------
+        interactions : iterable
+            The paths of the files, or interaction objects whose url attribute holds the path.
+        target_dir : str, optional
+            The directory to stream the files to, keeping their repository paths.
+        max_workers : int, optional
+            The maximum number of concurrent downloads, by default 8.
+        retry_policy : RetryPolicy, optional
+            The retry policy applied to each file, by default RetryPolicy(max_attempts=3).
+        progress : callable, optional
+            Called as progress(path, result, completed) after each file.
+
+        Returns
+        -------
+        generator or list
+            (path, result) tuples as they complete, or the download_blobs summary when target_dir is set.
+        """
+        paths = (interaction['url'] if isinstance(interaction, dict) else interaction for interaction in interactions)
+        if target_dir is None:
+            return self.server_ctl.iter_blobs(paths, None, max_workers, retry_policy, progress)
+        return self.server_ctl.download_blobs(paths, target_dir, max_workers, retry_policy, progress)
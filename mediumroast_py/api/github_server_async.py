@@ -0,0 +1,556 @@
+from . github_async import AsyncGitHubFunctions
+from . github_server import Companies, Interactions, Studies
+from . index import ObjectIndex
+import hashlib
+import time
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class AsyncBaseGitHubObject:
+    """
+    An asyncio base class for interacting with objects stored in GitHub.
+
+    This is the counterpart of BaseGitHubObject on top of AsyncGitHubFunctions,
+    the methods are coroutines returning the same [ok, status, data] lists.
+
+    Attributes
+    ----------
+    server_ctl : AsyncGitHubFunctions
+        An instance of the AsyncGitHubFunctions class for interacting with GitHub's API.
+    obj_type : str
+        The type of the objects this class will interact with.
+    index_fields : tuple
+        The attributes indexed for equality lookups by find_by_x.
+    index_ttl : float
+        The age in seconds up to which a revalidated index is reused without asking GitHub again.
+    """
+    default_index_fields = ('name',)
+    index_ttl = 5.0
+
+    def __init__(self, token, org, process_name, obj_type, index_fields=None, server_ctl=None):
+        """
+        Initialize a new instance of the AsyncBaseGitHubObject class.
+
+        Parameters
+        ----------
+        token : str
+            The personal access token for GitHub's API.
+        org : str
+            The name of the organization on GitHub.
+        process_name : str
+            The name of the process.
+        obj_type : str
+            The type of the objects this class will interact with.
+        index_fields : list, optional
+            Additional attributes to index for equality lookups.
+        server_ctl : AsyncGitHubFunctions, optional
+            The functions object to use, e.g. to share one connection pool between object types.
+        """
+        self.server_ctl = server_ctl if server_ctl is not None else AsyncGitHubFunctions(token, org, process_name)
+        # Only a functions object created here is closed on exit, a shared one belongs to its caller
+        self._owns_server_ctl = server_ctl is None
+        self.obj_type = obj_type
+        self.index_fields = tuple(dict.fromkeys(self.default_index_fields + tuple(index_fields or ())))
+        self._index = None
+        self._index_checked = 0.0
+        self.server_ctl.add_write_listener(self._on_write)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._owns_server_ctl:
+            await self.server_ctl.close()
+
+    def _on_write(self, container_name, objects, blob_sha):
+        # Our own commits carry the exact content of the new blob, so the index follows them without a fetch
+        if container_name == self.obj_type:
+            self._index = ObjectIndex(objects, blob_sha, self.index_fields)
+            self._index_checked = time.monotonic()
+
+    async def get_index(self, refresh=True, max_age=None):
+        """
+        Get the equality index over the current snapshot of the container, see BaseGitHubObject.get_index.
+
+        Parameters
+        ----------
+        refresh : bool, optional
+            If True, revalidate the snapshot with GitHub, otherwise reuse the current index if there is one. Default is True.
+        max_age : float, optional
+            The age in seconds up to which the index is reused without revalidation, by default index_ttl. Use 0 to always revalidate.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the ObjectIndex (or the error in case of failure).
+        """
+        max_age = self.index_ttl if max_age is None else max_age
+        index = self._index
+        if index is not None and (not refresh or time.monotonic() - self._index_checked < max_age):
+            return [True, {'status_code': 200, 'status_msg': f'reused index for [{self.obj_type}]'}, index]
+        checked = time.monotonic()
+        if index is not None:
+            current_sha = await self.server_ctl.get_container_sha(self.obj_type)
+            if not current_sha[0]:
+                return current_sha
+            if current_sha[2] == index.sha:
+                if self._index is index:
+                    self._index_checked = checked
+                return [True, {'status_code': 200, 'status_msg': f'reused index for [{self.obj_type}]'}, index]
+        all_objects_resp = await self.server_ctl.read_objects(self.obj_type)
+        if not all_objects_resp[0]:
+            return all_objects_resp
+        self._index = ObjectIndex(all_objects_resp[2]['mr_json'], all_objects_resp[2]['sha'], self.index_fields)
+        self._index_checked = checked
+        return [True, {'status_code': 200, 'status_msg': f'built index for [{self.obj_type}]'}, self._index]
+
+    async def get_all(self):
+        """
+        Retrieve all objects of the specified type from the GitHub repository.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the objects with their SHA.
+        """
+        return await self.server_ctl.read_objects(self.obj_type)
+
+    async def find_by_name(self, name, refresh=True):
+        """
+        Find an object by its name.
+
+        Parameters
+        ----------
+        name : str
+            The name of the object to find.
+        refresh : bool, optional
+            If True, revalidate the container snapshot once the index is older than index_ttl. Default is True.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the matching objects.
+        """
+        return await self.find_by_x('name', name, refresh=refresh)
+
+    async def find_by_x(self, attribute, value, all_objects=None, refresh=True):
+        """
+        Find an object by a specified attribute, see BaseGitHubObject.find_by_x.
+
+        With the default refresh the snapshot is revalidated at most once per index_ttl seconds, see get_index.
+
+        Parameters
+        ----------
+        attribute : str
+            The attribute to search by.
+        value : str
+            The value of the attribute to search for.
+        all_objects : list, optional
+            A list of all objects to search through. If None, the indexed container snapshot is used.
+        refresh : bool, optional
+            If True, revalidate the container snapshot once the index is older than index_ttl. Default is True.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the matching objects.
+        """
+        if all_objects is not None:
+            all_objects = all_objects['mr_json'] if isinstance(all_objects, dict) else all_objects
+            if len(all_objects) == 0:
+                return [False, f"No {self.obj_type} objects found", None]
+            my_objects = [obj for obj in all_objects if obj.get(attribute) == value]
+            return [True, {'status_code': 200, 'status_msg': f'found objects matching {attribute} = {value}'}, my_objects]
+        index = await self.get_index(refresh)
+        if not index[0]:
+            return index
+        if len(index[2].objects) == 0:
+            return [False, f"No {self.obj_type} objects found", None]
+        return [True, {'status_code': 200, 'status_msg': f'found objects matching {attribute} = {value}'}, index[2].lookup(attribute, value)]
+
+    async def find_many(self, attribute, values, refresh=True):
+        """
+        Find the objects for many values of one attribute against a single container snapshot.
+
+        Parameters
+        ----------
+        attribute : str
+            The attribute to search by.
+        values : iterable
+            The values of the attribute to search for.
+        refresh : bool, optional
+            If True, revalidate the container snapshot once the index is older than index_ttl. Default is True.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping each value to its matching objects.
+        """
+        index = await self.get_index(refresh)
+        if not index[0]:
+            return index
+        return [True, {'status_code': 200, 'status_msg': f'found objects matching [{attribute}]'}, index[2].lookup_many(attribute, values)]
+
+    async def create_obj(self, objs, optimistic=False, retry_policy=None):
+        """
+        Create new objects in the GitHub repository.
+
+        Parameters
+        ----------
+        objs : list
+            A list of dictionaries, where each dictionary represents an object to be created.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files. Default is False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes. If None, the default RetryPolicy is used.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, and a status message.
+        """
+        commit_description = f"Created [{len(objs)}] [{self.obj_type}] objects."
+        if optimistic:
+            created = await self.server_ctl.mutate_containers(
+                [self.obj_type],
+                lambda containers: containers[self.obj_type].extend(objs),
+                commit_description,
+                retry_policy
+            )
+            if not created[0]:
+                return created
+        else:
+            caught = await self.server_ctl.catch_container({'containers': {self.obj_type: {}}, 'branch': {}})
+            if not caught[0]:
+                return caught
+            caught[2]['containers'][self.obj_type]['objects'].extend(objs)
+            released = await self.server_ctl.release_container(caught[2], commit_description)
+            if not released[0]:
+                return released
+        return [True, {'status_code': 200, 'status_msg': f"created [{len(objs)}] {self.obj_type}"}, None]
+
+    async def update_obj(self, updates, optimistic=False, retry_policy=None):
+        """
+        Update objects in the GitHub repository.
+
+        Parameters
+        ----------
+        updates : dict
+            A dictionary where the keys are the object names and the values are the updates to apply.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files. Default is False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes. If None, the default RetryPolicy is used.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, and a status message.
+        """
+        return await self.server_ctl.update_object(updates, optimistic, retry_policy)
+
+    async def delete_obj(self, obj_name, source, repo_metadata=None, catch_it=True):
+        """
+        Delete an object from the GitHub repository, see BaseGitHubObject.delete_obj.
+
+        Parameters
+        ----------
+        obj_name : str
+            The name of the object to delete.
+        source : dict
+            The container of the object under 'from' and the containers linking to it under 'to'.
+        repo_metadata : dict, optional
+            Containers already caught with catch_container, used when catch_it is False.
+        catch_it : bool, optional
+            If True, the container will be caught (locked) before the object is deleted. Default is True.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the delete summary.
+        """
+        return await self.server_ctl.delete_object(obj_name, source, repo_metadata, catch_it)
+
+    async def delete_objs(self, obj_names, cascade=True, optimistic=False, retry_policy=None):
+        """
+        Delete many objects at once, see GitHubFunctions.delete_objects.
+
+        Parameters
+        ----------
+        obj_names : list
+            The names of the objects to delete.
+        cascade : bool, optional
+            If True, the objects linked from deleted companies are deleted too, otherwise they are only unlinked. Default is True.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files. Default is False.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes. If None, the default RetryPolicy is used.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a summary of the deleted and unlinked objects.
+        """
+        return await self.server_ctl.delete_objects({self.obj_type: obj_names}, cascade, optimistic, retry_policy)
+
+    def link_obj(self, objs):
+        """
+        Link objects by creating a hash of their names.
+
+        Parameters
+        ----------
+        objs : list
+            A list of dictionaries, where each dictionary represents an object to be linked.
+
+        Returns
+        -------
+        dict
+            A dictionary where the keys are the object names and the values are the hashes of the names.
+        """
+        return {obj['name']: hashlib.sha256(obj['name'].encode()).hexdigest() for obj in objs}
+
+    async def check_for_lock(self):
+        """
+        Check if the container for the objects is currently locked.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating whether the container is locked, and a status message.
+        """
+        return await self.server_ctl.check_for_lock(self.obj_type)
+
+
+class AsyncStudies(AsyncBaseGitHubObject):
+    """
+    An asyncio subclass of AsyncBaseGitHubObject for study objects stored in GitHub.
+    """
+    default_index_fields = Studies.default_index_fields
+
+    def __init__(self, token, org, process_name, index_fields=None, server_ctl=None):
+        """
+        Initialize a new instance of the AsyncStudies class.
+
+        Parameters
+        ----------
+        token : str
+            The personal access token for GitHub's API.
+        org : str
+            The name of the organization on GitHub.
+        process_name : str
+            The name of the process.
+        index_fields : list, optional
+            Additional attributes to index for equality lookups.
+        server_ctl : AsyncGitHubFunctions, optional
+            The functions object to use.
+        """
+        super().__init__(token, org, process_name, 'Studies', index_fields, server_ctl)
+
+
+class AsyncCompanies(AsyncBaseGitHubObject):
+    """
+    An asyncio subclass of AsyncBaseGitHubObject for company objects stored in GitHub.
+    """
+    default_index_fields = Companies.default_index_fields
+    white_list = Companies.white_list
+
+    def __init__(self, token, org, process_name, index_fields=None, server_ctl=None):
+        """
+        Initialize a new instance of the AsyncCompanies class.
+
+        Parameters
+        ----------
+        token : str
+            The personal access token for GitHub's API.
+        org : str
+            The name of the organization on GitHub.
+        process_name : str
+            The name of the process.
+        index_fields : list, optional
+            Additional attributes to index for equality lookups.
+        server_ctl : AsyncGitHubFunctions, optional
+            The functions object to use.
+        """
+        super().__init__(token, org, process_name, 'Companies', index_fields, server_ctl)
+
+    async def update_obj(self, obj_to_update, system=False, optimistic=False, retry_policy=None):
+        """
+        Update a company object in the GitHub repository, see Companies.update_obj.
+
+        Parameters
+        ----------
+        obj_to_update : dict
+            The name of the company with the key and value to update.
+        system : bool, optional
+            If True, the object will be treated as a system object.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the number of changed objects.
+        """
+        updates = {
+            self.obj_type: {
+                'updates': {obj_to_update['name']: {obj_to_update['key']: obj_to_update['value']}},
+                'system': system,
+                'white_list': self.white_list
+            }
+        }
+        return await super().update_obj(updates, optimistic, retry_policy)
+
+    async def delete_obj(self, obj_name, allow_orphans=False):
+        """
+        Delete a company object and its linked interactions in one commit, see Companies.delete_obj.
+
+        Parameters
+        ----------
+        obj_name : str
+            The name of the company object to delete.
+        allow_orphans : bool, optional
+            If True, the linked interactions are kept and only unlinked. Default is False.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating the success of the operation, a dictionary with status information, and the delete summary.
+        """
+        deleted = await self.delete_objs([obj_name], cascade=not allow_orphans)
+        if not deleted[0]:
+            return deleted
+        linked = 'unlinked its interactions' if allow_orphans else 'all linked interactions'
+        return [True, {'status_code': 200, 'status_msg': f'deleted company [{obj_name}] and {linked}'}, deleted[2]]
+
+
+class AsyncInteractions(AsyncBaseGitHubObject):
+    """
+    An asyncio subclass of AsyncBaseGitHubObject for interaction objects stored in GitHub.
+    """
+    default_index_fields = Interactions.default_index_fields
+    white_list = Interactions.white_list
+
+    def __init__(self, token, org, process_name, index_fields=None, server_ctl=None):
+        """
+        Initialize a new instance of the AsyncInteractions class.
+
+        Parameters
+        ----------
+        token : str
+            The personal access token for GitHub's API.
+        org : str
+            The name of the organization on GitHub.
+        process_name : str
+            The name of the process.
+        index_fields : list, optional
+            Additional attributes to index for equality lookups.
+        server_ctl : AsyncGitHubFunctions, optional
+            The functions object to use.
+        """
+        super().__init__(token, org, process_name, 'Interactions', index_fields, server_ctl)
+
+    async def update_obj(self, updates, system=False, optimistic=False, retry_policy=None):
+        """
+        Update interaction objects in the GitHub repository, see Interactions.update_obj.
+
+        Parameters
+        ----------
+        updates : dict
+            A dictionary mapping interaction names to the attributes to update.
+        system : bool, optional
+            If True, the object will be treated as a system object.
+        optimistic : bool, optional
+            If True, write with lock-free compare-and-swap retries instead of lock files.
+        retry_policy : RetryPolicy, optional
+            The retry policy for optimistic writes.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the number of changed objects.
+        """
+        updates = {
+            self.obj_type: {
+                'updates': updates,
+                'system': system,
+                'white_list': self.white_list
+            }
+        }
+        return await super().update_obj(updates, optimistic, retry_policy)
+
+    async def find_by_hash(self, hash, refresh=True):
+        """
+        Find an interaction object by its file hash.
+
+        With the default refresh the snapshot is revalidated at most once per index_ttl seconds, see get_index.
+
+        Parameters
+        ----------
+        hash : str
+            The file hash of the interaction object to find.
+        refresh : bool, optional
+            If True, revalidate the container snapshot once the index is older than index_ttl. Default is True.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the matching objects.
+        """
+        return await self.find_by_x('file_hash', hash, refresh=refresh)
+
+    async def delete_obj(self, obj_name):
+        """
+        Delete an interaction object and unlink it from the companies, see Interactions.delete_obj.
+
+        Parameters
+        ----------
+        obj_name : str
+            The name of the interaction object to delete.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating the success of the operation, a dictionary with status information, and the delete summary.
+        """
+        return await super().delete_obj(obj_name, {'from': 'Interactions', 'to': ['Companies']})
+
+    async def download_interaction_content(self, interaction_path):
+        """
+        Download the file associated with an interaction object.
+
+        Parameters
+        ----------
+        interaction_path : str
+            The path of the file in the repository.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a status message, and the file content.
+        """
+        return await self.server_ctl.read_blob(interaction_path)
+
+    async def download_interaction_contents(self, interactions):
+        """
+        Download the files associated with several interaction objects concurrently.
+
+        Parameters
+        ----------
+        interactions : list
+            The paths of the files, or interaction objects whose url attribute holds the path.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping each path to its read_blob response.
+        """
+        return await self.server_ctl.read_blobs([
+            interaction['url'] if isinstance(interaction, dict) else interaction for interaction in interactions
+        ])
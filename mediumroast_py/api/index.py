@@ -0,0 +1,117 @@
+import copy
+import threading
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class ObjectIndex:
+    """
+    A class used to hold equality indexes over one snapshot of a container.
+
+    Every indexed attribute maps its values to the objects that carry them, so
+    an equality lookup is a dictionary access instead of a scan of the
+    container. The index belongs to the blob SHA of the snapshot it was built
+    from; attributes that were not declared up front are indexed the first time
+    they are looked up.
+
+    Attributes
+    ----------
+    objects : list
+        The objects of the container snapshot.
+    sha : str
+        The blob SHA of the container snapshot.
+    fields : tuple
+        The attributes that are indexed.
+    """
+    def __init__(self, objects, sha=None, fields=('name',)):
+        """
+        Constructs all the necessary attributes for the ObjectIndex object.
+
+        Parameters
+        ----------
+        objects : list
+            The objects of the container snapshot.
+        sha : str, optional
+            The blob SHA of the container snapshot.
+        fields : iterable, optional
+            The attributes to index, by default ('name',).
+        """
+        self.objects = objects
+        self.sha = sha
+        self.fields = ()
+        self._indexes = {}
+        self._lock = threading.Lock()
+        for field in fields:
+            self.add_field(field)
+
+    def add_field(self, field):
+        """
+        Index an additional attribute.
+
+        Parameters
+        ----------
+        field : str
+            The attribute to index.
+        """
+        with self._lock:
+            if field in self._indexes:
+                return
+            index = {}
+            for obj in self.objects:
+                value = obj.get(field)
+                if _is_hashable(value):
+                    index.setdefault(value, []).append(obj)
+            self._indexes[field] = index
+            self.fields = self.fields + (field,)
+
+    def lookup(self, field, value):
+        """
+        Find the objects whose attribute equals a value.
+
+        Parameters
+        ----------
+        field : str
+            The attribute to match.
+        value : object
+            The value to match.
+
+        Returns
+        -------
+        list
+            Copies of the matching objects, so callers cannot corrupt the index.
+        """
+        if not _is_hashable(value):
+            return [copy.deepcopy(obj) for obj in self.objects if obj.get(field) == value]
+        if field not in self._indexes:
+            self.add_field(field)
+        return copy.deepcopy(self._indexes[field].get(value, []))
+
+    def lookup_many(self, field, values):
+        """
+        Find the objects for many values of one attribute.
+
+        Parameters
+        ----------
+        field : str
+            The attribute to match.
+        values : iterable
+            The values to match.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping each value to the list of matching objects.
+        """
+        return {value: self.lookup(field, value) for value in values}
+
+
+def _is_hashable(value):
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
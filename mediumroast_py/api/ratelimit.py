@@ -0,0 +1,392 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class TokenBucket:
+    """
+    A class used to pace requests with a token bucket.
+
+    The bucket holds up to capacity tokens and refills at rate tokens per
+    second. Reservations may drive the bucket negative, the debt is the time a
+    caller has to wait before its request may be sent, so concurrent callers
+    queue up behind each other instead of all waking at once.
+
+    Attributes
+    ----------
+    capacity : float
+        The maximum number of tokens, i.e. the burst size.
+    rate : float
+        The number of tokens added per second.
+    tokens : float
+        The current number of tokens, negative while callers are queued.
+    """
+    def __init__(self, capacity, rate, now):
+        """
+        Constructs all the necessary attributes for the TokenBucket object.
+
+        Parameters
+        ----------
+        capacity : float
+            The maximum number of tokens.
+        rate : float
+            The number of tokens added per second.
+        now : float
+            The current time in seconds.
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self._updated = now
+
+    def reserve(self, cost, now):
+        """
+        Take tokens from the bucket.
+
+        Parameters
+        ----------
+        cost : float
+            The number of tokens to take.
+        now : float
+            The current time in seconds.
+
+        Returns
+        -------
+        float
+            The number of seconds to wait before the tokens are available.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self.tokens -= cost
+        return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimiter:
+    """
+    A class used to keep the requests of one token within GitHub's rate limits.
+
+    The primary limit is learned from the X-RateLimit-* headers of every
+    response: once less than a tenth of the budget is left the remaining
+    requests are spread evenly until the reset, and when it is exhausted
+    requests wait for the reset. The secondary limits are approximated with
+    two token buckets, 900 points per minute where writes cost five points and
+    80 content-creating requests per minute. A 403 or 429 that carries
+    Retry-After or reports a secondary limit blocks the token for the given
+    time, and the request is queued and retried instead of failing.
+
+    Attributes
+    ----------
+    key : str
+        A digest identifying the token, the token itself is never stored.
+    limit : int
+        The primary limit reported by GitHub, None until the first response.
+    remaining : int
+        The requests left in the current window, None until the first response.
+    reset_at : float
+        The epoch time the primary window resets.
+    blocked_until : float
+        The epoch time until which requests are held back after a throttled response.
+    """
+    def __init__(self, key, clock=time.time, points_per_minute=900, writes_per_minute=80, write_cost=5, low_water=0.1):
+        """
+        Constructs all the necessary attributes for the RateLimiter object.
+
+        Parameters
+        ----------
+        key : str
+            A digest identifying the token.
+        clock : callable, optional
+            The function returning the current epoch time, by default time.time.
+        points_per_minute : int, optional
+            The secondary limit on request points per minute, by default 900.
+        writes_per_minute : int, optional
+            The secondary limit on content-creating requests per minute, by default 80.
+        write_cost : int, optional
+            The points a write costs against points_per_minute, by default 5.
+        low_water : float, optional
+            The fraction of the primary limit below which requests are spread until the reset, by default 0.1.
+        """
+        self.key = key
+        self.clock = clock
+        self.write_cost = write_cost
+        self.low_water = low_water
+        now = clock()
+        self.points = TokenBucket(points_per_minute, points_per_minute / 60, now)
+        self.writes = TokenBucket(writes_per_minute, writes_per_minute / 60, now)
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.blocked_until = 0.0
+        self._next_paced = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.delayed = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self, method='GET'):
+        """
+        Reserve the budget for one request.
+
+        Parameters
+        ----------
+        method : str, optional
+            The HTTP method of the request, by default 'GET'.
+
+        Returns
+        -------
+        float
+            The number of seconds the caller has to wait before sending the request.
+        """
+        with self._lock:
+            now = self.clock()
+            is_write = method.upper() in WRITE_METHODS
+            start = max(now, self.blocked_until)
+            start = max(start, now + self.points.reserve(self.write_cost if is_write else 1, now))
+            if is_write:
+                start = max(start, now + self.writes.reserve(1, now))
+            if self.remaining is not None and self.reset_at is not None and self.reset_at > now:
+                if self.remaining <= 0:
+                    start = max(start, self.reset_at)
+                elif self.remaining < self.limit * self.low_water:
+                    # Spread what is left of the window evenly instead of running dry early
+                    slot = max(self._next_paced, now)
+                    self._next_paced = slot + max(0.0, self.reset_at - slot) / self.remaining
+                    start = max(start, slot)
+                self.remaining -= 1
+            delay = start - now
+            self.requests += 1
+            if delay > 0:
+                self.delayed += 1
+                self.total_wait += delay
+                self.max_wait = max(self.max_wait, delay)
+            return delay
+
+    def update(self, response):
+        """
+        Learn the limits from a response.
+
+        Parameters
+        ----------
+        response : requests.Response or httpx.Response
+            The response returned by GitHub.
+
+        Returns
+        -------
+        float
+            The number of seconds to wait before retrying when the response was throttled, otherwise None.
+        """
+        headers = response.headers
+        with self._lock:
+            now = self.clock()
+            if headers.get('X-RateLimit-Remaining') is not None:
+                try:
+                    self.limit = int(headers.get('X-RateLimit-Limit', self.limit or 0))
+                    self.remaining = int(headers['X-RateLimit-Remaining'])
+                    self.reset_at = float(headers.get('X-RateLimit-Reset', self.reset_at or 0))
+                except ValueError:
+                    pass
+            if response.status_code not in (403, 429):
+                return None
+            retry_after = headers.get('Retry-After')
+            if retry_after is not None:
+                wait = float(retry_after)
+            elif headers.get('X-RateLimit-Remaining') == '0' and self.reset_at:
+                wait = max(0.0, self.reset_at - now)
+            elif response.status_code == 429 or 'rate limit' in (response.text or '').lower():
+                # GitHub asks to wait at least one minute when a secondary limit is hit without Retry-After
+                wait = 60.0
+            else:
+                return None
+            self.blocked_until = max(self.blocked_until, now + wait)
+            self.throttled += 1
+            return wait
+
+    def get_stats(self):
+        """
+        Get the current budget and wait-time counters.
+
+        Returns
+        -------
+        dict
+            A dictionary with the primary budget, the secondary bucket levels and the wait counters.
+        """
+        with self._lock:
+            now = self.clock()
+            return {
+                'limit': self.limit,
+                'remaining': self.remaining,
+                'reset_in': max(0.0, self.reset_at - now) if self.reset_at else None,
+                'blocked_for': max(0.0, self.blocked_until - now),
+                'points_available': self.points.tokens,
+                'writes_available': self.writes.tokens,
+                'requests': self.requests,
+                'delayed': self.delayed,
+                'throttled': self.throttled,
+                'total_wait': self.total_wait,
+                'max_wait': self.max_wait
+            }
+
+
+class RateLimitScheduler:
+    """
+    A class used to share one RateLimiter per token between every client in the process.
+
+    Attributes
+    ----------
+    max_retries : int
+        The number of times a throttled request is queued and retried.
+    clock : callable
+        The function returning the current epoch time.
+    sleep : callable
+        The function used to wait in blocking code.
+    """
+    def __init__(self, max_retries=3, clock=time.time, sleep=time.sleep, **limits):
+        """
+        Constructs all the necessary attributes for the RateLimitScheduler object.
+
+        Parameters
+        ----------
+        max_retries : int, optional
+            The number of times a throttled request is queued and retried, by default 3.
+        clock : callable, optional
+            The function returning the current epoch time, by default time.time.
+        sleep : callable, optional
+            The function used to wait in blocking code, by default time.sleep.
+        **limits
+            Keyword arguments passed to every RateLimiter, e.g. points_per_minute.
+        """
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.limits = limits
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get_limiter(self, authorization, host=None):
+        """
+        Get the limiter for a token.
+
+        Parameters
+        ----------
+        authorization : str
+            The Authorization header the requests are sent with, None for anonymous requests.
+        host : str, optional
+            The host the requests are sent to, budgets of different GitHub servers are kept apart. Default is None.
+
+        Returns
+        -------
+        RateLimiter
+            The limiter shared by all requests sent with the token to the host.
+        """
+        identity = authorization or 'anonymous'
+        key = hashlib.sha256((f'{host} {identity}' if host else identity).encode()).hexdigest()[:16]
+        with self._lock:
+            if key not in self._limiters:
+                self._limiters[key] = RateLimiter(key, self.clock, **self.limits)
+            return self._limiters[key]
+
+    def send(self, method, authorization, send, host=None):
+        """
+        Send a request once the token's budget allows it, queueing and retrying it when it is throttled.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request.
+        authorization : str
+            The Authorization header of the request.
+        send : callable
+            The function sending the request and returning the response.
+        host : str, optional
+            The host the request is sent to, by default None.
+
+        Returns
+        -------
+        requests.Response
+            The last response.
+        """
+        limiter = self.get_limiter(authorization, host)
+        for attempt in range(self.max_retries + 1):
+            delay = limiter.reserve(method)
+            if delay > 0:
+                self.sleep(delay)
+            response = send()
+            if limiter.update(response) is None or attempt == self.max_retries:
+                return response
+            response.close()
+        return response
+
+    async def send_async(self, method, authorization, send, host=None):
+        """
+        Send a request from asyncio code, see send.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request.
+        authorization : str
+            The Authorization header of the request.
+        send : callable
+            A coroutine function sending the request and returning the response.
+        host : str, optional
+            The host the request is sent to, by default None.
+
+        Returns
+        -------
+        httpx.Response
+            The last response.
+        """
+        limiter = self.get_limiter(authorization, host)
+        for attempt in range(self.max_retries + 1):
+            delay = limiter.reserve(method)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            response = await send()
+            if limiter.update(response) is None or attempt == self.max_retries:
+                return response
+            await response.aclose()
+        return response
+
+    def get_stats(self):
+        """
+        Get the counters of every token seen.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping token digests to their RateLimiter statistics.
+        """
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {key: limiter.get_stats() for key, limiter in limiters.items()}
+
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_shared_scheduler():
+    """
+    Get the scheduler shared by every session that was not given its own.
+
+    Returns
+    -------
+    RateLimitScheduler
+        The shared scheduler, created with the default settings on first use.
+    """
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = RateLimitScheduler()
+        return _shared_scheduler
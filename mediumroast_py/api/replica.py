@@ -0,0 +1,248 @@
+import base64
+import os
+import subprocess
+import threading
+import time
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class LocalReplica:
+    """
+    A class used to serve reads of the discovery repository from a local bare clone.
+
+    The clone is created on first use and kept current with incremental
+    fetches, which only transfer the objects added since the last fetch. Files
+    are read straight from the object database through one long-running
+    `git cat-file --batch` process, so a read costs no request to GitHub.
+    Fetches happen on demand, when the replica was invalidated by a write of
+    this process, or at most every refresh_interval seconds.
+
+    Attributes
+    ----------
+    remote_url : str
+        The URL of the repository to replicate.
+    path : str
+        The directory of the bare clone.
+    refresh_interval : float
+        The number of seconds after which a read fetches first, None to fetch only on demand.
+    fetch_count : int
+        The number of fetches made.
+    read_count : int
+        The number of objects read from the replica.
+    """
+    def __init__(self, remote_url, path, token=None, refresh_interval=None, git='git', clock=time.monotonic):
+        """
+        Constructs all the necessary attributes for the LocalReplica object.
+
+        Parameters
+        ----------
+        remote_url : str
+            The URL of the repository to replicate, e.g. https://github.com/<org>/<org>_discovery.git.
+        path : str
+            The directory of the bare clone, created if it does not exist.
+        token : str, optional
+            The token used to fetch over HTTPS, by default None.
+        refresh_interval : float, optional
+            The number of seconds after which a read fetches first, by default None (fetch only on demand).
+        git : str, optional
+            The git executable, by default 'git'.
+        clock : callable, optional
+            The function returning a monotonic time in seconds, by default time.monotonic.
+        """
+        self.remote_url = remote_url
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.git = git
+        self.clock = clock
+        self.fetch_count = 0
+        self.read_count = 0
+        self._env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+        if token:
+            # Pass the token through the environment so it never shows up in the process list
+            credentials = base64.b64encode(f'x-access-token:{token}'.encode()).decode()
+            self._env.update({
+                'GIT_CONFIG_COUNT': '1',
+                'GIT_CONFIG_KEY_0': 'http.extraHeader',
+                'GIT_CONFIG_VALUE_0': f'Authorization: Basic {credentials}'
+            })
+        self._last_fetch = None
+        self._batch = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def for_org(cls, org, path, token=None, refresh_interval=None, server_url='https://github.com'):
+        """
+        Create a replica of the discovery repository of an organization.
+
+        Parameters
+        ----------
+        org : str
+            The name of the organization on GitHub.
+        path : str
+            The directory of the bare clone.
+        token : str, optional
+            The token used to fetch, by default None.
+        refresh_interval : float, optional
+            The number of seconds after which a read fetches first, by default None.
+        server_url : str, optional
+            The URL of the GitHub server, by default 'https://github.com'.
+
+        Returns
+        -------
+        LocalReplica
+            The replica, cloned on first use.
+        """
+        return cls(f"{server_url.rstrip('/')}/{org}/{org}_discovery.git", path, token, refresh_interval)
+
+    def _run(self, *args, cwd=True):
+        command = [self.git] + (['--git-dir', self.path] if cwd else []) + list(args)
+        result = subprocess.run(command, env=self._env, capture_output=True)
+        if result.returncode != 0:
+            raise IOError(f"git {args[0]} failed: {result.stderr.decode(errors='replace').strip()}")
+        return result.stdout
+
+    def fetch(self):
+        """
+        Bring the replica up to date, cloning the repository on first use.
+        """
+        with self._lock:
+            if not os.path.exists(os.path.join(self.path, 'HEAD')):
+                self._run('clone', '--bare', '--quiet', self.remote_url, self.path, cwd=False)
+            else:
+                self._run('fetch', '--quiet', '--prune', '--no-tags', self.remote_url, '+refs/heads/*:refs/heads/*')
+            self._close_batch()
+            self._last_fetch = self.clock()
+            self.fetch_count += 1
+
+    def invalidate(self):
+        """
+        Mark the replica stale so the next read fetches first, e.g. after this process wrote to the repository.
+        """
+        with self._lock:
+            self._last_fetch = None
+
+    def refresh_if_due(self):
+        """
+        Fetch if the replica was never fetched, was invalidated or is older than refresh_interval.
+        """
+        with self._lock:
+            if self._last_fetch is None or (
+                self.refresh_interval is not None and self.clock() - self._last_fetch >= self.refresh_interval
+            ):
+                self.fetch()
+
+    def _close_batch(self):
+        # A new pack is only picked up reliably by a new process, restart it after every fetch
+        if self._batch is not None:
+            self._batch.stdin.close()
+            self._batch.wait()
+            self._batch = None
+
+    def close(self):
+        with self._lock:
+            self._close_batch()
+
+    def _read_object(self, name):
+        # Returns the SHA and content of a blob, name is a SHA or <commit>:<path>
+        with self._lock:
+            if self._batch is None:
+                self._batch = subprocess.Popen(
+                    [self.git, '--git-dir', self.path, 'cat-file', '--batch'],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=self._env
+                )
+            self._batch.stdin.write(name.encode() + b'\n')
+            self._batch.stdin.flush()
+            header = self._batch.stdout.readline().decode().split()
+            if len(header) != 3:
+                raise FileNotFoundError(f'[{name}] is not in the replica')
+            sha, object_type, size = header
+            data = self._batch.stdout.read(int(size))
+            self._batch.stdout.read(1)
+            if object_type != 'blob':
+                raise IsADirectoryError(f'[{name}] is a {object_type}, not a file')
+            self.read_count += 1
+            return sha, data
+
+    def resolve(self, ref='main'):
+        """
+        Get the commit a branch name or SHA points to in the replica.
+
+        Parameters
+        ----------
+        ref : str, optional
+            A branch name or commit SHA, by default 'main'.
+
+        Returns
+        -------
+        str
+            The SHA of the commit.
+        """
+        self.refresh_if_due()
+        name = f'{ref or "main"}^{{commit}}'
+        try:
+            return self._run('rev-parse', '--verify', '--quiet', name).decode().strip()
+        except IOError:
+            # A commit made after the last fetch, e.g. the head another client just wrote
+            self.fetch()
+            return self._run('rev-parse', '--verify', '--quiet', name).decode().strip()
+
+    def read_file(self, file_path, ref='main'):
+        """
+        Read a file of the repository.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the file in the repository.
+        ref : str, optional
+            A branch name or commit SHA, by default 'main'.
+
+        Returns
+        -------
+        tuple
+            The content of the file as bytes and its blob SHA.
+        """
+        commit = self.resolve(ref)
+        sha, data = self._read_object(f'{commit}:{file_path}')
+        return data, sha
+
+    def read_blob(self, sha):
+        """
+        Read a blob by its SHA.
+
+        Parameters
+        ----------
+        sha : str
+            The SHA of the blob.
+
+        Returns
+        -------
+        bytes
+            The content of the blob.
+        """
+        try:
+            return self._read_object(sha)[1]
+        except FileNotFoundError:
+            # The blob may have been added after the last fetch
+            self.fetch()
+            return self._read_object(sha)[1]
+
+    def get_stats(self):
+        """
+        Get the counters of the replica.
+
+        Returns
+        -------
+        dict
+            A dictionary with the number of fetches, reads and the age of the replica in seconds.
+        """
+        return {
+            'fetches': self.fetch_count,
+            'reads': self.read_count,
+            'age': None if self._last_fetch is None else self.clock() - self._last_fetch
+        }
@@ -0,0 +1,239 @@
+import threading
+import urllib.parse
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from . ratelimit import get_shared_scheduler
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class PooledSession(requests.Session):
+    """
+    A class used to send every raw HTTP request of the SDK over a pool of kept-alive connections.
+
+    Each connection to api.github.com costs a TCP and a TLS handshake, which dominates the time of
+    small requests. The session keeps up to pool_size connections per host open and reuses them,
+    and can optionally send requests over HTTP/2 through httpx, which multiplexes all requests to a
+    host over a single connection. Every request passes the rate limit scheduler of its token first.
+
+    Attributes
+    ----------
+    pool_size : int
+        The maximum number of connections kept open per host.
+    keep_alive : bool
+        Whether connections are reused between requests.
+    http2 : bool
+        Whether requests are sent over HTTP/2 through httpx.
+    scheduler : RateLimitScheduler
+        The scheduler pacing the requests, None disables rate limiting.
+    """
+    def __init__(self, pool_size=10, keep_alive=True, http2=False, max_retries=0, timeout=None, scheduler=False):
+        """
+        Constructs all the necessary attributes for the PooledSession object.
+
+        Parameters
+        ----------
+        pool_size : int, optional
+            The maximum number of connections kept open per host, by default 10.
+        keep_alive : bool, optional
+            Whether connections are reused between requests, by default True.
+        http2 : bool, optional
+            Whether to send requests over HTTP/2 through httpx, which needs the `http2` extra of httpx, by default False.
+        max_retries : int, optional
+            The number of retries on connection errors, by default 0.
+        timeout : float, optional
+            The timeout in seconds applied to requests that do not set one, by default None (no timeout).
+        scheduler : RateLimitScheduler, optional
+            The scheduler pacing the requests, by default the shared scheduler, None disables rate limiting.
+        """
+        super().__init__()
+        self.scheduler = get_shared_scheduler() if scheduler is False else scheduler
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.http2 = http2
+        self.timeout = timeout
+        if http2:
+            adapter = HTTPXAdapter(pool_size, http2=True, keep_alive=keep_alive)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        if self.scheduler is None:
+            return super().request(method, url, **kwargs)
+        authorization = (kwargs.get('headers') or {}).get('Authorization') or self.headers.get('Authorization')
+        parsed = urllib.parse.urlsplit(url)
+        # GraphQL queries are sent as POST but are reads, the SDK sends no mutations
+        limited_method = 'GET' if parsed.path.endswith('/graphql') else method
+        return self.scheduler.send(
+            limited_method, authorization, lambda: super(PooledSession, self).request(method, url, **kwargs),
+            parsed.netloc
+        )
+
+
+class HTTPXAdapter(BaseAdapter):
+    """
+    A requests transport adapter that sends requests through an httpx client.
+
+    The adapter lets code written against requests use httpx's connection pool, and with it HTTP/2.
+    Responses are exposed as requests.Response objects and support stream=True.
+
+    Attributes
+    ----------
+    client : httpx.Client
+        The client used to send the requests.
+    """
+    def __init__(self, pool_size=10, http2=False, keep_alive=True):
+        """
+        Constructs all the necessary attributes for the HTTPXAdapter object.
+
+        Parameters
+        ----------
+        pool_size : int, optional
+            The maximum number of connections kept open, by default 10.
+        http2 : bool, optional
+            Whether to negotiate HTTP/2, by default False.
+        keep_alive : bool, optional
+            Whether connections are reused between requests, by default True.
+        """
+        if httpx is None:
+            raise ImportError('the httpx transport requires httpx, install mediumroast_py with the [async] extra')
+        super().__init__()
+        self.client = httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size if keep_alive else 0),
+            timeout=None
+        )
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        elif timeout is not None:
+            timeout = httpx.Timeout(timeout)
+        httpx_request = self.client.build_request(
+            request.method, request.url, headers=list(request.headers.items()), content=request.body,
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        )
+        try:
+            httpx_response = self.client.send(httpx_request, stream=True)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.headers = CaseInsensitiveDict(httpx_response.headers.items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = httpx_response.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.raw = _HTTPXBody(httpx_response)
+        if not stream:
+            # Read the body now so the connection goes back to the pool
+            response.content
+        return response
+
+    def close(self):
+        self.client.close()
+
+
+class _HTTPXBody:
+    # The subset of urllib3's response interface requests uses to read a body
+    def __init__(self, httpx_response):
+        self._response = httpx_response
+        self._chunks = None
+        self._buffer = b''
+
+    def stream(self, chunk_size=None, decode_content=True):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        finally:
+            self._response.close()
+
+    def read(self, amt=None, decode_content=True):
+        if self._chunks is None:
+            self._chunks = self.stream()
+        while amt is None or len(self._buffer) < amt:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if amt is None:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._response.close()
+
+    def release_conn(self):
+        self._response.close()
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session():
+    """
+    Get the session shared by every GitHubFunctions and GitHubAuth object that was not given its own.
+
+    Returns
+    -------
+    PooledSession
+        The shared session, created with the default settings on first use.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = PooledSession()
+        return _shared_session
+
+
+def configure_shared_session(pool_size=10, keep_alive=True, http2=False, max_retries=0, timeout=None):
+    """
+    Replace the shared session with one using the given settings.
+
+    Objects created afterwards use the new session, existing objects keep the session they were created with.
+
+    Parameters
+    ----------
+    pool_size : int, optional
+        The maximum number of connections kept open per host, by default 10.
+    keep_alive : bool, optional
+        Whether connections are reused between requests, by default True.
+    http2 : bool, optional
+        Whether to send requests over HTTP/2 through httpx, by default False.
+    max_retries : int, optional
+        The number of retries on connection errors, by default 0.
+    timeout : float, optional
+        The timeout in seconds applied to requests that do not set one, by default None.
+
+    Returns
+    -------
+    PooledSession
+        The new shared session.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        _shared_session = PooledSession(pool_size, keep_alive, http2, max_retries, timeout)
+        return _shared_session
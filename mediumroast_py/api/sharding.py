@@ -0,0 +1,157 @@
+import argparse
+import hashlib
+import json
+import os
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class ShardLayout:
+    """
+    A class used to describe the sharded storage layout of a container.
+
+    A sharded container keeps its objects in `<Container>/shards/<prefix>.json`
+    files, where the prefix is the start of the SHA-256 of the object's key
+    attribute, next to a small `<Container>/shards/manifest.json` that records
+    the layout and the blob SHA and object count of every shard. A write only
+    touches the shards whose content changed plus the manifest, and a read can
+    fetch the shards in parallel or only the shards that hold given keys.
+
+    Attributes
+    ----------
+    key : str
+        The attribute whose hash selects the shard of an object.
+    prefix_length : int
+        The number of hexadecimal digits of the hash used as shard prefix.
+    """
+    version = 1
+
+    def __init__(self, key='name', prefix_length=2):
+        """
+        Constructs all the necessary attributes for the ShardLayout object.
+
+        Parameters
+        ----------
+        key : str, optional
+            The attribute whose hash selects the shard of an object, by default 'name'.
+        prefix_length : int, optional
+            The number of hexadecimal digits used as shard prefix, by default 2 (256 shards).
+        """
+        self.key = key
+        self.prefix_length = prefix_length
+
+    @classmethod
+    def from_manifest(cls, manifest):
+        """
+        Create the layout recorded in a manifest.
+
+        Parameters
+        ----------
+        manifest : dict
+            The decoded manifest of a sharded container.
+
+        Returns
+        -------
+        ShardLayout
+            The layout of the container.
+        """
+        return cls(manifest['key'], manifest['prefix_length'])
+
+    @staticmethod
+    def manifest_path(container_name):
+        return f"{container_name}/shards/manifest.json"
+
+    @staticmethod
+    def shard_path(container_name, prefix):
+        return f"{container_name}/shards/{prefix}.json"
+
+    def prefix_of(self, value):
+        """
+        Get the shard prefix for a key value.
+
+        Parameters
+        ----------
+        value : str
+            The value of the key attribute.
+
+        Returns
+        -------
+        str
+            The shard prefix.
+        """
+        return hashlib.sha256(str(value).encode()).hexdigest()[:self.prefix_length]
+
+    def split(self, objects):
+        """
+        Distribute objects over their shards, keeping their relative order.
+
+        Parameters
+        ----------
+        objects : list
+            The objects of the container.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping shard prefixes to the list of their objects.
+        """
+        shards = {}
+        for obj in objects:
+            shards.setdefault(self.prefix_of(obj.get(self.key)), []).append(obj)
+        return shards
+
+    def build(self, objects, blob_sha):
+        """
+        Serialize objects into shard files and the manifest describing them.
+
+        Parameters
+        ----------
+        objects : list
+            The objects of the container.
+        blob_sha : callable
+            The function computing the git blob SHA of a serialized shard.
+
+        Returns
+        -------
+        tuple
+            A dictionary mapping shard prefixes to their serialized content, and the manifest.
+        """
+        contents = {}
+        manifest = {'version': self.version, 'key': self.key, 'prefix_length': self.prefix_length, 'shards': {}}
+        for prefix, shard_objects in sorted(self.split(objects).items()):
+            contents[prefix] = json.dumps(shard_objects)
+            manifest['shards'][prefix] = {'sha': blob_sha(contents[prefix]), 'count': len(shard_objects)}
+        return contents, manifest
+
+
+def main():
+    """
+    Convert single-file containers of a discovery repository to the sharded layout.
+    """
+    from . github import GitHubFunctions
+
+    parser = argparse.ArgumentParser(description='Convert single-file Mediumroast containers to the sharded layout.')
+    parser.add_argument('--org', required=True, help='the GitHub organization that owns the discovery repository')
+    parser.add_argument('--token-file', help='a file holding the token, by default the GITHUB_TOKEN environment variable is used')
+    parser.add_argument('--key', default='name', help='the attribute whose hash selects the shard of an object')
+    parser.add_argument('--prefix-length', type=int, default=2, help='the number of hash digits used as shard prefix')
+    parser.add_argument('containers', nargs='+', help='the containers to convert, e.g. Interactions Companies')
+    args = parser.parse_args()
+
+    if args.token_file:
+        with open(args.token_file, 'r') as file:
+            token = file.read().strip()
+    else:
+        token = os.environ['GITHUB_TOKEN']
+    functions = GitHubFunctions(token, args.org, 'mediumroast_shard_migration')
+    for container_name in args.containers:
+        migrated = functions.migrate_to_shards(container_name, ShardLayout(args.key, args.prefix_length))
+        print(f"{container_name}: {migrated[1]['status_msg']}")
+
+
+if __name__ == '__main__':
+    main()
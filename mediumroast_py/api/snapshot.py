@@ -0,0 +1,185 @@
+import copy
+from . index import ObjectIndex
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class Snapshot:
+    """
+    A class used to hold several containers as of one commit.
+
+    All containers of a snapshot were read at the same commit SHA, so the
+    links between studies, companies and interactions are never torn by a
+    write that landed between two reads. The content at a commit never
+    changes, a snapshot is read-only and every call returns copies, so one
+    snapshot can be shared and cached for as long as it is useful.
+
+    Attributes
+    ----------
+    commit_sha : str
+        The SHA of the commit the containers were read at.
+    container_names : tuple
+        The names of the containers in the snapshot.
+    """
+    def __init__(self, commit_sha, containers):
+        """
+        Constructs all the necessary attributes for the Snapshot object.
+
+        Parameters
+        ----------
+        commit_sha : str
+            The SHA of the commit the containers were read at.
+        containers : dict
+            A dictionary mapping container names to the read_objects data, a dictionary with mr_json and sha.
+        """
+        self._commit_sha = commit_sha
+        self._indexes = {
+            container_name: ObjectIndex(container['mr_json'], container['sha'])
+            for container_name, container in containers.items()
+        }
+
+    @property
+    def commit_sha(self):
+        return self._commit_sha
+
+    @property
+    def container_names(self):
+        return tuple(self._indexes)
+
+    def _get_index(self, container_name):
+        index = self._indexes.get(container_name)
+        if index is None:
+            return [False, {'status_code': 404, 'status_msg': f'container [{container_name}] is not in the snapshot of [{self._commit_sha}]'}, None]
+        return [True, {'status_code': 200, 'status_msg': f'found container [{container_name}]'}, index]
+
+    def get_sha(self, container_name):
+        """
+        Get the blob SHA guarding a container in the snapshot.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+
+        Returns
+        -------
+        str
+            The blob SHA, the manifest SHA for a sharded container, or None if the container is not in the snapshot.
+        """
+        index = self._indexes.get(container_name)
+        return index.sha if index is not None else None
+
+    def get_all(self, container_name):
+        """
+        Get all objects of a container.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary with copies of the objects and the container SHA.
+        """
+        index = self._get_index(container_name)
+        if not index[0]:
+            return index
+        return [
+            True,
+            {'status_code': 200, 'status_msg': f'read objects from container [{container_name}] at [{self._commit_sha}]'},
+            {'mr_json': copy.deepcopy(index[2].objects), 'sha': index[2].sha}
+        ]
+
+    def find_by_name(self, container_name, name):
+        """
+        Find an object by its name.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+        name : str
+            The name of the object to find.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the matching objects.
+        """
+        return self.find_by_x(container_name, 'name', name)
+
+    def find_by_x(self, container_name, attribute, value):
+        """
+        Find objects by a specified attribute.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+        attribute : str
+            The attribute to search by.
+        value : str
+            The value of the attribute to search for.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and the matching objects.
+        """
+        index = self._get_index(container_name)
+        if not index[0]:
+            return index
+        if len(index[2].objects) == 0:
+            return [False, f"No {container_name} objects found", None]
+        return [True, {'status_code': 200, 'status_msg': f'found objects matching {attribute} = {value}'}, index[2].lookup(attribute, value)]
+
+    def find_many(self, container_name, attribute, values):
+        """
+        Find the objects for many values of one attribute.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+        attribute : str
+            The attribute to search by.
+        values : iterable
+            The values of the attribute to search for.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and a dictionary mapping each value to its matching objects.
+        """
+        index = self._get_index(container_name)
+        if not index[0]:
+            return index
+        return [True, {'status_code': 200, 'status_msg': f'found objects for [{attribute}] values'}, index[2].lookup_many(attribute, values)]
+
+    def query(self, container_name, predicate):
+        """
+        Find the objects for which a predicate holds.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+        predicate : callable
+            A function called with each object, returning True for the objects to keep. It must not modify the object.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information, and copies of the matching objects.
+        """
+        index = self._get_index(container_name)
+        if not index[0]:
+            return index
+        matches = [copy.deepcopy(obj) for obj in index[2].objects if predicate(obj)]
+        return [True, {'status_code': 200, 'status_msg': f'found [{len(matches)}] objects in [{container_name}]'}, matches]
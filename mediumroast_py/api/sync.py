@@ -0,0 +1,133 @@
+import json
+from . sharding import ShardLayout
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class ContainerSync:
+    """
+    A class used to poll containers for object-level changes.
+
+    The sync remembers the commit of the branch it saw last and the blob SHA
+    guarding every container at that commit. A poll first asks for the head
+    of the branch, a 304 when nothing was committed, and only when the head
+    moved lists the files of the new commit and re-reads the containers whose
+    file (or shard manifest) changed. The objects read are compared by key
+    with the previous ones to report what was added, changed and removed.
+
+    Attributes
+    ----------
+    server_ctl : GitHubFunctions
+        The object used to talk to GitHub.
+    container_names : list
+        The names of the containers that are followed.
+    commit_sha : str
+        The commit seen by the last poll, None before the first poll.
+    container_shas : dict
+        A dictionary mapping container names to their blob SHA at commit_sha.
+    """
+    def __init__(self, server_ctl, container_names=('Studies', 'Companies', 'Interactions'), key='name', branch_name=None):
+        """
+        Constructs all the necessary attributes for the ContainerSync object.
+
+        Parameters
+        ----------
+        server_ctl : GitHubFunctions
+            The object used to talk to GitHub.
+        container_names : iterable, optional
+            The names of the containers to follow, by default Studies, Companies and Interactions.
+        key : str, optional
+            The attribute identifying an object across polls, by default 'name'.
+        branch_name : str, optional
+            The branch to follow, by default the main branch.
+        """
+        self.server_ctl = server_ctl
+        self.container_names = list(container_names)
+        self.key = key
+        self.branch_name = branch_name if branch_name else server_ctl.main_branch_name
+        self.commit_sha = None
+        self.container_shas = {}
+        self._objects = {}
+
+    def get_objects(self, container_name):
+        """
+        Get the objects of a container as of the last poll.
+
+        Parameters
+        ----------
+        container_name : str
+            The name of the container.
+
+        Returns
+        -------
+        list
+            The objects of the container, empty before the container was first polled.
+        """
+        return [json.loads(obj) for obj in self._objects.get(container_name, {}).values()]
+
+    def _guard_sha(self, container_name, files):
+        file_name = self.server_ctl.object_files[container_name]
+        if file_name and f"{container_name}/{file_name}" in files:
+            return files[f"{container_name}/{file_name}"]
+        return files.get(ShardLayout.manifest_path(container_name))
+
+    def _diff(self, container_name, objects):
+        previous = self._objects.get(container_name, {})
+        # Serialized objects compare by value and cannot be mutated by callers
+        current = {obj.get(self.key): json.dumps(obj, sort_keys=True) for obj in objects}
+        changes = {
+            'added': [json.loads(current[key]) for key in current if key not in previous],
+            'changed': [json.loads(current[key]) for key in current if key in previous and previous[key] != current[key]],
+            'removed': [json.loads(previous[key]) for key in previous if key not in current]
+        }
+        self._objects[container_name] = current
+        return changes
+
+    def poll(self):
+        """
+        Get the changes committed since the last poll.
+
+        The first poll reports every object as added.
+
+        Returns
+        -------
+        list
+            A list containing a boolean indicating success or failure, a dictionary with status information (304 when
+            nothing changed), and a dictionary with the previous and current commit SHA and, for every container that
+            changed, the added, changed and removed objects (or the error message in case of failure).
+        """
+        head_sha = self.server_ctl.get_head_sha(self.branch_name)
+        if not head_sha[0]:
+            return head_sha
+        head_sha = head_sha[2]
+        if head_sha == self.commit_sha:
+            return [True, {'status_code': 304, 'status_msg': f'no changes since [{head_sha}]'}, {
+                'previous_sha': self.commit_sha, 'commit_sha': head_sha, 'changes': {}
+            }]
+        files = self.server_ctl.get_tree_files(head_sha, self.container_names)
+        if not files[0]:
+            return files
+        changes = {}
+        for container_name in self.container_names:
+            guard_sha = self._guard_sha(container_name, files[2])
+            if guard_sha is not None and guard_sha == self.container_shas.get(container_name):
+                continue
+            if guard_sha is None:
+                objects, guard_sha = [], None
+            else:
+                read = self.server_ctl.read_objects(container_name, head_sha)
+                if not read[0]:
+                    return read
+                objects, guard_sha = read[2]['mr_json'], read[2]['sha']
+            container_changes = self._diff(container_name, objects)
+            self.container_shas[container_name] = guard_sha
+            if any(container_changes.values()):
+                changes[container_name] = container_changes
+        previous_sha, self.commit_sha = self.commit_sha, head_sha
+        return [True, {'status_code': 200, 'status_msg': f'synced [{len(changes)}] changed containers at [{head_sha}]'}, {
+            'previous_sha': previous_sha, 'commit_sha': head_sha, 'changes': changes
+        }]
@@ -0,0 +1,147 @@
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+__license__ = "Apache 2.0"
+__copyright__ = "Copyright (C) 2024 Mediumroast, Inc."
+__author__ = "Michael Hay"
+__email__ = "hello@mediumroast.io"
+__status__ = "Production"
+
+
+class TokenStore:
+    """
+    A class used to share installation tokens between the processes on one host.
+
+    Tokens are kept in one JSON file per GitHub App installation, readable only
+    by the current user. Reading and minting happen under an exclusive lock on
+    a companion lock file, so when a fleet of workers starts at once the first
+    one mints the token and the others wait for it and reuse it until it is
+    close to its expiry.
+
+    Attributes
+    ----------
+    directory : pathlib.Path
+        The directory holding the token and lock files.
+    hits : int
+        The number of tokens served from the store.
+    mints : int
+        The number of tokens minted through the store.
+    """
+    def __init__(self, directory=None):
+        """
+        Constructs all the necessary attributes for the TokenStore object.
+
+        Parameters
+        ----------
+        directory : str, optional
+            The directory holding the token files, by default ~/.cache/mediumroast/tokens.
+        """
+        self.directory = Path(directory) if directory else Path.home() / '.cache' / 'mediumroast' / 'tokens'
+        self.hits = 0
+        self.mints = 0
+
+    def _path(self, app_id, installation_id, suffix):
+        return self.directory / f"{app_id}-{installation_id}.{suffix}"
+
+    @contextmanager
+    def _locked(self, app_id, installation_id):
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with open(self._path(app_id, installation_id, 'lock'), 'a+') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def read(self, app_id, installation_id):
+        """
+        Read the stored token of an installation without locking.
+
+        Parameters
+        ----------
+        app_id : str
+            The identifier of the GitHub App.
+        installation_id : str
+            The identifier of the installation.
+
+        Returns
+        -------
+        dict
+            The stored token_info, or None when no token is stored.
+        """
+        try:
+            with open(self._path(app_id, installation_id, 'json'), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, app_id, installation_id, token_info):
+        path = self._path(app_id, installation_id, 'json')
+        partial = path.with_suffix('.partial')
+        descriptor = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(token_info, file)
+        os.replace(partial, path)
+
+    def get_or_mint(self, app_id, installation_id, mint, is_fresh):
+        """
+        Get the stored token of an installation, minting and storing a new one when it is missing or stale.
+
+        Parameters
+        ----------
+        app_id : str
+            The identifier of the GitHub App.
+        installation_id : str
+            The identifier of the installation.
+        mint : callable
+            The function minting a new token_info.
+        is_fresh : callable
+            The function telling whether a stored token_info can still be used.
+
+        Returns
+        -------
+        dict
+            A dictionary containing the access token, its expiration time, and the auth type.
+        """
+        with self._locked(app_id, installation_id):
+            token_info = self.read(app_id, installation_id)
+            if token_info is not None and is_fresh(token_info):
+                self.hits += 1
+                return token_info
+            token_info = mint()
+            self._write(app_id, installation_id, token_info)
+            self.mints += 1
+            return token_info
+
+    def clear(self, app_id, installation_id):
+        """
+        Remove the stored token of an installation, e.g. after GitHub rejected it.
+
+        Parameters
+        ----------
+        app_id : str
+            The identifier of the GitHub App.
+        installation_id : str
+            The identifier of the installation.
+        """
+        with self._locked(app_id, installation_id):
+            try:
+                os.remove(self._path(app_id, installation_id, 'json'))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import unittest
+from mediumroast_py.api.github import RetryPolicy
+from mediumroast_py.api.github_async import AsyncGitHubFunctions
+from mediumroast_py.api.github_server_async import AsyncCompanies, AsyncInteractions
+from mediumroast_py.api.sharding import ShardLayout
+from tests.github_stand_in import GitHubStandIn
+
+process_name = 'mediumroast_py_unit_tests'
+
+
+class TestAsyncGitHubFunctions(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.stand_in = GitHubStandIn(files={
+            'Companies/Companies.json': json.dumps([{'name': 'Atlassian', 'status': 0, 'linked_interactions': {}}]),
+            'Interactions/Interactions.json': json.dumps([{'name': f'Interaction {n}', 'file_hash': f'hash-{n}', 'status': 0} for n in range(20)]),
+            'Interactions/a.pdf': b'%PDF a',
+            'Interactions/b.pdf': b'%PDF b'
+        })
+        self.stand_in.__enter__()
+        self.addCleanup(self.stand_in.__exit__, None, None, None)
+
+    async def test_reads_are_cached_and_concurrent(self):
+        async with AsyncGitHubFunctions('token', self.stand_in.org, process_name, api_url=self.stand_in.url) as functions:
+            read = await functions.read_many(['Companies', 'Interactions'])
+            self.assertEqual(read['Companies'][2]['mr_json'][0]['name'], 'Atlassian')
+            self.assertEqual(len(read['Interactions'][2]['mr_json']), 20)
+            again = await functions.read_objects('Companies')
+            self.assertEqual(again[2], read['Companies'][2])
+            self.assertEqual(self.stand_in.requests[-1][2], 304)
+
+            blobs = await functions.read_blobs(['Interactions/a.pdf', 'Interactions/b.pdf'])
+            self.assertEqual(blobs['Interactions/b.pdf'][2], b'%PDF b')
+            self.assertEqual(self.stand_in.count('GET', '/raw/'), 0)
+
+    async def test_caught_update_is_one_data_commit(self):
+        async with AsyncGitHubFunctions('token', self.stand_in.org, process_name, api_url=self.stand_in.url) as functions:
+            updated = await functions.update_object({
+                'Companies': {'updates': {'Atlassian': {'status': 1}}, 'system': False, 'white_list': ['status']},
+                'Interactions': {'updates': {'Interaction 3': {'status': 1}}, 'system': False, 'white_list': ['status']}
+            })
+            self.assertTrue(updated[0], updated[1])
+            self.assertEqual(updated[2]['total_changed'], 2)
+            # One lock commit for both containers plus one commit holding the data and the lock removal
+            self.assertEqual(self.stand_in.count('PATCH', '/git/refs/'), 2)
+            files = self.stand_in.files_at('main')
+            self.assertFalse([path for path in files if path.endswith('.lock')])
+            self.assertEqual(json.loads(self.stand_in.read_file('Companies/Companies.json'))[0]['status'], 1)
+
+            rejected = await functions.update_object({'Companies': {'updates': {'Atlassian': {'name': 'x'}}, 'system': False, 'white_list': ['status']}})
+            self.assertEqual(rejected[1]['status_code'], 403)
+            self.assertFalse((await functions.check_for_lock('Companies'))[0])
+
+    async def test_locks_are_taken_and_removed_in_one_commit(self):
+        async with AsyncGitHubFunctions('token', self.stand_in.org, process_name, api_url=self.stand_in.url) as functions:
+            lock_file = f'Interactions/{process_name}.lock'
+            self.stand_in.commit_files({lock_file: ''})
+            caught = await functions.catch_container({'containers': {'Companies': {}, 'Interactions': {}}, 'branch': {}})
+            self.assertFalse(caught[0])
+            self.assertIn('[Interactions] is locked', caught[1]['status_msg'])
+            self.assertNotIn(f'Companies/{process_name}.lock', self.stand_in.files_at())
+
+            self.stand_in.commit_files({lock_file: None})
+            # Truncated listings fall back to the container directories
+            self.stand_in.tree_limit = 2
+            commits_before = len(self.stand_in.commits)
+            caught = await functions.catch_container({'containers': {'Companies': {}, 'Interactions': {}}, 'branch': {}})
+            self.assertTrue(caught[0], caught[1])
+            self.assertEqual(len(self.stand_in.commits) - commits_before, 1)
+            self.assertEqual(caught[2]['branch']['sha'], self.stand_in.refs['main'])
+            self.assertTrue((await functions.check_for_lock('Interactions'))[0])
+            self.assertEqual(len(caught[2]['containers']['Interactions']['objects']), 20)
+
+            abandoned = await functions.abandon_container(caught[2])
+            self.assertTrue(abandoned[0], abandoned[1])
+            self.assertEqual(len(self.stand_in.commits) - commits_before, 2)
+            self.assertFalse(any(path.endswith('.lock') for path in self.stand_in.files_at()))
+            self.assertEqual(self.stand_in.count('PUT', '.lock') + self.stand_in.count('DELETE', '.lock'), 0)
+
+    async def test_concurrent_optimistic_writers(self):
+        async with AsyncGitHubFunctions('token', self.stand_in.org, process_name, api_url=self.stand_in.url) as functions:
+            def add(name):
+                return lambda containers: containers['Companies'].append({'name': name})
+
+            results = await asyncio.gather(*(
+                functions.mutate_containers(['Companies'], add(f'Company {n}'), retry_policy=RetryPolicy(max_attempts=10, backoff=0.01))
+                for n in range(4)
+            ))
+            self.assertTrue(all(result[0] for result in results), results)
+            names = {obj['name'] for obj in json.loads(self.stand_in.read_file('Companies/Companies.json'))}
+            self.assertEqual(names, {'Atlassian', 'Company 0', 'Company 1', 'Company 2', 'Company 3'})
+
+    async def test_sharded_containers(self):
+        async with AsyncGitHubFunctions('token', self.stand_in.org, process_name, api_url=self.stand_in.url, sharded_containers={'Interactions': ShardLayout(prefix_length=1)}) as functions:
+            head_sha = (await functions.get_head_sha())[2]
+            objects = json.loads(self.stand_in.read_file('Interactions/Interactions.json'))
+            committed = await functions.commit_containers({'Interactions': objects}, head_sha, remove_paths=['Interactions/Interactions.json'])
+            self.assertTrue(committed[0], committed[1])
+        async with AsyncGitHubFunctions('token', self.stand_in.org, process_name, api_url=self.stand_in.url) as functions:
+            read = await functions.read_objects('Interactions', keys=['Interaction 5'])
+            self.assertEqual(read[2]['mr_json'], [{'name': 'Interaction 5', 'file_hash': 'hash-5', 'status': 0}])
+
+    async def test_large_containers_are_streamed(self):
+        interactions = [{'name': f'Interaction {n}', 'abstract': 'x' * 100} for n in range(50)]
+        with GitHubStandIn(files={'Interactions/Interactions.json': json.dumps(interactions)}, inline_limit=1024) as stand_in:
+            async with AsyncGitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url) as functions:
+                functions.stream_chunk_size = 512
+                functions.inline_content_limit = 1024
+                read = await functions.read_objects('Interactions')
+                self.assertTrue(read[0], read[1])
+                self.assertEqual(read[2]['mr_json'], interactions)
+                self.assertEqual(stand_in.count('GET', '/git/blobs/'), 1)
+                # Only the contents metadata is cached, the SHA of a large container is revalidated without streaming it
+                self.assertEqual(functions.validator_cache.get_stats()['entries'], 1)
+                sha = await functions.get_container_sha('Interactions')
+                self.assertTrue(sha[0], sha[1])
+                self.assertEqual(functions.validator_cache.hits, 1)
+                self.assertEqual(stand_in.count('GET', '/git/blobs/'), 1)
+
+
+class TestAsyncObjects(unittest.IsolatedAsyncioTestCase):
+    async def test_objects_share_one_client(self):
+        interactions = [{'name': f'Interaction {n}', 'file_hash': f'hash-{n}', 'status': 0} for n in range(10)]
+        with GitHubStandIn(files={
+            'Companies/Companies.json': json.dumps([{'name': 'Atlassian', 'status': 0}]),
+            'Interactions/Interactions.json': json.dumps(interactions)
+        }) as stand_in:
+            async with AsyncGitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url) as functions:
+                companies = AsyncCompanies('token', stand_in.org, process_name, server_ctl=functions)
+                interactions_ctl = AsyncInteractions('token', stand_in.org, process_name, server_ctl=functions)
+                found = await asyncio.gather(companies.find_by_name('Atlassian'), interactions_ctl.find_by_hash('hash-4'))
+                self.assertEqual(found[0][2][0]['name'], 'Atlassian')
+                self.assertEqual(found[1][2][0]['name'], 'Interaction 4')
+                # Within index_ttl the lookups reuse the index, once it expires one conditional request revalidates it
+                for n in range(10):
+                    self.assertEqual((await interactions_ctl.find_by_hash(f'hash-{n}'))[2][0]['name'], f'Interaction {n}')
+                self.assertEqual(stand_in.count('GET', '/contents/Interactions'), 1)
+                self.assertTrue((await interactions_ctl.get_index(max_age=0))[0])
+                self.assertEqual([r[2] for r in stand_in.requests if '/contents/Interactions' in r[1]], [200, 304])
+
+                updated = await companies.update_obj({'name': 'Atlassian', 'key': 'status', 'value': 2}, optimistic=True)
+                self.assertTrue(updated[0], updated[1])
+                self.assertEqual((await companies.find_by_name('Atlassian', refresh=False))[2][0]['status'], 2)
+                created = await interactions_ctl.create_obj([{'name': 'New', 'file_hash': 'hash-new', 'status': 0}])
+                self.assertTrue(created[0], created[1])
+                self.assertEqual((await interactions_ctl.find_by_hash('hash-new', refresh=False))[2][0]['name'], 'New')
+
+    async def test_shared_client_outlives_objects(self):
+        with GitHubStandIn(files={'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}])}) as stand_in:
+            async with AsyncGitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url) as functions:
+                # Leaving an object that was handed the shared functions object does not close it
+                async with AsyncCompanies('token', stand_in.org, process_name, server_ctl=functions) as companies_ctl:
+                    self.assertEqual((await companies_ctl.find_by_name('Atlassian'))[2][0]['name'], 'Atlassian')
+                self.assertFalse(functions.client.is_closed)
+                self.assertTrue((await functions.read_objects('Companies'))[0])
+            self.assertTrue(functions.client.is_closed)
+
+    async def test_deletes_cascade(self):
+        interactions = [
+            {'name': 'Interaction 1', 'linked_companies': {'Atlassian': 'hash-a'}},
+            {'name': 'Shared', 'linked_companies': {'Atlassian': 'hash-a', 'Microsoft': 'hash-m'}}
+        ]
+        companies = [
+            {'name': 'Atlassian', 'linked_interactions': {'Interaction 1': 'hash', 'Shared': 'hash'}},
+            {'name': 'Microsoft', 'linked_interactions': {'Shared': 'hash'}}
+        ]
+        with GitHubStandIn(files={
+            'Companies/Companies.json': json.dumps(companies),
+            'Interactions/Interactions.json': json.dumps(interactions)
+        }) as stand_in:
+            async with AsyncGitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url) as functions:
+                companies_ctl = AsyncCompanies('token', stand_in.org, process_name, server_ctl=functions)
+                deleted = await companies_ctl.delete_obj('Atlassian')
+                self.assertTrue(deleted[0], deleted[1])
+                self.assertEqual(deleted[2]['deleted'], {'Companies': ['Atlassian'], 'Interactions': ['Interaction 1', 'Shared']})
+                self.assertEqual(json.loads(stand_in.read_file('Interactions/Interactions.json')), [])
+                self.assertEqual(json.loads(stand_in.read_file('Companies/Companies.json')), [{'name': 'Microsoft', 'linked_interactions': {}}])
+
+                interactions_ctl = AsyncInteractions('token', stand_in.org, process_name, server_ctl=functions)
+                missing = await interactions_ctl.delete_objs(['Nobody'], optimistic=True)
+                self.assertEqual(missing[1]['status_code'], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
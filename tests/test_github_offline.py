@@ -0,0 +1,1072 @@
+import gc
+import unittest
+import json
+import os
+import tempfile
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from mediumroast_py.api.github import GitHubFunctions, RepositoryContext, RetryPolicy, iter_json_array
+from mediumroast_py.api.github_server import Interactions
+from mediumroast_py.api.client import MediumroastClient
+from mediumroast_py.api.billing import BillingHistory
+from mediumroast_py.api.cache import ObjectCache
+from mediumroast_py.api.sharding import ShardLayout
+from mediumroast_py.api.sync import ContainerSync
+from mediumroast_py.api.ratelimit import RateLimiter, RateLimitScheduler
+from mediumroast_py.api.session import HTTPXAdapter, PooledSession, get_shared_session
+from mediumroast_py.api.authorize import GitHubAuth
+from mediumroast_py.api.tokenstore import TokenStore
+from tests.github_stand_in import GitHubStandIn
+
+process_name = 'mediumroast_py_unit_tests'
+
+
+class TestRepositoryContext(unittest.TestCase):
+    def test_repo_resolved_once(self):
+        github_instance = MagicMock()
+        context = RepositoryContext(github_instance, 'mediumroast/mediumroast_discovery')
+        for _ in range(10):
+            context.get_repo()
+        github_instance.get_repo.assert_called_once_with('mediumroast/mediumroast_discovery')
+        stats = context.get_stats()
+        self.assertEqual(stats['resolve_count'], 1)
+        self.assertEqual(stats['access_count'], 10)
+        self.assertEqual(stats['saved_round_trips'], 9)
+
+    @patch('mediumroast_py.api.github.time.monotonic')
+    def test_repo_revalidated_after_ttl(self, mock_monotonic):
+        mock_monotonic.return_value = 100.0
+        github_instance = MagicMock()
+        context = RepositoryContext(github_instance, 'mediumroast/mediumroast_discovery', ttl=30)
+        repo = context.get_repo()
+        mock_monotonic.return_value = 120.0
+        context.get_repo()
+        repo.update.assert_not_called()
+        mock_monotonic.return_value = 131.0
+        context.get_repo()
+        repo.update.assert_called_once()
+        self.assertEqual(github_instance.get_repo.call_count, 1)
+        self.assertEqual(context.get_stats()['revalidate_count'], 1)
+
+    def test_functions_share_one_handle(self):
+        functions = GitHubFunctions('token', 'mediumroast', process_name)
+        functions.github_instance = MagicMock()
+        functions.repo_context = RepositoryContext(functions.github_instance, 'mediumroast/mediumroast_discovery')
+        functions.unlock_container('Companies', None, files={f'Companies/{functions.lock_file_name}': 'lock-sha'})
+        functions.get_sha('Companies', 'Companies.json', 'main')
+        functions.lock_container('Companies')
+        self.assertEqual(functions.github_instance.get_repo.call_count, 1)
+        self.assertEqual(functions.get_repo_stats()[2]['access_count'], 3)
+
+
+class TestConditionalReads(unittest.TestCase):
+    def test_read_objects_revalidates_with_etag(self):
+        companies = [{'name': 'Atlassian'}, {'name': 'Microsoft'}]
+        with GitHubStandIn(files={'Companies/Companies.json': json.dumps(companies)}) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            first = functions.read_objects('Companies')
+            second = functions.read_objects('Companies')
+            self.assertTrue(first[0] and second[0])
+            self.assertEqual(first[2], second[2])
+            self.assertEqual(stand_in.count('GET', '/contents/'), 2)
+            self.assertEqual([r[2] for r in stand_in.requests], [200, 304])
+            # Callers may mutate what they read without corrupting the cache
+            second[2]['mr_json'].append({'name': 'Mutated'})
+            self.assertEqual(functions.read_objects('Companies')[2]['mr_json'], companies)
+            self.assertEqual(functions.validator_cache.get_stats()['hits'], 2)
+
+            stand_in.commit_files({'Companies/Companies.json': json.dumps(companies[:1])})
+            changed = functions.read_objects('Companies')
+            self.assertEqual(changed[2]['mr_json'], companies[:1])
+            self.assertNotEqual(changed[2]['sha'], first[2]['sha'])
+
+    def test_read_blob_skips_download_when_unchanged(self):
+        path = 'Interactions/report.pdf'
+        with GitHubStandIn(files={path: b'%PDF-1.7 report'}) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            self.assertEqual(functions.read_blob(path)[2], b'%PDF-1.7 report')
+            self.assertEqual(functions.read_blob(path)[2], b'%PDF-1.7 report')
+            self.assertEqual([r[2] for r in stand_in.requests], [200, 304])
+            self.assertEqual(functions.read_blob('Interactions/missing.pdf')[1]['status_code'], 404)
+
+
+class TestPooledSessions(unittest.TestCase):
+    files = {
+        'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}]),
+        'Interactions/Interactions.json': json.dumps([{'name': f'Interaction {n}', 'abstract': 'x' * 100} for n in range(50)]),
+        'Interactions/report.pdf': b'%PDF-1.7 report'
+    }
+
+    def exercise(self, stand_in, session):
+        functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, session=session)
+        for _ in range(5):
+            self.assertTrue(functions.read_objects('Companies')[0])
+            self.assertEqual(functions.read_blob('Interactions/report.pdf')[2], b'%PDF-1.7 report')
+        # Past the inline limit the container is streamed
+        self.assertEqual(len(functions.read_objects('Interactions')[2]['mr_json']), 50)
+        return functions
+
+    def test_requests_reuse_connections(self):
+        with GitHubStandIn(files=self.files, inline_limit=1024) as stand_in:
+            self.exercise(stand_in, PooledSession(pool_size=2))
+            self.assertGreater(len(stand_in.requests), 10)
+            self.assertEqual(stand_in.connections, 1)
+
+    def test_keep_alive_can_be_disabled(self):
+        with GitHubStandIn(files=self.files, inline_limit=1024) as stand_in:
+            self.exercise(stand_in, PooledSession(keep_alive=False))
+            self.assertEqual(stand_in.connections, len(stand_in.requests))
+
+    def test_httpx_transport(self):
+        session = PooledSession()
+        session.mount('http://', HTTPXAdapter(pool_size=2))
+        with GitHubStandIn(files=self.files, inline_limit=1024) as stand_in:
+            self.exercise(stand_in, session)
+            self.assertEqual(stand_in.connections, 1)
+
+    def test_session_is_shared(self):
+        functions = GitHubFunctions('token', 'mediumroast', process_name)
+        auth = GitHubAuth(env={'clientId': 'client'})
+        self.assertIs(functions.session, get_shared_session())
+        self.assertIs(auth.session, functions.session)
+
+
+class TestRateLimits(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.sleeps = []
+        self.scheduler = RateLimitScheduler(clock=lambda: self.now, sleep=self.sleeps.append)
+
+    def respond(self, status=200, **headers):
+        return SimpleNamespace(status_code=status, headers=headers, text='')
+
+    def test_writes_are_paced(self):
+        limiter = RateLimiter('key', lambda: self.now, writes_per_minute=2)
+        self.assertEqual([limiter.reserve('PUT') for _ in range(3)], [0, 0, 30])
+        self.assertEqual(limiter.reserve('GET'), 0)
+        self.assertEqual(limiter.get_stats()['delayed'], 1)
+
+    def test_exhausted_budget_waits_for_reset(self):
+        limiter = self.scheduler.get_limiter('token secret')
+        self.assertIs(limiter, self.scheduler.get_limiter('token secret'))
+        self.assertNotIn('secret', limiter.key)
+        limiter.update(self.respond(**{'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1100'}))
+        self.assertEqual(limiter.reserve(), 100)
+
+    def test_low_budget_is_spread_until_reset(self):
+        limiter = self.scheduler.get_limiter('token secret')
+        limiter.update(self.respond(**{'X-RateLimit-Limit': '100', 'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': '1050'}))
+        self.assertEqual([limiter.reserve() for _ in range(3)], [0, 10, 20])
+
+    def test_throttled_request_is_queued_and_retried(self):
+        files = {'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}])}
+        with GitHubStandIn(files=files) as stand_in:
+            stand_in.fail('GET', 'Companies.json', 403, headers={'Retry-After': '7'}, message='You have exceeded a secondary rate limit')
+            session = PooledSession(scheduler=self.scheduler)
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, session=session)
+            read = functions.read_objects('Companies')
+            self.assertTrue(read[0])
+            self.assertEqual(read[2]['mr_json'], [{'name': 'Atlassian'}])
+            self.assertEqual(self.sleeps, [7])
+            self.assertEqual([r[2] for r in stand_in.requests], [403, 200])
+            stats = functions.get_rate_limit_stats()[2]
+            self.assertEqual((stats['requests'], stats['throttled'], stats['total_wait']), (2, 1, 7))
+
+    def test_pygithub_requests_share_the_scheduler(self):
+        files = {'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}])}
+        with GitHubStandIn(files=files) as stand_in:
+            stand_in.fail('PUT', 'Companies.json', 403, headers={'Retry-After': '5'}, message='You have exceeded a secondary rate limit')
+            session = PooledSession(scheduler=self.scheduler)
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, session=session)
+            self.assertTrue(functions.lock_container('Companies')[0])
+            self.assertTrue(functions.get_sha('Companies', 'Companies.json', 'main')[0])
+            self.assertTrue(functions.unlock_container('Companies', None)[0])
+            written = functions.write_object('Companies', [{'name': 'Notion'}], 'main', None)
+            self.assertTrue(written[0], written[1])
+            self.assertEqual(json.loads(stand_in.read_file('Companies/Companies.json')), [{'name': 'Notion'}])
+            # The repository lookup and the contents calls of PyGithub are paced with the raw requests
+            self.assertIn(('GET', f'/repos/{stand_in.org}/{stand_in.repo}'), [r[:2] for r in stand_in.requests])
+            stats = functions.get_rate_limit_stats()[2]
+            self.assertEqual((stats['requests'], stats['throttled']), (len(stand_in.requests), 1))
+            self.assertEqual(self.sleeps, [5])
+            self.assertEqual(stand_in.connections, 1)
+
+
+class TestTokenExpiry(unittest.TestCase):
+    def token(self, auth_type, expires_in):
+        expires_at = (datetime.now(timezone.utc) + timedelta(seconds=expires_in)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return {'token': f'{auth_type}-token', 'expires_at': expires_at, 'auth_type': auth_type}
+
+    def test_valid_token_is_checked_locally(self):
+        session = MagicMock()
+        auth = GitHubAuth(env={'clientId': 'client'}, session=session)
+        token_info = self.token('pem', 3600)
+        self.assertIs(auth.check_and_refresh_token(token_info), token_info)
+        session.get.assert_not_called()
+        fresh = self.token('pem', 3600)
+        auth.get_access_token_pem = MagicMock(return_value=fresh)
+        session.get.return_value = MagicMock(ok=False, reason='Unauthorized')
+        self.assertIs(auth.check_and_refresh_token(token_info, verify=True), fresh)
+        session.get.assert_called_once()
+
+    def test_revoked_pat_is_detected(self):
+        session = MagicMock()
+        session.get.return_value = MagicMock(ok=False, reason='Bad credentials')
+        auth = GitHubAuth(env={'clientId': 'client'}, session=session)
+        # The recorded expiry of a PAT is only an estimate, GitHub is asked even though it lies ahead
+        with self.assertRaises(ValueError):
+            auth.check_and_refresh_token(self.token('pat', 30 * 24 * 3600))
+        session.get.assert_called_once()
+
+    def test_token_inside_margin_is_refreshed(self):
+        auth = GitHubAuth(env={'clientId': 'client'}, session=MagicMock(), expiry_margin=300)
+        fresh = self.token('pem', 3600)
+        auth.get_access_token_pem = MagicMock(return_value=fresh)
+        self.assertIs(auth.check_and_refresh_token(self.token('pem', 120)), fresh)
+        auth.session.get.assert_not_called()
+
+    def test_refresher_mints_before_expiry(self):
+        auth = GitHubAuth(env={'clientId': 'client'}, session=MagicMock(), expiry_margin=300)
+        fresh = self.token('pem', 3600)
+        auth.get_access_token_pem = MagicMock(return_value=fresh)
+        refreshed = threading.Event()
+        refresher = auth.start_token_refresher(self.token('pem', 200), on_refresh=lambda token_info: refreshed.set())
+        self.addCleanup(refresher.stop)
+        self.assertTrue(refreshed.wait(5))
+        self.assertIs(refresher.get_token(), fresh)
+        self.assertEqual(refresher.refresh_count, 1)
+        auth.get_access_token_pem.assert_called_once()
+
+    def test_clients_follow_the_refresher(self):
+        auth = GitHubAuth(env={'clientId': 'client'}, session=MagicMock(), expiry_margin=300)
+        fresh = self.token('pem', 3600)
+        fresh['token'] = 'fresh-token'
+        auth.get_access_token_pem = MagicMock(return_value=fresh)
+        refreshed = threading.Event()
+        files = {'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}])}
+        with GitHubStandIn(files=files) as stand_in:
+            scheduler = RateLimitScheduler()
+            client = MediumroastClient('stale-token', stand_in.org, process_name, api_url=stand_in.url, session=PooledSession(scheduler=scheduler))
+            refresher = auth.start_token_refresher(self.token('pem', 200), on_refresh=lambda token_info: refreshed.set())
+            self.addCleanup(refresher.stop)
+            client.use_token_refresher(refresher)
+            self.assertTrue(refreshed.wait(5))
+            self.assertEqual((client.token, client.server_ctl.token), ('fresh-token', 'fresh-token'))
+            # Raw requests and PyGithub requests are both sent with the refreshed token
+            self.assertTrue(client.companies.get_all()[0])
+            self.assertTrue(client.server_ctl.get_sha('Companies', 'Companies.json', 'main')[0])
+            netloc = stand_in.url.split('://', 1)[1]
+            self.assertEqual(scheduler.get_limiter('token fresh-token', netloc).get_stats()['requests'], len(stand_in.requests))
+
+
+class TestTokenStore(unittest.TestCase):
+    env = {'clientId': 'client', 'appId': '1234', 'installationId': '5678'}
+
+    def minted(self, number):
+        expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return {'token': f'installation-token-{number}', 'expires_at': expires_at, 'auth_type': 'pem'}
+
+    def test_workers_mint_one_token(self):
+        mints = []
+        lock = threading.Lock()
+
+        def mint():
+            with lock:
+                mints.append(len(mints))
+                return self.minted(len(mints))
+
+        with tempfile.TemporaryDirectory() as directory:
+            tokens = []
+
+            def worker():
+                auth = GitHubAuth(env=self.env, session=MagicMock(), token_store=TokenStore(directory))
+                auth._mint_access_token_pem = mint
+                tokens.append(auth.get_access_token_pem()['token'])
+
+            workers = [threading.Thread(target=worker) for _ in range(8)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            self.assertEqual(len(mints), 1)
+            self.assertEqual(tokens, ['installation-token-1'] * 8)
+            self.assertEqual(oct(os.stat(os.path.join(directory, '1234-5678.json')).st_mode & 0o777), '0o600')
+
+    def test_rejected_token_is_replaced(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = TokenStore(directory)
+            auth = GitHubAuth(env=self.env, session=MagicMock(), token_store=store)
+            auth._mint_access_token_pem = MagicMock(side_effect=[self.minted(1), self.minted(2)])
+            first = auth.get_access_token_pem()
+            auth.session.get.return_value = MagicMock(ok=False, reason='Bad credentials')
+            second = auth.check_and_refresh_token(first, verify=True)
+            self.assertEqual(second['token'], 'installation-token-2')
+            self.assertEqual(store.read('1234', '5678'), second)
+            self.assertEqual((store.hits, store.mints), (0, 2))
+
+
+class TestBulkDownloads(unittest.TestCase):
+    def setUp(self):
+        self.files = {f'Interactions/document {n}.pdf': f'%PDF document {n}'.encode() * 100 for n in range(30)}
+        self.stand_in = GitHubStandIn(files=self.files)
+        self.stand_in.__enter__()
+        self.addCleanup(self.stand_in.__exit__, None, None, None)
+        self.ctl = Interactions('token', self.stand_in.org, process_name)
+        self.ctl.server_ctl = GitHubFunctions('token', self.stand_in.org, process_name, api_url=self.stand_in.url)
+
+    def test_results_arrive_as_a_generator(self):
+        interactions = [{'name': path, 'url': path} for path in self.files]
+        seen = []
+        results = dict(self.ctl.download_interaction_contents(
+            interactions, max_workers=4, progress=lambda path, result, completed: seen.append(completed)))
+        self.assertEqual({path: result[2] for path, result in results.items()}, self.files)
+        self.assertEqual(sorted(seen), list(range(1, 31)))
+        # One request per file and nothing kept in the validator cache
+        self.assertEqual(self.stand_in.count('GET'), 30)
+        self.assertEqual(self.ctl.server_ctl.validator_cache.get_stats()['entries'], 0)
+
+    def test_stream_to_directory_with_retries(self):
+        self.stand_in.fail('GET', 'document 3.pdf', 502, times=2)
+        paths = list(self.files) + ['Interactions/missing.pdf']
+        with tempfile.TemporaryDirectory() as target_dir:
+            downloaded = self.ctl.download_interaction_contents(paths, target_dir, retry_policy=RetryPolicy(max_attempts=3, backoff=0))
+            self.assertFalse(downloaded[0])
+            self.assertEqual(downloaded[1]['status_code'], 207)
+            results = downloaded[2]
+            self.assertEqual(results['Interactions/missing.pdf'][1]['status_code'], 404)
+            self.assertEqual(results['Interactions/document 3.pdf'][1]['attempts'], 3)
+            for path, content in self.files.items():
+                with open(os.path.join(target_dir, *path.split('/')), 'rb') as file:
+                    self.assertEqual(file.read(), content)
+            self.assertEqual(sorted(os.listdir(os.path.join(target_dir, 'Interactions'))), sorted(path.split('/')[1] for path in self.files))
+
+
+class TestLargeContainers(unittest.TestCase):
+    def test_iter_json_array_across_chunk_boundaries(self):
+        objects = [{'name': f'Interaction {n}', 'score': n / 3, 'tags': ['é', None, True]} for n in range(200)]
+        document = json.dumps(objects, ensure_ascii=False).encode()
+        for size in (1, 7, 4096):
+            chunks = (document[start:start + size] for start in range(0, len(document), size))
+            self.assertEqual(list(iter_json_array(chunks)), objects)
+        self.assertEqual(list(iter_json_array([b'[1', b'23]'])), [123])
+        self.assertEqual(list(iter_json_array([b' [ ]'])), [])
+
+    def test_read_and_write_past_the_inline_limit(self):
+        interactions = [{'name': f'Interaction {n}', 'abstract': 'x' * 100} for n in range(50)]
+        with GitHubStandIn(files={'Interactions/Interactions.json': json.dumps(interactions)}, inline_limit=1024) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            functions.stream_chunk_size = 512
+            functions.inline_content_limit = 1024
+            read = functions.read_objects('Interactions')
+            self.assertTrue(read[0], read[1])
+            self.assertEqual(read[2]['mr_json'], interactions)
+            self.assertEqual(stand_in.count('GET', '/git/blobs/'), 1)
+
+            # Only the contents metadata is cached, the SHA of a large container is revalidated without streaming it
+            sha = functions.get_container_sha('Interactions')
+            self.assertTrue(sha[0], sha[1])
+            self.assertEqual(sha[2], read[2]['sha'])
+            self.assertEqual(functions.validator_cache.hits, 1)
+            self.assertEqual(stand_in.count('GET', '/git/blobs/'), 1)
+
+            mutated = functions.mutate_containers(['Interactions'], lambda containers: containers['Interactions'].pop())
+            self.assertTrue(mutated[0], mutated[1])
+            self.assertEqual(stand_in.count('POST', '/git/blobs'), 1)
+            self.assertEqual(json.loads(stand_in.read_file('Interactions/Interactions.json')), interactions[:-1])
+
+
+class TestSingleCommitWrites(unittest.TestCase):
+    def setUp(self):
+        self.interactions = [{'name': 'Confluence vs SharePoint', 'status': 0}, {'name': 'TEAM Q1 2024', 'status': 0}]
+        self.files = {
+            'Interactions/Interactions.json': json.dumps(self.interactions),
+            'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}])
+        }
+
+    def _controller(self, stand_in):
+        ctl = Interactions('token', stand_in.org, process_name)
+        ctl.server_ctl = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+        return ctl
+
+    def test_update_is_one_data_commit(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            commits_before = len(stand_in.commits)
+            updated = self._controller(stand_in).update_obj({'TEAM Q1 2024': {'status': 1}})
+            self.assertTrue(updated[0], updated[1])
+            # One lock commit plus one commit holding the data and the lock removal, no branches or pulls
+            self.assertEqual(len(stand_in.commits) - commits_before, 2)
+            self.assertEqual(stand_in.count('PATCH', '/git/refs/heads/main'), 2)
+            self.assertEqual(list(stand_in.refs), ['main'])
+            self.assertNotIn(f'Interactions/{process_name}.lock', stand_in.files_at())
+            written = json.loads(stand_in.read_file('Interactions/Interactions.json'))
+            self.assertEqual({obj['name']: obj['status'] for obj in written}, {'Confluence vs SharePoint': 0, 'TEAM Q1 2024': 1})
+
+    def test_bulk_update_writes_container_once(self):
+        companies = [{'name': f'Company {number}', 'status': 0} for number in range(500)]
+        with GitHubStandIn(files={'Companies/Companies.json': json.dumps(companies)}) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            updates = {f'Company {number}': {'status': 1} for number in range(499)}
+            updates['Company 0'] = {'status': 1}
+            updates['Company 499'] = {'status': 0}
+            updated = functions.update_object({'Companies': {'updates': updates, 'system': False, 'white_list': ['status']}})
+            self.assertTrue(updated[0], updated[1])
+            self.assertEqual(updated[2], {'changed_objects': {'Companies': 499}, 'total_changed': 499})
+            # The lock commit and one data commit
+            self.assertEqual(stand_in.count('POST', '/git/commits'), 2)
+            written = json.loads(stand_in.read_file('Companies/Companies.json'))
+            self.assertEqual([obj['name'] for obj in written], [obj['name'] for obj in companies])
+            self.assertNotIn('modification_date', written[499])
+
+    def test_rejected_update_releases_locks(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            updated = self._controller(stand_in).update_obj({'TEAM Q1 2024': {'name': 'Renamed'}})
+            self.assertFalse(updated[0])
+            self.assertEqual(updated[1]['status_code'], 403)
+            self.assertNotIn(f'Interactions/{process_name}.lock', stand_in.files_at())
+            self.assertEqual(stand_in.read_file('Interactions/Interactions.json'), self.files['Interactions/Interactions.json'].encode())
+
+    def test_release_rebases_over_unrelated_commits(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            caught = functions.catch_container({'containers': {'Interactions': {}}, 'branch': {}})
+            caught[2]['containers']['Interactions']['objects'].append({'name': 'New', 'status': 0})
+            stand_in.commit_files({'Companies/Companies.json': json.dumps([])})
+            released = functions.release_container(caught[2])
+            self.assertTrue(released[0], released[1])
+            self.assertEqual(len(json.loads(stand_in.read_file('Interactions/Interactions.json'))), 3)
+            self.assertEqual(json.loads(stand_in.read_file('Companies/Companies.json')), [])
+
+    def test_release_refuses_to_overwrite_a_changed_container(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            caught = functions.catch_container({'containers': {'Interactions': {}}, 'branch': {}})
+            caught[2]['containers']['Interactions']['objects'].append({'name': 'New', 'status': 0})
+            stand_in.commit_files({'Interactions/Interactions.json': json.dumps([])})
+            released = functions.release_container(caught[2])
+            self.assertFalse(released[0])
+            self.assertEqual(released[2][1]['status_code'], 409)
+            self.assertEqual(json.loads(stand_in.read_file('Interactions/Interactions.json')), [])
+            self.assertNotIn(f'Interactions/{process_name}.lock', stand_in.files_at())
+
+
+    def test_locks_found_with_one_tree_read(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            caught = functions.catch_container({'containers': {'Companies': {}, 'Interactions': {}}, 'branch': {}})
+            self.assertTrue(caught[0], caught[1])
+            self.assertEqual(stand_in.count('GET', '/git/trees/'), 1)
+            abandoned = functions.abandon_container(caught[2])
+            self.assertTrue(abandoned[0], abandoned[1])
+            self.assertEqual(stand_in.count('GET', '/git/trees/'), 2)
+            # Neither the container directories nor the lock files were read through the contents API
+            directory_reads = [r for r in stand_in.requests if r[0] == 'GET' and r[1].split('?')[0].endswith(('/contents/Companies', '/contents/Interactions'))]
+            self.assertEqual(directory_reads, [])
+            self.assertEqual(stand_in.count('GET', '.lock'), 0)
+            self.assertFalse(any(path.endswith('.lock') for path in stand_in.files_at()))
+
+    def test_locks_are_taken_all_or_none(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            stand_in.commit_files({f'Interactions/{process_name}.lock': ''})
+            caught = functions.catch_container({'containers': {'Companies': {}, 'Interactions': {}}, 'branch': {}})
+            self.assertFalse(caught[0])
+            self.assertIn('[Interactions] is locked', caught[1]['status_msg'])
+            self.assertNotIn(f'Companies/{process_name}.lock', stand_in.files_at())
+
+            stand_in.commit_files({f'Interactions/{process_name}.lock': None})
+            stand_in.fail('PATCH', '/git/refs/heads/main', 409)
+            caught = functions.catch_container({'containers': {'Companies': {}, 'Interactions': {}}, 'branch': {}})
+            self.assertFalse(caught[0])
+            self.assertFalse(any(path.endswith('.lock') for path in stand_in.files_at()))
+
+            # Both lock files are added by one commit
+            commits_before = len(stand_in.commits)
+            caught = functions.catch_container({'containers': {'Companies': {}, 'Interactions': {}}, 'branch': {}})
+            self.assertTrue(caught[0], caught[1])
+            self.assertEqual(len(stand_in.commits) - commits_before, 1)
+            self.assertEqual(caught[2]['containers']['Companies']['lockSha'], stand_in.refs['main'])
+            self.assertEqual(stand_in.count('PUT', '.lock'), 0)
+
+    def test_locks_survive_a_truncated_tree(self):
+        files = dict(self.files, **{f'Interactions/Report {n}.pdf': f'%PDF {n}' for n in range(20)})
+        files['Other/notes.txt'] = 'not a container'
+        with GitHubStandIn(files=files) as stand_in:
+            stand_in.tree_limit = 5
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            caught = functions.catch_container({'containers': {'Companies': {}, 'Interactions': {}}, 'branch': {}})
+            self.assertTrue(caught[0], caught[1])
+            self.assertTrue(functions.check_for_lock('Interactions')[0])
+            self.assertEqual(functions.lock_containers(['Interactions'])[1]['status_code'], 423)
+            # Only the container directories are listed
+            listed = functions.get_tree_files(stand_in.refs['main'], ['Interactions'])
+            self.assertIn('Interactions/Report 7.pdf', listed[2])
+            self.assertNotIn('Other/notes.txt', listed[2])
+
+            caught[2]['containers']['Interactions']['objects'].pop()
+            released = functions.release_container(caught[2])
+            self.assertTrue(released[0], released[1])
+            self.assertFalse(any(path.endswith('.lock') for path in stand_in.files_at()))
+            self.assertEqual(len(json.loads(stand_in.read_file('Interactions/Interactions.json'))), 1)
+
+            caught = functions.catch_container({'containers': {'Companies': {}}, 'branch': {}})
+            self.assertTrue(functions.abandon_container(caught[2])[0])
+            self.assertFalse(any(path.endswith('.lock') for path in stand_in.files_at()))
+
+    def test_containers_are_read_in_parallel(self):
+        files = dict(self.files, **{'Studies/Studies.json': json.dumps([{'name': 'Study 1'}])})
+        with GitHubStandIn(files=files) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            stand_in.latency = 0.05
+            caught = functions.catch_container({'containers': {'Studies': {}, 'Companies': {}, 'Interactions': {}}, 'branch': {}})
+            self.assertTrue(caught[0], caught[1])
+            # Checks and locks go one at a time, only the reads can overlap
+            self.assertGreaterEqual(stand_in.max_in_flight, 2)
+            self.assertEqual(caught[2]['containers']['Studies']['objects'], [{'name': 'Study 1'}])
+            self.assertEqual(len(caught[2]['containers']['Interactions']['objects']), 2)
+            self.assertTrue(functions.abandon_container(caught[2])[0])
+
+class TestOptimisticWrites(unittest.TestCase):
+    def test_create_obj_without_locks(self):
+        with GitHubStandIn(files={'Interactions/Interactions.json': json.dumps([])}) as stand_in:
+            ctl = Interactions('token', stand_in.org, process_name)
+            ctl.server_ctl = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            created = ctl.create_obj([{'name': 'Confluence vs SharePoint'}], optimistic=True)
+            self.assertTrue(created[0], created[1])
+            self.assertEqual(stand_in.count('PUT'), 0)
+            self.assertEqual(json.loads(stand_in.read_file('Interactions/Interactions.json')), [{'name': 'Confluence vs SharePoint'}])
+
+    def test_conflict_is_reread_and_retried(self):
+        with GitHubStandIn(files={'Interactions/Interactions.json': json.dumps([{'name': 'A', 'status': 0}])}) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            seen = []
+
+            def mutate(containers):
+                seen.append([obj['name'] for obj in containers['Interactions']])
+                if len(seen) == 1:
+                    # Another writer lands a change to the same container before this attempt commits
+                    stand_in.commit_files({'Interactions/Interactions.json': json.dumps([{'name': 'A', 'status': 0}, {'name': 'B', 'status': 0}])})
+                for obj in containers['Interactions']:
+                    obj['status'] = 1
+
+            mutated = functions.mutate_containers(['Interactions'], mutate, retry_policy=RetryPolicy(backoff=0))
+            self.assertTrue(mutated[0], mutated[1])
+            self.assertEqual(mutated[2]['attempts'], 2)
+            self.assertEqual(seen, [['A'], ['A', 'B']])
+            written = json.loads(stand_in.read_file('Interactions/Interactions.json'))
+            self.assertEqual(written, [{'name': 'A', 'status': 1}, {'name': 'B', 'status': 1}])
+
+    def test_retries_are_bounded(self):
+        with GitHubStandIn(files={'Interactions/Interactions.json': json.dumps([])}) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+
+            def mutate(containers):
+                stand_in.commit_files({'Interactions/Interactions.json': json.dumps([{'name': str(len(stand_in.commits))}])})
+                containers['Interactions'].append({'name': 'mine'})
+
+            mutated = functions.mutate_containers(['Interactions'], mutate, retry_policy=RetryPolicy(max_attempts=3, backoff=0))
+            self.assertFalse(mutated[0])
+            self.assertEqual(mutated[1]['status_code'], 409)
+
+
+class TestShardedContainers(unittest.TestCase):
+    interactions = [{'name': f'Interaction {n}', 'status': 0} for n in range(200)]
+
+    def migrated_stand_in(self):
+        stand_in = GitHubStandIn(files={'Interactions/Interactions.json': json.dumps(self.interactions)})
+        stand_in.__enter__()
+        self.addCleanup(stand_in.__exit__, None, None, None)
+        functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+        migrated = functions.migrate_to_shards('Interactions', ShardLayout(prefix_length=1))
+        self.assertTrue(migrated[0], migrated[1])
+        return stand_in
+
+    def test_migration_is_one_commit(self):
+        stand_in = self.migrated_stand_in()
+        files = stand_in.files_at('main')
+        self.assertNotIn('Interactions/Interactions.json', files)
+        manifest = json.loads(stand_in.read_file('Interactions/shards/manifest.json'))
+        self.assertEqual(manifest['key'], 'name')
+        self.assertEqual(sum(shard['count'] for shard in manifest['shards'].values()), 200)
+        self.assertEqual(len(manifest['shards']), 16)
+        self.assertEqual(stand_in.count('PATCH', '/git/refs/'), 1)
+
+    def test_layout_is_hidden_from_readers(self):
+        stand_in = self.migrated_stand_in()
+        # A fresh object detects the layout from the manifest
+        functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+        read = functions.read_objects('Interactions')
+        self.assertTrue(read[0], read[1])
+        self.assertEqual(sorted(obj['name'] for obj in read[2]['mr_json']), sorted(obj['name'] for obj in self.interactions))
+        self.assertEqual(read[2]['sha'], functions.get_container_sha('Interactions')[2])
+
+        # Shards are addressed by content and never fetched twice, a selective read only needs the manifest
+        blob_reads = stand_in.count('GET', '/git/blobs/')
+        selected = functions.read_objects('Interactions', keys=['Interaction 7'])
+        self.assertEqual(selected[2]['mr_json'], [{'name': 'Interaction 7', 'status': 0}])
+        self.assertEqual(stand_in.count('GET', '/git/blobs/'), blob_reads)
+
+        # An object with its own object cache does not see the containers the migration wrote
+        other = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+        other.read_objects('Interactions', keys=['Interaction 7'])
+        self.assertEqual(stand_in.count('GET', '/git/blobs/'), blob_reads + 1)
+
+    def test_update_writes_only_changed_shards(self):
+        stand_in = self.migrated_stand_in()
+        before = stand_in.files_at('main')
+        functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+        updates = {'Interactions': {'updates': {'Interaction 3': {'status': 1}}, 'system': False, 'white_list': ['status']}}
+        updated = functions.update_object(updates, optimistic=True)
+        self.assertTrue(updated[0], updated[1])
+        after = stand_in.files_at('main')
+        changed = sorted(path for path in after if before.get(path) != after[path])
+        shard = ShardLayout(prefix_length=1).shard_path('Interactions', ShardLayout(prefix_length=1).prefix_of('Interaction 3'))
+        self.assertEqual(changed, sorted(['Interactions/shards/manifest.json', shard]))
+        read = functions.read_objects('Interactions', keys=['Interaction 3'])
+        self.assertEqual(read[2]['mr_json'][0]['status'], 1)
+
+    def test_emptied_shards_are_deleted(self):
+        stand_in = self.migrated_stand_in()
+        functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+        head_sha = functions.get_head_sha()[2]
+        committed = functions.commit_containers({'Interactions': [{'name': 'Only'}]}, head_sha)
+        self.assertTrue(committed[0], committed[1])
+        shards = [path for path in stand_in.files_at('main') if path.startswith('Interactions/shards/')]
+        self.assertEqual(len(shards), 2)
+        self.assertEqual(functions.read_objects('Interactions')[2]['mr_json'], [{'name': 'Only'}])
+
+
+class TestIndexedLookups(unittest.TestCase):
+    def test_lookups_share_one_snapshot(self):
+        interactions = [{'name': f'Interaction {n}', 'file_hash': f'hash-{n}', 'status': n % 2} for n in range(100)]
+        with GitHubStandIn(files={'Interactions/Interactions.json': json.dumps(interactions)}) as stand_in:
+            ctl = Interactions('token', stand_in.org, process_name)
+            ctl.server_ctl = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            ctl.server_ctl.add_write_listener(ctl._on_write)
+
+            # Within index_ttl the default lookups reuse the index without asking GitHub again
+            self.assertEqual(ctl.find_by_hash('hash-7')[2][0]['name'], 'Interaction 7')
+            for n in range(100):
+                self.assertEqual(ctl.find_by_hash(f'hash-{n}')[2][0]['name'], f'Interaction {n}')
+            self.assertEqual(stand_in.count('GET', '/contents/'), 1)
+
+            # Revalidation costs a 304 and the index is not rebuilt
+            ctl.index_ttl = 0
+            index = ctl.get_index()[2]
+            self.assertEqual(len(ctl.find_by_x('status', 1)[2]), 50)
+            self.assertIs(ctl.get_index()[2], index)
+            self.assertEqual([r[2] for r in stand_in.requests][1:], [304, 304, 304])
+
+            found = ctl.find_many('file_hash', ['hash-1', 'missing'], refresh=False)[2]
+            self.assertEqual(len(found['hash-1']), 1)
+            self.assertEqual(found['missing'], [])
+            found['hash-1'][0]['name'] = 'Mutated'
+            self.assertEqual(ctl.find_by_hash('hash-1', refresh=False)[2][0]['name'], 'Interaction 1')
+
+            # Our own writes are reflected without re-reading the container
+            created = ctl.create_obj([{'name': 'New', 'file_hash': 'hash-new', 'status': 0}], optimistic=True)
+            self.assertTrue(created[0], created[1])
+            self.assertEqual(ctl.find_by_hash('hash-new', refresh=False)[2][0]['name'], 'New')
+
+            # A change by another writer is picked up on revalidation
+            stand_in.commit_files({'Interactions/Interactions.json': json.dumps(interactions[:1])})
+            self.assertEqual(ctl.find_by_hash('hash-2')[2], [])
+
+
+class TestSharedClient(unittest.TestCase):
+    def test_controllers_share_one_client(self):
+        files = {
+            'Companies/Companies.json': json.dumps([{'name': 'Atlassian', 'company_type': 'Public'}]),
+            'Interactions/Interactions.json': json.dumps([{'name': 'Interaction 1', 'file_hash': 'hash-1'}]),
+            'Studies/Studies.json': json.dumps([{'name': 'Study 1'}])
+        }
+        with GitHubStandIn(files=files) as stand_in:
+            client = MediumroastClient('token', stand_in.org, process_name, api_url=stand_in.url, session=PooledSession())
+            self.assertIs(client.companies, client.companies)
+            controllers = [client.companies, client.interactions, client.studies, client.users, client.billings]
+            self.assertTrue(all(controller.server_ctl is client.server_ctl for controller in controllers))
+            self.assertEqual(client.companies.find_by_x('company_type', 'Public')[2][0]['name'], 'Atlassian')
+            self.assertEqual(client.interactions.find_by_hash('hash-1')[2][0]['name'], 'Interaction 1')
+            self.assertEqual(client.studies.get_all()[2]['mr_json'], [{'name': 'Study 1'}])
+            self.assertEqual(stand_in.connections, 1)
+            stats = client.get_stats()[2]
+            self.assertEqual(stats['validator_cache']['entries'], 3)
+            self.assertEqual(stats['controllers'], ['billings', 'companies', 'interactions', 'studies', 'users'])
+
+    def test_short_lived_views_are_not_kept_alive(self):
+        with GitHubStandIn(files={'Interactions/Interactions.json': json.dumps([])}) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            views = [Interactions('token', stand_in.org, process_name, server_ctl=functions) for _ in range(100)]
+            references = [weakref.ref(view) for view in views]
+            kept = views[0]
+            del views
+            gc.collect()
+            self.assertEqual(sum(reference() is not None for reference in references), 1)
+            # The next commit drops the listeners of collected views and still updates the live one
+            created = kept.create_obj([{'name': 'New', 'file_hash': 'hash-new'}], optimistic=True)
+            self.assertTrue(created[0], created[1])
+            self.assertEqual(len(functions.write_listeners), 1)
+            self.assertEqual(kept.find_by_hash('hash-new', refresh=False)[2][0]['name'], 'New')
+
+
+class TestObjectCache(unittest.TestCase):
+    def test_reads_see_our_writes_without_a_transfer(self):
+        files = {'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}])}
+        with GitHubStandIn(files=files) as stand_in:
+            client = MediumroastClient('token', stand_in.org, process_name, api_url=stand_in.url)
+            self.assertTrue(client.companies.get_all()[0])
+            created = client.companies.create_obj([{'name': 'Microsoft'}])
+            self.assertTrue(created[0], created[1])
+
+            # The branch still points to our commit, the written content is served without reading it back
+            contents_reads = stand_in.count('GET', '/contents/Companies')
+            names = [obj['name'] for obj in client.companies.get_all()[2]['mr_json']]
+            self.assertEqual(names, ['Atlassian', 'Microsoft'])
+            self.assertEqual(stand_in.count('GET', '/contents/Companies'), contents_reads)
+
+            # Objects of the same repository share the cache
+            other = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            self.assertIs(other.object_cache, client.server_ctl.object_cache)
+            # but a client with another token never sees what this one read or wrote
+            self.assertIsNot(GitHubFunctions('other token', stand_in.org, process_name, api_url=stand_in.url).object_cache, other.object_cache)
+            self.assertEqual(len(other.read_objects('Companies')[2]['mr_json']), 2)
+            self.assertEqual(client.get_stats()[2]['object_cache']['hits'], 2)
+
+            # Once someone else commits the container is read from GitHub again
+            stand_in.commit_files({'Companies/Companies.json': json.dumps([{'name': 'Google'}])})
+            self.assertEqual(client.companies.get_all()[2]['mr_json'], [{'name': 'Google'}])
+            self.assertEqual(stand_in.count('GET', '/contents/Companies'), contents_reads + 1)
+
+            # and the head of the branch is no longer asked for before every read
+            ref_reads = stand_in.count('GET', '/git/ref/')
+            for _ in range(3):
+                self.assertEqual(client.companies.get_all()[2]['mr_json'], [{'name': 'Google'}])
+            self.assertEqual(stand_in.count('GET', '/git/ref/'), ref_reads)
+
+    def test_lru_eviction_within_budget(self):
+        cache = ObjectCache(max_entries=2, max_bytes=10)
+        cache.put('Companies', 'a', '[1]')
+        cache.put('Companies', 'b', '[2]')
+        self.assertEqual(cache.get('Companies', 'a'), '[1]')
+        cache.put('Companies', 'c', '[3]')
+        self.assertIsNone(cache.get('Companies', 'b'))
+        cache.put('Studies', 'd', '[' + '0' * 20 + ']')
+        self.assertIsNone(cache.get('Studies', 'd'))
+        self.assertEqual(cache.get_stats(), {'entries': 2, 'bytes': 6, 'commits': 0, 'hits': 1, 'misses': 2, 'evictions': 1})
+
+
+class TestBulkDeletes(unittest.TestCase):
+    def _files(self, interaction_count):
+        interactions = [{'name': f'Interaction {n}', 'linked_companies': {'Atlassian': 'hash-a'}} for n in range(interaction_count)]
+        interactions.append({'name': 'Shared', 'linked_companies': {'Atlassian': 'hash-a', 'Microsoft': 'hash-m'}})
+        companies = [
+            {'name': 'Atlassian', 'linked_interactions': {obj['name']: 'hash' for obj in interactions}},
+            {'name': 'Microsoft', 'linked_interactions': {'Shared': 'hash'}}
+        ]
+        return {
+            'Companies/Companies.json': json.dumps(companies),
+            'Interactions/Interactions.json': json.dumps(interactions),
+            'Studies/Studies.json': json.dumps([])
+        }
+
+    def _delete(self, interaction_count, **kwargs):
+        with GitHubStandIn(files=self._files(interaction_count)) as stand_in:
+            client = MediumroastClient('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            deleted = client.companies.delete_obj('Atlassian', **kwargs)
+            self.assertTrue(deleted[0], deleted[1])
+            written = {
+                container: json.loads(stand_in.read_file(f'{container}/{container}.json'))
+                for container in ('Companies', 'Interactions')
+            }
+            return deleted[2], written, stand_in.count('PATCH', '/git/refs/'), stand_in.count('GET', '/contents/Interactions')
+
+    def test_company_delete_cascades_to_interactions(self):
+        summary, written, _, _ = self._delete(3)
+        self.assertEqual(summary['deleted'], {'Companies': ['Atlassian'], 'Interactions': ['Interaction 0', 'Interaction 1', 'Interaction 2', 'Shared']})
+        self.assertEqual(summary['total_deleted'], 5)
+        self.assertEqual(written['Interactions'], [])
+        self.assertEqual(written['Companies'], [{'name': 'Microsoft', 'linked_interactions': {}}])
+
+    def test_cost_does_not_grow_with_linked_objects(self):
+        one = self._delete(1)
+        many = self._delete(2000)
+        self.assertEqual(many[0]['total_deleted'], 2002)
+        # Same number of ref updates and container reads for 2 or 2,001 interactions
+        self.assertEqual(many[2:], one[2:])
+
+    def test_allow_orphans_only_unlinks(self):
+        summary, written, _, _ = self._delete(1, allow_orphans=True)
+        self.assertEqual(summary['deleted'], {'Companies': ['Atlassian']})
+        self.assertEqual(
+            written['Interactions'],
+            [{'name': 'Interaction 0', 'linked_companies': {}}, {'name': 'Shared', 'linked_companies': {'Microsoft': 'hash-m'}}]
+        )
+
+    def test_missing_name_writes_nothing(self):
+        with GitHubStandIn(files=self._files(1)) as stand_in:
+            client = MediumroastClient('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            deleted = client.interactions.delete_objs(['Shared', 'Nobody'])
+            self.assertFalse(deleted[0])
+            self.assertEqual(deleted[1]['status_code'], 404)
+            self.assertEqual(len(json.loads(stand_in.read_file('Interactions/Interactions.json'))), 2)
+            # The locks are released and no commit touched the containers
+            self.assertNotIn(f'Interactions/{process_name}.lock', stand_in.files_at())
+            self.assertEqual(stand_in.read_file('Companies/Companies.json').decode(), self._files(1)['Companies/Companies.json'])
+
+    def test_uncaught_container_is_rejected(self):
+        functions = GitHubFunctions('token', 'mediumroast', process_name, object_cache=ObjectCache())
+        repo_metadata = {'containers': {'Companies': {'objects': [{'name': 'Atlassian'}]}}}
+        source = {'from': 'Interactions', 'to': ['Companies']}
+        for metadata in (repo_metadata, None):
+            deleted = functions.delete_object('Shared', source, metadata, catch_it=False)
+            self.assertFalse(deleted[0])
+            self.assertEqual(deleted[1]['status_code'], 400)
+
+    def test_optimistic_delete(self):
+        with GitHubStandIn(files=self._files(1)) as stand_in:
+            client = MediumroastClient('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            commits_before = len(stand_in.commits)
+            deleted = client.interactions.delete_objs(['Shared'], optimistic=True)
+            self.assertTrue(deleted[0], deleted[1])
+            self.assertEqual(deleted[2]['unlinked_objects'], {'Companies': 2, 'Interactions': 0})
+            self.assertEqual(len(stand_in.commits) - commits_before, 1)
+            companies = json.loads(stand_in.read_file('Companies/Companies.json'))
+            self.assertEqual(companies[1]['linked_interactions'], {})
+            self.assertNotIn('Shared', companies[0]['linked_interactions'])
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            'Studies/Studies.json': json.dumps([{'name': 'Study 1', 'linked_companies': {'Atlassian': 'hash'}}]),
+            'Companies/Companies.json': json.dumps([{'name': 'Atlassian', 'company_type': 'Public'}, {'name': 'Notion', 'company_type': 'Private'}]),
+            'Interactions/Interactions.json': json.dumps([{'name': 'Interaction 1', 'linked_companies': {'Atlassian': 'hash'}}])
+        }
+
+    def test_containers_are_read_at_one_commit(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            client = MediumroastClient('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            stand_in.latency = 0.05
+            snapshot = client.snapshot()
+            self.assertTrue(snapshot[0], snapshot[1])
+            snapshot = snapshot[2]
+            stand_in.latency = 0.0
+            self.assertEqual(snapshot.commit_sha, stand_in.refs['main'])
+            self.assertEqual(snapshot.container_names, ('Studies', 'Companies', 'Interactions'))
+            self.assertGreaterEqual(stand_in.max_in_flight, 2)
+
+            # A later commit does not change what the snapshot sees
+            stand_in.commit_files({'Companies/Companies.json': json.dumps([])})
+            self.assertEqual(snapshot.find_by_name('Companies', 'Atlassian')[2][0]['company_type'], 'Public')
+            self.assertEqual(snapshot.find_by_x('Companies', 'company_type', 'Private')[2][0]['name'], 'Notion')
+            linked = snapshot.query('Interactions', lambda obj: 'Atlassian' in obj['linked_companies'])[2]
+            self.assertEqual([obj['name'] for obj in linked], ['Interaction 1'])
+            self.assertEqual(snapshot.get_all('Companies')[1]['status_code'], 200)
+            self.assertEqual(snapshot.get_all('Users')[1]['status_code'], 404)
+
+            # Returned objects are copies
+            snapshot.get_all('Companies')[2]['mr_json'][0]['name'] = 'Changed'
+            snapshot.find_by_name('Studies', 'Study 1')[2][0]['linked_companies'].clear()
+            self.assertEqual(snapshot.get_all('Companies')[2]['mr_json'][0]['name'], 'Atlassian')
+            self.assertEqual(snapshot.find_by_name('Studies', 'Study 1')[2][0]['linked_companies'], {'Atlassian': 'hash'})
+
+            latest = client.snapshot()[2]
+            self.assertNotEqual(latest.commit_sha, snapshot.commit_sha)
+            self.assertEqual(latest.get_all('Companies')[2]['mr_json'], [])
+
+    def test_snapshots_are_cached_without_revalidation(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            snapshot = functions.snapshot(['Companies', 'Interactions'])[2]
+            requests_before = len(stand_in.requests)
+            self.assertIs(functions.snapshot(['Companies', 'Interactions'], snapshot.commit_sha)[2], snapshot)
+            self.assertEqual(len(stand_in.requests), requests_before)
+            # Resolving the branch costs one conditional request, answered with a 304
+            self.assertIs(functions.snapshot(['Companies', 'Interactions'])[2], snapshot)
+            self.assertEqual(stand_in.requests[requests_before:], [('GET', f'/repos/{stand_in.org}/{stand_in.repo}/git/ref/heads/main', 304)])
+            # Reads of files at a commit are served from the cache as well
+            stand_in.requests.clear()
+            self.assertTrue(functions.read_objects('Companies', snapshot.commit_sha)[0])
+            self.assertEqual(stand_in.requests, [])
+
+    def test_missing_container_fails_the_snapshot(self):
+        with GitHubStandIn(files={'Companies/Companies.json': json.dumps([])}) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            snapshot = functions.snapshot()
+            self.assertFalse(snapshot[0])
+            self.assertEqual(snapshot[1]['status_code'], 423)
+
+
+class TestUserDirectory(unittest.TestCase):
+    def test_lookups_page_lazily_and_revalidate(self):
+        with GitHubStandIn() as stand_in:
+            stand_in.collaborators = [{'login': f'user-{n}', 'id': n, 'site_admin': n == 240} for n in range(250)]
+            client = MediumroastClient('token', stand_in.org, process_name, api_url=stand_in.url)
+            directory = client.server_ctl.user_directory
+            self.now = 0.0
+            directory.clock = lambda: self.now
+
+            # The first page holds the user, the other pages are never requested
+            self.assertEqual(client.users.find_by_name('user-5')[2], [{'login': 'user-5', 'id': 5, 'site_admin': False}])
+            self.assertEqual(stand_in.count('GET', '/collaborators'), 1)
+            self.assertEqual(client.users.find_by_x('id', 5)[2][0]['login'], 'user-5')
+            self.assertEqual(client.users.find_by_name('user-150')[2][0]['id'], 150)
+            self.assertEqual(stand_in.count('GET', '/collaborators'), 2)
+
+            # Other attributes need every page, the missing one is fetched once
+            self.assertEqual([user['login'] for user in client.users.find_by_x('site_admin', True)[2]], ['user-240'])
+            self.assertEqual(len(client.users.get_all()[2]), 250)
+            self.assertEqual(client.users.find_by_name('nobody')[2], [])
+            self.assertEqual(stand_in.count('GET', '/collaborators'), 3)
+
+            # Returned users are copies
+            client.users.find_by_name('user-5')[2][0]['login'] = 'changed'
+            self.assertEqual(len(client.users.find_by_name('user-5')[2]), 1)
+
+            # Past the TTL only the page holding the user is revalidated, with a 304
+            self.now = 301.0
+            self.assertEqual(len(client.users.find_by_name('user-5')[2]), 1)
+            self.assertEqual(stand_in.requests[-1][2], 304)
+            self.assertEqual(stand_in.count('GET', '/collaborators'), 4)
+
+            # A refresh transfers only the pages that changed
+            stand_in.collaborators[200]['login'] = 'renamed'
+            stand_in.collaborators.append({'login': 'user-250', 'id': 250, 'site_admin': False})
+            refreshed = client.users.refresh()
+            self.assertTrue(refreshed[0], refreshed[1])
+            self.assertEqual(refreshed[2], {'pages': 3, 'changed_pages': 1, 'users': 251})
+            self.assertEqual(client.users.find_by_name('renamed')[2][0]['id'], 200)
+            self.assertEqual(client.users.find_by_name('user-200')[2], [])
+            self.assertEqual(directory.get_stats(), {'pages': 3, 'users': 251, 'requests': 7, 'not_modified': 3})
+
+
+class TestBillings(unittest.TestCase):
+    def test_billings_are_fetched_concurrently_cached_and_recorded(self):
+        with GitHubStandIn() as stand_in, tempfile.TemporaryDirectory() as directory:
+            self.now = 1000.0
+            history = BillingHistory(directory, clock=lambda: self.now)
+            client = MediumroastClient('token', stand_in.org, process_name, api_url=stand_in.url, billing_history=history)
+            stand_in.latency = 0.1
+            billings = client.billings.get_all()
+            self.assertTrue(billings[0], billings[1])
+            self.assertEqual(billings[2][1], {'resourceType': 'Actions', 'includedUnits': '305 min', 'paidUnitsUsed': '0 min', 'totalUnitsUsed': '305 min'})
+            self.assertEqual(stand_in.max_in_flight, 2)
+            stand_in.latency = 0.0
+
+            # The admin page reloading within the TTL costs no request
+            self.assertEqual(client.billings.get_all()[2], billings[2])
+            self.assertEqual(stand_in.count('GET', '/settings/billing/'), 2)
+
+            # Forced fetches only grow the history when usage moved
+            self.now = 2000.0
+            client.billings.get_all(max_age=0)
+            stand_in.billing['actions']['total_minutes_used'] = 420
+            self.now = 3000.0
+            client.billings.get_all(max_age=0)
+            self.assertEqual(stand_in.count('GET', '/settings/billing/'), 6)
+            series = client.billings.get_history('actions.total_minutes_used')
+            self.assertEqual(series[2], [(1000.0, 305), (3000.0, 420)])
+            self.assertEqual(history.get_series(stand_in.org, 'actions.total_minutes_used', since=2000.0), [(3000.0, 420)])
+            self.assertEqual(BillingHistory(directory).get_samples(stand_in.org)[0]['values']['storage.estimated_storage_for_month'], 1)
+
+    def test_failed_fetch_is_reported(self):
+        with GitHubStandIn() as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            stand_in.fail('GET', '/settings/billing/actions', 404)
+            billings = functions.get_billings()
+            self.assertFalse(billings[0])
+            self.assertIn('404', billings[1]['status_msg'])
+            # A failure is not cached, the next call fetches again
+            self.assertTrue(functions.get_billings()[0])
+
+
+class TestGraphQLReads(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            'Studies/Studies.json': json.dumps([{'name': 'Study 1'}]),
+            'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}]),
+            'Companies/other_process.lock': '',
+            f'Companies/{process_name}.lock': '',
+            'Interactions/Interactions.json': json.dumps([{'name': f'Interaction {n}', 'abstract': 'x' * 100} for n in range(20)])
+        }
+
+    def test_containers_and_locks_in_one_query(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            read = functions.read_many_graphql()
+            self.assertTrue(read[0], read[1])
+            self.assertEqual(stand_in.requests, [('POST', '/graphql', 200)])
+            self.assertEqual(read[2]['commit_sha'], stand_in.refs['main'])
+            # The files read with GraphQL are served from the cache at that commit
+            for container_name in ('Studies', 'Companies', 'Interactions'):
+                rest = functions.read_objects(container_name, read[2]['commit_sha'])
+                self.assertEqual(read[2]['objects'][container_name], rest)
+            self.assertEqual(len(stand_in.requests), 1)
+            self.assertEqual(read[2]['locks']['Companies'][0], True)
+            self.assertEqual(read[2]['locks']['Studies'], functions.check_for_lock('Studies'))
+
+    def test_truncated_files_are_read_with_rest(self):
+        with GitHubStandIn(files=self.files, inline_limit=1024) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url, object_cache=ObjectCache())
+            read = functions.read_many_graphql(['Companies', 'Interactions'])
+            self.assertTrue(read[0], read[1])
+            self.assertEqual(len(read[2]['objects']['Interactions'][2]['mr_json']), 20)
+            self.assertEqual(stand_in.count('POST', '/graphql'), 1)
+            self.assertEqual(stand_in.count('GET', '/contents/Companies'), 0)
+            self.assertEqual(stand_in.count('GET', f"ref={read[2]['commit_sha']}"), 1)
+
+    def test_errors_and_endpoints(self):
+        with GitHubStandIn(files=self.files) as stand_in:
+            functions = GitHubFunctions('token', 'unknown', process_name, api_url=stand_in.url)
+            read = functions.read_many_graphql()
+            self.assertFalse(read[0])
+            self.assertIn('Could not resolve', read[1]['status_msg'])
+        self.assertEqual(GitHubFunctions('token', 'mediumroast', process_name)._graphql_url(), 'https://api.github.com/graphql')
+        enterprise = GitHubFunctions('token', 'mediumroast', process_name, api_url='https://github.example.com/api/v3')
+        self.assertEqual(enterprise._graphql_url(), 'https://github.example.com/api/graphql')
+
+
+class TestContainerSync(unittest.TestCase):
+    def test_polls_report_object_changes(self):
+        studies = [{'name': 'Study 1', 'description': 'first'}, {'name': 'Study 2', 'description': 'second'}]
+        files = {
+            'Studies/Studies.json': json.dumps(studies),
+            'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}]),
+            'Interactions/Interactions.json': json.dumps([{'name': 'Interaction 1'}])
+        }
+        with GitHubStandIn(files=files) as stand_in:
+            functions = GitHubFunctions('token', stand_in.org, process_name, api_url=stand_in.url)
+            sync = ContainerSync(functions)
+            first = sync.poll()
+            self.assertTrue(first[0], first[1])
+            self.assertEqual(first[2]['changes']['Studies']['added'], studies)
+            self.assertEqual(sorted(first[2]['changes']), ['Companies', 'Interactions', 'Studies'])
+
+            # An idle poll costs one conditional request
+            requests_before = len(stand_in.requests)
+            idle = sync.poll()
+            self.assertEqual(idle[1]['status_code'], 304)
+            self.assertEqual(idle[2]['changes'], {})
+            self.assertEqual([r[2] for r in stand_in.requests[requests_before:]], [304])
+
+            stand_in.commit_files({'Studies/Studies.json': json.dumps([
+                {'name': 'Study 1', 'description': 'revised'}, {'name': 'Study 3', 'description': 'third'}
+            ])})
+            requests_before = len(stand_in.requests)
+            changed = sync.poll()
+            self.assertEqual(list(changed[2]['changes']), ['Studies'])
+            self.assertEqual(changed[2]['changes']['Studies'], {
+                'added': [{'name': 'Study 3', 'description': 'third'}],
+                'changed': [{'name': 'Study 1', 'description': 'revised'}],
+                'removed': [{'name': 'Study 2', 'description': 'second'}]
+            })
+            self.assertEqual(changed[2]['previous_sha'], first[2]['commit_sha'])
+            # Only the changed container is read
+            self.assertEqual([r[1].split('?')[0].rsplit('/', 1)[1] for r in stand_in.requests[requests_before:] if '/contents/' in r[1]], ['Studies.json'])
+            self.assertEqual(len(sync.get_objects('Studies')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from mediumroast_py.api.github import GitHubFunctions
+from mediumroast_py.api.github_server import Companies, Interactions
+from mediumroast_py.api.replica import LocalReplica
+from mediumroast_py.api.session import PooledSession
+from tests.github_stand_in import GitHubStandIn
+
+process_name = 'mediumroast_py_unit_tests'
+
+
+class TestLocalReplica(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.origin = os.path.join(directory.name, 'origin.git')
+        self.work = os.path.join(directory.name, 'work')
+        self.replica_path = os.path.join(directory.name, 'replica.git')
+        self.git('init', '--quiet', '--bare', '--initial-branch=main', self.origin)
+        self.git('clone', '--quiet', self.origin, self.work)
+        self.push({
+            'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}]),
+            'Interactions/Interactions.json': json.dumps([{'name': f'Interaction {n}', 'file_hash': f'hash-{n}'} for n in range(10)]),
+            'Interactions/report.pdf': b'%PDF-1.7 report'
+        })
+        self.now = 0.0
+        self.replica = LocalReplica(self.origin, self.replica_path, refresh_interval=60, clock=lambda: self.now)
+        self.addCleanup(self.replica.close)
+        # Nothing listens on the API URL, every read has to be served by the replica
+        self.functions = GitHubFunctions(
+            'token', 'mediumroast', process_name, api_url='http://127.0.0.1:9',
+            session=PooledSession(scheduler=None), replica=self.replica
+        )
+
+    def git(self, *args, cwd=None):
+        subprocess.run(
+            ['git', '-c', 'user.name=Unit Tests', '-c', 'user.email=tests@mediumroast.io'] + list(args),
+            cwd=cwd, check=True, capture_output=True
+        )
+
+    def push(self, files):
+        for path, content in files.items():
+            full_path = os.path.join(self.work, *path.split('/'))
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as file:
+                file.write(content if isinstance(content, bytes) else content.encode())
+        self.git('add', '-A', cwd=self.work)
+        self.git('commit', '--quiet', '-m', 'Update files', cwd=self.work)
+        self.git('push', '--quiet', 'origin', 'HEAD:main', cwd=self.work)
+
+    def test_reads_are_served_locally(self):
+        companies = self.functions.read_objects('Companies')
+        self.assertTrue(companies[0], companies[1])
+        self.assertEqual(companies[2]['mr_json'], [{'name': 'Atlassian'}])
+        self.assertEqual(len(companies[2]['sha']), 40)
+        self.assertEqual(self.functions.read_objects('Interactions', keys=['Interaction 3'])[2]['mr_json'][0]['file_hash'], 'hash-3')
+        self.assertEqual(self.functions.read_blob('Interactions/report.pdf')[2], b'%PDF-1.7 report')
+        self.assertEqual(self.functions.read_blob('Interactions/missing.pdf')[1]['status_code'], 404)
+        self.assertEqual(self.functions.read_objects('Studies')[1]['status_code'], 423)
+        self.assertEqual(self.replica.get_stats()['fetches'], 1)
+
+    def test_fetches_on_interval_and_invalidation(self):
+        self.assertEqual(len(self.functions.read_objects('Companies')[2]['mr_json']), 1)
+        self.push({'Companies/Companies.json': json.dumps([{'name': 'Atlassian'}, {'name': 'Microsoft'}])})
+        self.now = 30.0
+        self.assertEqual(len(self.functions.read_objects('Companies')[2]['mr_json']), 1)
+        self.now = 61.0
+        self.assertEqual(len(self.functions.read_objects('Companies')[2]['mr_json']), 2)
+        self.push({'Companies/Companies.json': json.dumps([])})
+        self.replica.invalidate()
+        self.assertEqual(self.functions.read_objects('Companies')[2]['mr_json'], [])
+        self.assertEqual(self.replica.get_stats()['fetches'], 3)
+
+    def test_interaction_downloads_are_local(self):
+        ctl = Interactions('token', 'mediumroast', process_name)
+        ctl.server_ctl = self.functions
+        with tempfile.TemporaryDirectory() as target_dir:
+            downloaded = ctl.download_interaction_contents(['Interactions/report.pdf'], target_dir)
+            self.assertTrue(downloaded[0], downloaded[1])
+            with open(os.path.join(target_dir, 'Interactions', 'report.pdf'), 'rb') as file:
+                self.assertEqual(file.read(), b'%PDF-1.7 report')
+        self.assertEqual(len(ctl.find_by_x('file_hash', 'hash-4')[2]), 1)
+
+    def test_lookups_make_no_requests(self):
+        with GitHubStandIn() as stand_in:
+            ctl = Companies('token', stand_in.org, process_name)
+            ctl.server_ctl = GitHubFunctions(
+                'token', stand_in.org, process_name, api_url=stand_in.url,
+                session=PooledSession(scheduler=None), replica=self.replica
+            )
+            for _ in range(3):
+                self.assertEqual(ctl.find_by_x('name', 'Atlassian')[2], [{'name': 'Atlassian'}])
+                self.assertEqual(len(ctl.find_by_name('Atlassian')[2]), 1)
+            self.assertEqual(stand_in.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()